@@ -17,6 +17,18 @@ def configure_parser(parser):
     qibuild.parsers.cmake_configure_parser(parser)
     qibuild.parsers.cmake_build_parser(parser)
     qibuild.parsers.project_parser(parser)
+    parser.add_argument("--force", action="store_true",
+                        help="Configure the projects even if nothing changed "
+                        "since they were last configured. Needed after adding "
+                        "or removing sources listed with file(GLOB), which "
+                        "are not detected")
+    group = parser.add_argument_group("parallel configure options")
+    group.add_argument("--num-workers", "-J", dest="num_workers", type=int,
+                       help="Number of projects to be configured in parallel. "
+                       "The output of CMake and the summary of the options are then "
+                       "written in the configure.log file of each build directory. "
+                       "With --profiling or --trace-cmake, the output of CMake "
+                       "is still written in cmake.log")
     if not parser.epilog:
         parser.epilog = ""
     parser.epilog += """
@@ -40,4 +52,6 @@ def do(args):
                             trace_cmake=args.trace_cmake,
                             profiling=args.profiling,
                             summarize_options=args.summarize_options,
-                            single=args.single)
+                            single=args.single,
+                            num_workers=args.num_workers,
+                            skip_unchanged=not args.force)
@@ -25,6 +25,7 @@ def configure_parser(parser):
     qibuild.parsers.project_parser(parser)
     qibuild.parsers.cmake_build_parser(parser)
     qisys.parsers.deploy_parser(parser)
+    qisys.parsers.copy_parser(parser)
     group = parser.add_argument_group("qibuild specific deploy options")
     group.add_argument("--split-debug", action="store_true", dest="split_debug",
                        help="split debug symbols. Enable remote debuging")
@@ -32,6 +33,9 @@ def configure_parser(parser):
                        help="also deploy the tests")
     group.add_argument("--no-packages", action="store_false", dest="install_tc_packages",
                        help="Do not install packages from toolchain")
+    group.add_argument("--num-workers", "-J", dest="num_workers", type=int,
+                       help="Number of projects (or packages) to be installed "
+                       "in the deploy directory in parallel")
     parser.set_defaults(with_tests=False, install_tc_packages=True)
 
 
@@ -44,7 +48,11 @@ def do(args):
         default_dep_types = ["runtime"]
     cmake_builder = qibuild.parsers.get_cmake_builder(
         args, default_dep_types=default_dep_types)
+    (copy_strategy, copy_jobs) = qisys.parsers.get_copy_options(args)
     for url in urls:
         cmake_builder.deploy(url, split_debug=args.split_debug,
                              with_tests=args.with_tests,
-                             install_tc_packages=args.install_tc_packages)
+                             install_tc_packages=args.install_tc_packages,
+                             num_workers=args.num_workers,
+                             copy_strategy=copy_strategy,
+                             copy_jobs=copy_jobs)
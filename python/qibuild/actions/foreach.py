@@ -13,6 +13,7 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import qisys.actions
+import qisys.parsers
 import qibuild.parsers
 
 
@@ -23,6 +24,7 @@ def configure_parser(parser):
     parser.add_argument("command", metavar="COMMAND", nargs="+")
     parser.add_argument("--continue", "--ignore-errors", dest="ignore_errors",
                         action="store_true", help="continue on error")
+    qisys.parsers.foreach_parser(parser)
 
 
 def do(args):
@@ -31,4 +33,6 @@ def do(args):
     projects = qibuild.parsers.get_build_projects(build_worktree, args,
                                                   default_all=True)
     qisys.actions.foreach(projects, args.command,
-                          ignore_errors=args.ignore_errors)
+                          ignore_errors=args.ignore_errors,
+                          num_jobs=args.num_jobs, stream=args.stream,
+                          timeout=args.timeout)
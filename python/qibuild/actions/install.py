@@ -8,6 +8,7 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import qisys.sh
+import qisys.parsers
 import qibuild.parsers
 
 
@@ -28,6 +29,9 @@ def configure_parser(parser):
                        help="Also install tests")
     group.add_argument("--no-packages", action="store_false", dest="install_tc_packages",
                        help="Do not install packages from toolchain")
+    group.add_argument("--num-workers", "-J", dest="num_workers", type=int,
+                       help="Number of projects (or packages) to be installed in parallel")
+    qisys.parsers.copy_parser(parser)
     parser.set_defaults(prefix="/", split_debug=False, dep_types="default",
                         install_tc_packages=True)
     if not parser.epilog:
@@ -57,8 +61,12 @@ def do(args):
             components.append("runtime")
         if "test" in args.dep_types:
             components.append("test")
+    (copy_strategy, copy_jobs) = qisys.parsers.get_copy_options(args)
     res = cmake_builder.install(dest_dir, prefix=args.prefix,
                                 split_debug=args.split_debug,
                                 components=components,
-                                install_tc_packages=args.install_tc_packages)
+                                install_tc_packages=args.install_tc_packages,
+                                num_workers=args.num_workers,
+                                copy_strategy=copy_strategy,
+                                copy_jobs=copy_jobs)
     return res
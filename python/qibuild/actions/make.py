@@ -22,15 +22,34 @@ def configure_parser(parser):
                        "cov-analysis installed on your machine.")
     group.add_argument("--num-workers", "-J", dest="num_workers", type=int,
                        help="Number of projects to be built in parallel")
+    group.add_argument("--print-critical-path", action="store_true", default=False,
+                       help="Print the chain of projects that took the longest "
+                       "to build last time, and exit")
 
 
 @ui.timer("qibuild make")
 def do(args):
     """ Main entry point. """
     cmake_builder = qibuild.parsers.get_cmake_builder(args)
+    if args.print_critical_path:
+        print_critical_path(cmake_builder.get_critical_path())
+        return
     if args.num_workers:
         cmake_builder.build_parallel(rebuild=args.rebuild,
                                      coverity=args.coverity, num_workers=args.num_workers)
     else:
         cmake_builder.build(rebuild=args.rebuild,
                             coverity=args.coverity)
+
+
+def print_critical_path(critical_path):
+    """ Print the critical path returned by CMakeBuilder.get_critical_path() """
+    ui.info(ui.green, "Critical path:")
+    total = 0
+    for project, duration in critical_path:
+        if duration is None:
+            ui.info(ui.green, " *", ui.blue, project.name, ui.reset, "(never built)")
+        else:
+            total += duration
+            ui.info(ui.green, " *", ui.blue, project.name, ui.reset, "(%.1fs)" % duration)
+    ui.info(ui.green, "Total:", ui.reset, "%.1fs" % total)
@@ -11,6 +11,7 @@ import os
 import sys
 
 import qibuild.parsers
+import qisys.parsers
 import qisys.sh
 import qisys.archive
 from qisys import ui
@@ -27,6 +28,7 @@ def configure_parser(parser):
     group.add_argument("--breakpad", action="store_true",
                        help="Generate breakpad symbols. "
                             "(Force CMAKE_BUILD_TYPE=RelWithDebInfo)")
+    qisys.parsers.compression_parser(parser)
 
 
 def do(args):
@@ -70,7 +72,9 @@ def do(args):
     flat = not standalone
     archive = qisys.archive.compress(destdir,
                                      algo="zip", quiet=True, flat=flat,
-                                     output=destdir + ".zip")
+                                     output=destdir + ".zip",
+                                     level=args.compression_level,
+                                     num_jobs=args.compression_jobs)
     # Clean up after ourselves
     qisys.sh.rm(destdir)
     ui.info(ui.green, "Package generated in", ui.reset, ui.bold, archive)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+"""
+Remember how long each project took to build, so that the
+parallel builder can start the longest chains of projects first.
+
+Durations are stored in .qi/<build config>/build_times.json, smoothed
+over the last builds. Builds known to have had nothing to do are not
+recorded, see :py:func:`is_no_op_build`.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+import threading
+
+import qisys.sh
+from qisys import ui
+
+# Projects may be built from several threads at once
+_LOCK = threading.Lock()
+
+# Weight of the last build in the stored duration
+SMOOTHING = 0.3
+
+
+def get_build_times_path(build_worktree):
+    """ Path to the build_times.json file for the current build config """
+    subdir = build_worktree.build_config.build_directory(prefix="")
+    return os.path.join(build_worktree.dot_qi, subdir, "build_times.json")
+
+
+def read_build_times(build_worktree):
+    """
+    Return a dict project name -> duration of its last build, in seconds,
+    for the current build config.
+    """
+    path = get_build_times_path(build_worktree)
+    if not os.path.exists(path):
+        return dict()
+    try:
+        with open(path, "r") as fp:
+            return json.load(fp)
+    except ValueError as e:
+        ui.warning("Could not read", path, ":", e)
+        return dict()
+
+
+def get_build_state(build_directory):
+    """
+    Return something which changes when a build runs at least one
+    command, or None if this cannot be known: the size of the .ninja_log
+    file, Ninja appending a line to it for each command it runs.
+    """
+    ninja_log = os.path.join(build_directory, ".ninja_log")
+    if not os.path.exists(ninja_log):
+        return None
+    return os.path.getsize(ninja_log)
+
+
+def is_no_op_build(build_directory, state_before):
+    """
+    Whether the build which just ran had nothing to do
+    :param state_before: the result of :py:func:`get_build_state` before the build
+    """
+    if state_before is None:
+        return False
+    return get_build_state(build_directory) == state_before
+
+
+def record_build_time(build_worktree, project_name, duration):
+    """ Take the duration (in seconds) of the last build of a project into account """
+    path = get_build_times_path(build_worktree)
+    with _LOCK:
+        build_times = read_build_times(build_worktree)
+        previous = build_times.get(project_name)
+        if previous is not None:
+            duration = SMOOTHING * duration + (1 - SMOOTHING) * previous
+        build_times[project_name] = duration
+        qisys.sh.mkdir(os.path.dirname(path), recursive=True)
+        with open(path, "w") as fp:
+            json.dump(build_times, fp, indent=2, sort_keys=True)
@@ -10,6 +10,7 @@ from __future__ import print_function
 import os
 import re
 import sys
+import threading
 import subprocess
 import six
 
@@ -18,6 +19,93 @@ import qisys.sh
 import qisys.command
 from qisys import ui
 
+# Matches lines like 'CMAKE_BUILD_TYPE:STRING=Debug'. Names go up to
+# the first ':' and may contain dots, '+', ... (pkgcfg_lib_GLIB_glib-2.0),
+# comments start with '#' or '//'
+CACHE_LINE_RE = re.compile(r"([^:=#/][^:]*):(\w+)=(.*)")
+# Values CMake considers as false, see the doc of the if() command
+FALSE_VALUES = ["", "0", "OFF", "NO", "FALSE", "N", "IGNORE", "NOTFOUND"]
+
+# Parsed CMakeCache.txt files, shared by every project of the process:
+# path -> (mtime, size, CMakeCache)
+_CACHES = dict()
+_CACHES_LOCK = threading.Lock()
+
+
+class CMakeCache(object):
+    """ The variables of a CMakeCache.txt file """
+
+    def __init__(self, entries=None):
+        """ CMakeCache Init """
+        # name -> (type, value)
+        self.entries = entries or dict()
+
+    def __contains__(self, name):
+        """ True if the variable is in the cache """
+        return name in self.entries
+
+    def get(self, name, default=None):
+        """ The value of the variable, as a string """
+        if name not in self.entries:
+            return default
+        return self.entries[name][1]
+
+    def get_type(self, name):
+        """ The type of the variable (BOOL, PATH, STRING, INTERNAL ...) """
+        if name not in self.entries:
+            return None
+        return self.entries[name][0]
+
+    def get_bool(self, name, default=False):
+        """ The value of the variable, evaluated as CMake would in a if() """
+        value = self.get(name)
+        if value is None:
+            return default
+        value = value.upper()
+        return value not in FALSE_VALUES and not value.endswith("-NOTFOUND")
+
+    def get_path(self, name, default=None):
+        """ The value of the variable, or default if the variable is empty or NOTFOUND """
+        value = self.get(name)
+        if not value or value.endswith("-NOTFOUND"):
+            return default
+        return value
+
+    def to_dict(self):
+        """ Return a new dict name -> value """
+        return dict((name, value) for (name, (_type, value)) in self.entries.items())
+
+
+def parse_cmake_cache(cache_path):
+    """ Parse a CMakeCache.txt file, returning a :py:class:`CMakeCache` """
+    entries = dict()
+    with open(cache_path, "r") as fp:
+        for line in fp:
+            # Comments never match
+            match = CACHE_LINE_RE.match(line)
+            if match:
+                (key, var_type, value) = match.groups()
+                entries[key] = (var_type, value)
+    return CMakeCache(entries)
+
+
+def load_cmake_cache(cache_path):
+    """
+    Same as :py:func:`parse_cmake_cache`, but only parse the file again
+    when its modification time or its size changed since the last call.
+    The returned object is shared, do not modify it.
+    """
+    cache_path = os.path.abspath(cache_path)
+    stat = os.stat(cache_path)
+    with _CACHES_LOCK:
+        cached = _CACHES.get(cache_path)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+    res = parse_cmake_cache(cache_path)
+    with _CACHES_LOCK:
+        _CACHES[cache_path] = (stat.st_mtime, stat.st_size, res)
+    return res
+
 
 def get_known_cmake_generators():
     """
@@ -84,17 +172,22 @@ def get_cached_var(build_dir, var, default=None):
     :param default:   Default value if not found (default: None)
     :return: the variable value
     """
+    return get_cmake_cache(build_dir).get(var, default)
+
+
+def get_cmake_cache(build_dir):
+    """ The :py:class:`CMakeCache` of the given build directory """
     cmakecache = os.path.join(build_dir, "CMakeCache.txt")
-    if not os.path.exists(cmakecache):
+    try:
+        return load_cmake_cache(cmakecache)
+    except (IOError, OSError):
         mess = "Could not find CMakeCache.txt in %s" % build_dir
         raise Exception(mess)
-    res = read_cmake_cache(cmakecache)
-    return res.get(var, default)
 
 
 def cmake(source_dir, build_dir, cmake_args, env=None,
           clean_first=True, profiling=False, debug_trycompile=False,
-          trace_cmake=False, summarize_options=False):
+          trace_cmake=False, summarize_options=False, output=None):
     """
     Call cmake with from a build dir for a source dir.
     cmake_args are added on the command line.
@@ -102,6 +195,11 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
                 ``os.environ`` will remain unchanged
     :param clean_first: Clean the cmake cache
     :param summarize_options: Whether to call :py:func:`display_options` at the end
+    :param output: a file object where to write the output of ``cmake``
+                   and the summary of the options, instead of the console.
+                   With ``profiling`` or ``trace_cmake``, the output of ``cmake``
+                   still goes to <build>/cmake.log, and this file only
+                   tells where to find it
     For qibuild/CMake hackers:
     :param profiling: Profile CMake executions
     :param debug_trycompile: Call ``cmake`` with ``--debug-trycompile``
@@ -135,9 +233,9 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
     # the current working dir.
     cmake_args += [source_dir]
     if not profiling and not trace_cmake:
-        qisys.command.call(["cmake"] + cmake_args, cwd=build_dir, env=env)
+        qisys.command.call(["cmake"] + cmake_args, cwd=build_dir, env=env, output=output)
         if summarize_options:
-            display_options(build_dir)
+            display_options(build_dir, output=output)
         return
     cmake_log = os.path.join(build_dir, "cmake.log")
     fp = open(cmake_log, "w")
@@ -155,6 +253,8 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
             mess += " (%s)" % qisys.command.str_from_signal(-retcode)
         ui.error(mess)
     ui.info(ui.green, "CMake trace saved in", ui.reset, ui.bold, cmake_log)
+    if output:
+        output.write("CMake trace saved in %s\n" % cmake_log)
     if not profiling:
         return
     qibuild_dir = get_cmake_qibuild_dir()
@@ -165,41 +265,35 @@ def cmake(source_dir, build_dir, cmake_args, env=None,
     ui.info(ui.green, "Annotations generated in", outdir)
 
 
-def display_options(build_dir):
-    """ Display the options by looking in the CMake cache. """
+def display_options(build_dir, output=None):
+    """
+    Display the options by looking in the CMake cache.
+    :param output: a file object where to write the options, instead of the console
+    """
     cache_path = os.path.join(build_dir, "CMakeCache.txt")
-    print("-- Build options: ")
     cache = read_cmake_cache(cache_path)
     opt_keys = [x for x in cache if x.startswith(("WITH_", "ENABLE_"))]
+    lines = list()
+    if opt_keys:
+        opt_keys = sorted(opt_keys)
+        padding = max(len(x) for x in opt_keys) + 3
+        for key in opt_keys:
+            lines.append("  %s : %s" % (key.ljust(padding), cache[key]))
+    if output:
+        output.write("-- Build options: \n")
+        output.write("\n".join(lines or ["  <no options found>"]) + "\n")
+        return
+    print("-- Build options: ")
     if not opt_keys:
         print("  <no options found>")
         return
-    opt_keys = sorted(opt_keys)
-    padding = max(len(x) for x in opt_keys) + 3
-    for key in opt_keys:
-        ui.info("  %s : %s" % (key.ljust(padding), cache[key]))
+    for line in lines:
+        ui.info(line)
 
 
 def read_cmake_cache(cache_path):
     """ Read a CMakeCache.txt file, returning a dict name -> value. """
-    with open(cache_path, "r") as fp:
-        lines = fp.readlines()
-    fp.close()
-    res = dict()
-    for line in lines:
-        if line.startswith("//"):
-            continue
-        if line.startswith("#"):
-            continue
-        if not line:
-            continue
-        match = re.match(r"([a-zA-Z0-9-_]+):(\w+)=(.*)", line)
-        if not match:
-            continue
-        else:
-            (key, _type, value) = match.groups()
-            res[key] = value
-    return res
+    return load_cmake_cache(cache_path).to_dict()
 
 
 def get_cmake_qibuild_dir():
@@ -266,8 +360,8 @@ def get_binutil(name, cmake_var=None, build_dir=None, env=None):
     if not cmake_var:
         cmake_var = "CMAKE_" + name.upper()
     if build_dir:
-        res = get_cached_var(build_dir, cmake_var)
-    if res and not res.endswith("-NOTFOUND"):
+        res = get_cmake_cache(build_dir).get_path(cmake_var)
+    if res:
         return res
     return qisys.command.find_program(name, env=env)
 
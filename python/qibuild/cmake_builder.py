@@ -15,12 +15,15 @@ import functools
 
 import qisys.sh
 import qisys.remote
+import qisys.parallel
 from qisys import ui
 from qisys.abstractbuilder import AbstractBuilder
 import qibuild.deps
+import qibuild.build_times
 import qibuild.deploy
+import qitest.conf
 from qibuild.project import write_qi_path_conf
-from qibuild.parallel_builder import ParallelBuilder
+from qibuild.parallel_builder import ParallelBuilder, ConfigureJob
 
 
 def md5_checksum(file_path):
@@ -37,6 +40,73 @@ def md5_checksum(file_path):
     return m.hexdigest()
 
 
+def install_items(items, install_fun, num_workers=None, on_start=None):
+    """
+    Call install_fun on each item (a project or a package), using
+    at most num_workers threads (one if num_workers is None).
+    :param on_start: called as on_start(i, total, item) right before
+                     installing an item
+    Return the lists of files returned by install_fun, in the same order
+    as items, so that the results do not depend on which item finished first.
+    """
+    items = list(items)
+
+    def install_one(index_and_item):
+        """ Install one item """
+        (i, item) = index_and_item
+        if on_start:
+            on_start(i, len(items), item)
+        return install_fun(item)
+
+    res = list()
+    for result in qisys.parallel.imap(enumerate(items), install_one,
+                                      n_jobs=num_workers or 1):
+        if not result.ok:
+            raise result.exception
+        res.append(result.value)
+    return res
+
+
+def find_overlaps(items, installed):
+    """
+    Find the files installed by several items.
+    :param installed: the lists of files installed by each item
+    Return a list of tuples (file, names of the items which installed it),
+    sorted by file
+    """
+    owners = dict()
+    for (item, files) in zip(items, installed):
+        for name in set(os.path.normpath(x) for x in files):
+            owners.setdefault(name, list()).append(item.name)
+    return sorted((name, names) for (name, names) in owners.items() if len(names) > 1)
+
+
+def warn_overlaps(items, installed):
+    """
+    When installing concurrently, the file installed by the item which
+    finished last wins, so make sure the user knows about it
+    """
+    overlaps = find_overlaps(items, installed)
+    if not overlaps:
+        return
+    ui.warning("The following files are installed by several projects or packages,",
+               "the installed version is undetermined when using -J")
+    for (name, names) in overlaps:
+        ui.warning(" *", name, "(%s)" % ", ".join(names))
+
+
+def write_qitest_json(projects, dest):
+    """
+    Write the tests of the projects in dest/qitest.json, in the order
+    of the projects, whichever project finished installing first
+    """
+    tests = list()
+    for project in projects:
+        tests.extend(project.get_installed_tests())
+    if tests:
+        qitest.conf.write_tests(tests, os.path.join(dest, "qitest.json"))
+
+
 class CMakeBuilder(AbstractBuilder):
     """
     CMake driver.
@@ -176,7 +246,12 @@ Or configure the project with no config
         project.fix_shared_libs(paths)
 
     def configure(self, *args, **kwargs):
-        """ Configure the projects in the correct order. """
+        """
+        Configure the projects in the correct order.
+        :param num_workers: number of projects to configure at the same time,
+                            each project being configured once its build
+                            dependencies are
+        """
         self.bootstrap_projects()
         if kwargs.get("single"):
             projects = self.projects
@@ -185,6 +260,12 @@ Or configure the project with no config
                                                          ["build", "runtime", "test"])
         # Make sure to not pass the 'single' option to project.configure()
         kwargs.pop("single", None)
+        num_workers = kwargs.pop("num_workers", None)
+        if num_workers and num_workers > 1:
+            parallel_builder = ParallelBuilder()
+            parallel_builder.prepare_build_jobs(projects, job_class=ConfigureJob)
+            parallel_builder.build(num_workers=num_workers, **kwargs)
+            return
         for i, project in enumerate(projects):
             ui.info_count(i, len(projects),
                           ui.green, "Configuring",
@@ -211,14 +292,38 @@ Or configure the project with no config
         # do the prebuild step here (it is fast enough)
         for project in projects:
             self.pre_build(project)
+        build_times = qibuild.build_times.read_build_times(self.build_worktree)
         parallel_builder = ParallelBuilder()
-        parallel_builder.prepare_build_jobs(projects)
+        parallel_builder.prepare_build_jobs(projects, build_times=build_times)
         parallel_builder.build(*args, **kwargs)
 
+    def get_critical_path(self):
+        """
+        Return the chain of projects which takes the longest to build,
+        as a list of tuples (project, duration of its last build in seconds,
+        or None if it was never built)
+        """
+        projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
+        build_times = qibuild.build_times.read_build_times(self.build_worktree)
+        parallel_builder = ParallelBuilder()
+        parallel_builder.prepare_build_jobs(projects, build_times=build_times)
+        return [(job.project, build_times.get(job.project.name))
+                for job in parallel_builder.get_critical_path()]
+
     @need_configure
     def install(self, dest, *args, **kwargs):
-        """ Install the projects and the packages to the dest dir """
+        """
+        Install the projects and the packages to the dest dir
+        :param num_workers: number of projects (or packages) to install
+                            at the same time
+        :param copy_strategy: how the files of the packages are copied,
+                              see :py:func:`qisys.sh.install`
+        :param copy_jobs: number of threads copying the files of a package
+        """
         installed = list()
+        num_workers = kwargs.pop("num_workers", None)
+        copy_strategy = kwargs.pop("copy_strategy", "copy")
+        copy_jobs = kwargs.pop("copy_jobs", None)
         projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
         packages = self.deps_solver.get_dep_packages(self.projects, self.dep_types)
         if "install_tc_packages" in kwargs:
@@ -246,29 +351,44 @@ Or configure the project with no config
                 ui.info(ui.green, "(runtime components only)")
             build_type = projects[0].build_type
         release = build_type == "Release"
-        if packages:
-            ui.info(ui.green, ":: Installing packages")
-        for i, package in enumerate(packages):
-            ui.info_count(i, len(packages),
-                          ui.green, "Installing", ui.blue, package.name,
+        parallel = num_workers and num_workers > 1
+
+        def on_start(i, total, item):
+            """ Display a message right before installing a project or a package """
+            ui.info_count(i, total,
+                          ui.green, "Installing", ui.blue, item.name,
                           ui.green, "to", ui.blue, dest,
                           update_title=True)
-            files = package.install(real_dest, components=components,
-                                    release=release)
-            installed.extend(files)
+
+        package_files = list()
+        if packages:
+            ui.info(ui.green, ":: Installing packages")
+            package_files = install_items(
+                packages,
+                lambda x: x.install(real_dest, components=components, release=release,
+                                    strategy=copy_strategy, num_jobs=copy_jobs),
+                num_workers=num_workers, on_start=on_start)
+            for files in package_files:
+                installed.extend(files)
         # Remove qitest.json so that we don't append tests twice
         # when running qibuild install --with-tests twice
         qitest_json = os.path.join(dest, "qitest.json")
         qisys.sh.rm(qitest_json)
+        project_files = list()
         if projects:
             ui.info(ui.green, ":: Installing projects")
-            for i, project in enumerate(projects):
-                ui.info_count(i, len(projects),
-                              ui.green, "Installing", ui.blue, project.name,
-                              ui.green, "to", ui.blue, dest,
-                              update_title=True)
-                files = project.install(dest, **kwargs)
+            project_files = install_items(
+                projects, lambda x: x.install(dest, write_qitest_json=False, **kwargs),
+                num_workers=num_workers, on_start=on_start)
+            for files in project_files:
                 installed.extend(files)
+            if "test" in (components or list()):
+                write_qitest_json(projects, dest)
+        if parallel:
+            # the files of the packages are relative to the prefix,
+            # the ones of the projects to dest
+            package_files = [[os.path.join(prefix, x) for x in files] for files in package_files]
+            warn_overlaps(packages + projects, package_files + project_files)
         replace_dup_lib_simlinks = True
         if sys.platform.startswith("win"):
             replace_dup_lib_simlinks = False
@@ -328,8 +448,16 @@ Or configure the project with no config
         return list(clean_installed)
 
     @need_configure
-    def deploy(self, url, split_debug=False, with_tests=False, install_tc_packages=True):
-        """ Deploy the project and the packages it depends to a remote url """
+    def deploy(self, url, split_debug=False, with_tests=False, install_tc_packages=True,
+               num_workers=None, copy_strategy="copy", copy_jobs=None):
+        """
+        Deploy the project and the packages it depends to a remote url
+        :param num_workers: number of projects (or packages) to install
+                            in the deploy dir at the same time
+        :param copy_strategy: how the files of the packages are copied
+                              to the deploy dir, see :py:func:`qisys.sh.install`
+        :param copy_jobs: number of threads copying the files of a package
+        """
         to_deploy = list()
         dep_projects = self.deps_solver.get_dep_projects(self.projects, self.dep_types)
         dep_packages = self.deps_solver.get_dep_packages(self.projects, self.dep_types)
@@ -359,30 +487,45 @@ Or configure the project with no config
             for package in sorted(dep_packages, key=operator.attrgetter("name")):
                 ui.info(ui.green, " *", ui.reset, ui.blue, package.name)
         ui.info(ui.green, "will be deployed to", ui.blue, url.as_string)
-        if dep_packages:
-            ui.info(ui.green, ":: Deploying packages")
-            for i, package in enumerate(dep_packages):
-                ui.info_count(i, len(dep_packages),
-                              ui.green, "Deploying package", ui.blue, package.name,
+        parallel = num_workers and num_workers > 1
+
+        def on_start(what):
+            """ Display a message right before installing a project or a package """
+            def display(i, total, item):
+                """ Display Message """
+                ui.info_count(i, total,
+                              ui.green, "Deploying", what, ui.blue, item.name,
                               ui.green, "to", ui.blue, url.as_string,
                               update_title=True)
-                # Install package in local deploy dir
-                files = package.install(deploy_dir, components=components)
+            return display
+
+        package_files = list()
+        if dep_packages:
+            ui.info(ui.green, ":: Deploying packages")
+            # Install packages in local deploy dir
+            package_files = install_items(
+                dep_packages,
+                lambda x: x.install(deploy_dir, components=components,
+                                    strategy=copy_strategy, num_jobs=copy_jobs),
+                num_workers=num_workers, on_start=on_start("package"))
+            for files in package_files:
                 to_deploy.extend(files)
         ui.info(ui.green, ":: Deploying projects")
         # Deploy projects: install them inside a 'deploy' dir in the worktree
         # root, then deploy this dir to the target
-        for (i, project) in enumerate(dep_projects):
-            ui.info_count(i, len(dep_projects),
-                          ui.green, "Deploying project", ui.blue, project.name,
-                          ui.green, "to", ui.blue, url.as_string,
-                          update_title=True)
+        project_files = install_items(
+            dep_projects,
+            lambda x: x.install(deploy_dir, components=components, split_debug=split_debug,
+                                write_qitest_json=False),
+            num_workers=num_workers, on_start=on_start("project"))
+        if parallel:
+            warn_overlaps(dep_packages + dep_projects, package_files + project_files)
+        for files in project_files:
             if with_tests:
                 to_deploy.append("qitest.json")
-            # Install project in local deploy dir
-            installed = project.install(deploy_dir, components=components,
-                                        split_debug=split_debug)
-            to_deploy.extend(installed)
+            to_deploy.extend(files)
+        if with_tests:
+            write_qitest_json(dep_projects, deploy_dir)
         # Add debugging scripts
         for project in self.projects:
             scripts = qibuild.deploy.generate_debug_scripts(self, deploy_dir,
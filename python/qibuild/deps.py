@@ -10,15 +10,125 @@ from __future__ import print_function
 import six
 
 import qisys.sort
+from qisys import ui
 from qisys.qixml import etree
 
 
+# Name of the attribute holding the dependencies of each type
+DEP_ATTRS = [
+    ("build", "build_depends"),
+    ("runtime", "run_depends"),
+    ("test", "test_depends"),
+]
+
+
+class DepsGraph(object):
+    """
+    The dependencies of the projects of a build worktree and of the
+    packages of its toolchain, read once, with the results of the
+    topological sorts memoized.
+    Projects hide the packages with the same name.
+    """
+
+    def __init__(self, projects, packages):
+        """ DepsGraph Init """
+        for package in packages:
+            package.load_deps()
+        self.projects = dict((x.name, x) for x in projects)
+        self.packages = dict((x.name, x) for x in packages)
+        # dep type -> name -> set of names
+        self._project_deps = dict()
+        self._package_deps = dict()
+        # dep type -> name -> names of the projects depending directly on it
+        self._reverse_deps = dict()
+        for (dep_type, attr) in DEP_ATTRS:
+            self._project_deps[dep_type] = dict((x.name, set(getattr(x, attr))) for x in projects)
+            self._package_deps[dep_type] = dict((x.name, set(getattr(x, attr))) for x in packages)
+            reverse_deps = dict()
+            for project in projects:
+                for dep in getattr(project, attr):
+                    reverse_deps.setdefault(dep, set()).add(project.name)
+            self._reverse_deps[dep_type] = reverse_deps
+        self._adjacency = dict()
+        self._sorted = dict()
+
+    def get_adjacency(self, dep_types, packages_only=False):
+        """
+        Return a dict name -> dependencies of the given types,
+        suitable for :py:func:`qisys.sort.topological_sort`
+        Do not modify it: it is shared by every caller.
+        """
+        key = (frozenset(dep_types), packages_only)
+        res = self._adjacency.get(key)
+        if res is not None:
+            return res
+        res = dict()
+        sources = [self._package_deps]
+        if not packages_only:
+            sources.append(self._project_deps)
+        for source in sources:
+            names = set()
+            for dep_type in dep_types:
+                names.update(source.get(dep_type, dict()))
+            for name in names:
+                deps = set()
+                for dep_type in dep_types:
+                    deps.update(source[dep_type].get(name, set()))
+                res[name] = deps
+        self._adjacency[key] = res
+        return res
+
+    def get_sorted_names(self, names, dep_types, packages_only=False):
+        """
+        Return the names and all their dependencies of the given types,
+        dependencies first
+        """
+        key = (tuple(names), frozenset(dep_types), packages_only)
+        res = self._sorted.get(key)
+        if res is None:
+            adjacency = self.get_adjacency(dep_types, packages_only=packages_only)
+            try:
+                res = qisys.sort.topological_sort(adjacency, list(names), raise_on_cycles=True)
+            except qisys.sort.CycleError as e:
+                # Keep going as before, but the order inside a cycle is arbitrary
+                ui.warning(str(e), "\nThe projects of a cycle may be built in any order")
+                res = qisys.sort.topological_sort(adjacency, list(names))
+            self._sorted[key] = res
+        return list(res)
+
+    def get_reverse_names(self, names, dep_types):
+        """ Return the sorted names of the projects depending directly on the given names """
+        res = set()
+        for dep_type in dep_types:
+            reverse_deps = self._reverse_deps.get(dep_type, dict())
+            for name in names:
+                res.update(reverse_deps.get(name, set()))
+        return sorted(res)
+
+
 class DepsSolver(object):
     """ Solve dependencies across projects in a build worktree and packages in a toolchain. """
 
     def __init__(self, build_worktree):
         """ DepsSolver Init """
         self.build_worktree = build_worktree
+        self._graph = None
+        self._graph_sources = None
+
+    @property
+    def graph(self):
+        """
+        The :py:class:`DepsGraph` of the worktree and its toolchain,
+        built again only when the projects or the packages change.
+        """
+        projects = self.build_worktree.build_projects
+        toolchain = self.build_worktree.toolchain
+        packages = toolchain.packages if toolchain else list()
+        sources = (projects, list(projects), toolchain, packages)
+        if self._graph is None or not _same_sources(sources, self._graph_sources):
+            self._graph = DepsGraph(projects, packages)
+            self._graph_sources = sources
+        return self._graph
 
     def get_dep_projects(self, projects, dep_types, reverse=False):
         """
@@ -29,13 +139,8 @@ class DepsSolver(object):
         """
         sorted_names = self._get_sorted_names(projects, dep_types,
                                               reverse=reverse)
-        dep_projects = list()
-        for name in sorted_names:
-            dep_project = self.build_worktree.get_build_project(name,
-                                                                raises=False)
-            if dep_project:
-                dep_projects.append(dep_project)
-        return dep_projects
+        graph = self.graph
+        return [graph.projects[x] for x in sorted_names if x in graph.projects]
 
     def get_dep_packages(self, projects, dep_types):
         """
@@ -44,20 +149,14 @@ class DepsSolver(object):
                 (``["build"]``, ``["runtime", "test"]``, etc.)
         :return: a list of packages in the build worktree's toolchain
         """
-        sorted_names = self._get_sorted_names(projects, dep_types)
-        toolchain = self.build_worktree.toolchain
-        if not toolchain:
+        graph = self.graph
+        if not graph.packages:
             return list()
-        build_project_names = [x.name for x in
-                               self.build_worktree.build_projects]
-        dep_packages = list()
-        for name in sorted_names:
-            dep_package = toolchain.get_package(name, raises=False)
-            if dep_package:
-                dep_packages.append(dep_package)
-        res = toolchain.solve_deps(dep_packages, dep_types=dep_types)
-        res = [p for p in res if p.name not in build_project_names]
-        return res
+        sorted_names = self._get_sorted_names(projects, dep_types)
+        dep_names = [x for x in sorted_names if x in graph.packages]
+        sorted_names = graph.get_sorted_names(dep_names, dep_types, packages_only=True)
+        return [graph.packages[x] for x in sorted_names
+                if x in graph.packages and x not in graph.projects]
 
     def get_sdk_dirs(self, project, dep_types):
         """
@@ -89,31 +188,25 @@ class DepsSolver(object):
 
     def _get_sorted_names(self, projects, dep_types, reverse=False):
         """ Helper for get_dep_* functions. """
+        names = [x.name for x in projects]
         if reverse:
-            reverse_deps = set()
-            for project in self.build_worktree.build_projects:
-                if "build" in dep_types:
-                    if any(x.name in project.build_depends for x in projects):
-                        reverse_deps.add(project.name)
-                if "runtime" in dep_types:
-                    if any(x.name in project.run_depends for x in projects):
-                        reverse_deps.add(project.name)
-                if "test" in dep_types:
-                    if any(x.name in project.test_depends for x in projects):
-                        reverse_deps.add(project.name)
-            return sorted(list(reverse_deps))
-        to_sort = dict()
-        # first, fill up dict with packages dependencies ...
-        toolchain = self.build_worktree.toolchain
-        if toolchain:
-            for package in toolchain.packages:
-                package.load_deps()
-            package_deps = gen_deps(toolchain.packages, dep_types)
-            to_sort.update(package_deps)
-        # then with project dependencies
-        project_deps = gen_deps(self.build_worktree.build_projects, dep_types)
-        to_sort.update(project_deps)
-        return qisys.sort.topological_sort(to_sort, [x.name for x in projects])
+            return self.graph.get_reverse_names(names, dep_types)
+        return self.graph.get_sorted_names(names, dep_types)
+
+
+def _same_sources(sources, other):
+    """ Whether the graph built from other can be used for sources """
+    (projects, project_list, toolchain, packages) = sources
+    (other_projects, other_project_list, other_toolchain, other_packages) = other
+    return projects is other_projects and \
+        toolchain is other_toolchain and \
+        _same_objects(project_list, other_project_list) and \
+        _same_objects(packages, other_packages)
+
+
+def _same_objects(first, second):
+    """ True if the two lists contain the same objects """
+    return len(first) == len(second) and all(x is y for (x, y) in zip(first, second))
 
 
 def read_deps_from_xml(target, xml_elem):
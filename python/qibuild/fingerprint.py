@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+"""
+Remember what a project was configured with, so that configuring
+it again can be skipped when nothing changed.
+
+The fingerprint of a project covers the CMake arguments (including the
+flags of the build profiles), the toolchain file and the name, version
+and sha256 of each toolchain package, the dependencies.cmake and path.conf
+files, the -config.cmake files found in the dependencies, the CMake version,
+the CMake files of the project and of qibuild, and the environment
+variables read by CMake on the first run.
+
+Sources added to (or removed from) a file(GLOB) are not detected.
+
+It is stored in <build dir>/configure_fingerprint.json
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+import hashlib
+import threading
+
+import qisys.sh
+import qisys.command
+import qibuild.cmake
+from qisys import ui
+
+# Read by CMake when the cache is created
+ENV_VARS = ["CC", "CXX", "CFLAGS", "CXXFLAGS", "LDFLAGS", "CMAKE_PREFIX_PATH"]
+# Where find_package() looks for <name>-config.cmake files, relative
+# to the sdk directories of the dependencies and to the toolchain packages
+CONFIG_DIRS = ["cmake", "share/cmake", "lib/cmake"]
+
+# Only computed once per process
+_CMAKE_VERSIONS = dict()
+_QIBUILD_CMAKE_HASH = list()
+_LOCK = threading.Lock()
+
+
+def get_fingerprint_path(build_directory):
+    """ Path to the fingerprint of the last successful configure """
+    return os.path.join(build_directory, "configure_fingerprint.json")
+
+
+def compute_fingerprint(project, cmake_args, env=None):
+    """
+    Return a dict describing everything the configure step of
+    the project depends on
+    """
+    res = dict()
+    res["cmake_args"] = list(cmake_args)
+    build_env = env or os.environ
+    res["env"] = dict((x, build_env[x]) for x in ENV_VARS if x in build_env)
+    toolchain = project.build_config.toolchain
+    if toolchain:
+        res["toolchain_file"] = _hash_file(toolchain.toolchain_file)
+        # Packages are always stored in the same directory, whatever their version
+        res["toolchain_packages"] = [[x.name, x.version, x.sha256] for x in toolchain.packages]
+    res["dependencies.cmake"] = _hash_file(
+        os.path.join(project.build_directory, "dependencies.cmake"))
+    res["path.conf"] = _hash_file(
+        os.path.join(project.sdk_directory, "share", "qi", "path.conf"))
+    res["config_files"] = hash_config_files(project.dependencies_dirs)
+    res["cmake_version"] = get_cmake_version(env=env)
+    res["qibuild_cmake_files"] = get_qibuild_cmake_hash()
+    res["cmake_files"] = hash_cmake_files(project.path, exclude=[project.build_directory])
+    return res
+
+
+def read_fingerprint(build_directory):
+    """ Return the stored fingerprint, or None """
+    path = get_fingerprint_path(build_directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as fp:
+            return json.load(fp)
+    except ValueError as e:
+        ui.warning("Could not read", path, ":", e)
+        return None
+
+
+def write_fingerprint(build_directory, fingerprint):
+    """ Store the fingerprint after a successful configure """
+    path = get_fingerprint_path(build_directory)
+    with open(path, "w") as fp:
+        json.dump(fingerprint, fp, indent=2, sort_keys=True)
+
+
+def remove_fingerprint(build_directory):
+    """ Called before configuring, so that a failed configure is never skipped """
+    qisys.sh.rm(get_fingerprint_path(build_directory))
+
+
+def is_up_to_date(build_directory, fingerprint):
+    """
+    True if the project was successfully configured with the
+    same fingerprint, and the CMake cache is still there
+    """
+    if not os.path.exists(os.path.join(build_directory, "CMakeCache.txt")):
+        return False
+    previous = read_fingerprint(build_directory)
+    if previous is None:
+        return False
+    changed = sorted(x for x in set(previous) | set(fingerprint)
+                     if previous.get(x) != fingerprint.get(x))
+    if changed:
+        ui.debug("Configure needed in", build_directory, ", changed:", ", ".join(changed))
+        return False
+    return True
+
+
+def get_cmake_version(env=None):
+    """ The output of ``cmake --version`` """
+    cmake = qisys.command.find_program("cmake", env=env) or "cmake"
+    with _LOCK:
+        if cmake not in _CMAKE_VERSIONS:
+            try:
+                out = qisys.command.check_output([cmake, "--version"], env=env)
+                if isinstance(out, bytes):
+                    out = out.decode("utf-8", "replace")
+                _CMAKE_VERSIONS[cmake] = out.strip().splitlines()[0]
+            except Exception as e:
+                ui.debug("Could not get CMake version:", e)
+                _CMAKE_VERSIONS[cmake] = None
+        return _CMAKE_VERSIONS[cmake]
+
+
+def get_qibuild_cmake_hash():
+    """ Hash of the CMake modules of qibuild, which change with qibuild itself """
+    with _LOCK:
+        if not _QIBUILD_CMAKE_HASH:
+            _QIBUILD_CMAKE_HASH.append(hash_cmake_files(qibuild.cmake.get_cmake_qibuild_dir()))
+        return _QIBUILD_CMAKE_HASH[0]
+
+
+def hash_cmake_files(directory, exclude=None):
+    """
+    Hash of the CMakeLists.txt and .cmake files of the given directory,
+    skipping hidden directories, build directories and the
+    directories in the exclude list
+    """
+    exclude = set(os.path.normcase(os.path.abspath(x)) for x in exclude or list())
+
+    def is_source_dir(path):
+        """ False for the directories that should not be hashed """
+        if os.path.basename(path).startswith("."):
+            return False
+        if os.path.normcase(os.path.abspath(path)) in exclude:
+            return False
+        return not os.path.exists(os.path.join(path, "CMakeCache.txt"))
+
+    sha = hashlib.sha1()
+    for (root, dirs, files) in os.walk(directory):
+        dirs[:] = sorted(x for x in dirs if is_source_dir(os.path.join(root, x)))
+        for name in sorted(files):
+            if name != "CMakeLists.txt" and not name.endswith(".cmake"):
+                continue
+            full_path = os.path.join(root, name)
+            rel_path = qisys.sh.to_posix_path(os.path.relpath(full_path, directory))
+            sha.update(rel_path.encode("utf-8"))
+            sha.update(b"\0")
+            sha.update((_hash_file(full_path) or "").encode("utf-8"))
+            sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def hash_config_files(sdk_dirs):
+    """
+    Hash of the -config.cmake and Config.cmake files found in the
+    CONFIG_DIRS of the given sdk directories
+    """
+    sha = hashlib.sha1()
+    for sdk_dir in sdk_dirs:
+        for config_dir in CONFIG_DIRS:
+            directory = os.path.join(sdk_dir, *config_dir.split("/"))
+            for (root, dirs, files) in os.walk(directory):
+                dirs.sort()
+                for name in sorted(files):
+                    if not name.endswith(("-config.cmake", "Config.cmake")):
+                        continue
+                    full_path = os.path.join(root, name)
+                    sha.update(qisys.sh.to_posix_path(full_path).encode("utf-8"))
+                    sha.update(b"\0")
+                    sha.update((_hash_file(full_path) or "").encode("utf-8"))
+                    sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def _hash_file(path):
+    """ sha1 of the contents of the file, or None if it does not exist """
+    if not os.path.isfile(path):
+        return None
+    sha = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(65536), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
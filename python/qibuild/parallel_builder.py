@@ -8,11 +8,14 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import io
+import os
 import sys
+import itertools
 import traceback
 import threading
 import six
 
+import qisys.sh
 import qibuild.project
 from qisys import ui
 
@@ -25,6 +28,9 @@ else:
 class BuildJob(object):
     """ BuildJob Class """
 
+    # The dependencies of the project which must be done before this job
+    dep_types = ["build"]
+
     def __init__(self, project):
         """ BuildJob Init """
         self.project = project
@@ -34,8 +40,15 @@ class BuildJob(object):
         self.deps = []
         # backward dependencies (parents which depend on this project)
         self.back_deps = []
+        # estimated build duration of this job
+        self.weight = 1
+        # weight of the heaviest chain of jobs depending on this one,
+        # this job included. Used to schedule the critical path first
+        self.priority = 1
         # lock which protects deps and back_deps lists
         self.lock = threading.Lock()
+        # what went wrong when executing the job, if anything
+        self.exception = None
 
     def __str__(self):
         """ String Representation """
@@ -60,50 +73,124 @@ class BuildJob(object):
                       ui.blue, self.project.build_type,
                       update_title=True)
         self.project.build(**kwargs)
-        # job ended, say that to dependants
-        with self.lock:
-            for parent_job in self.back_deps:
-                ui.debug("Signaling end to job", ui.reset, ui.bold, parent_job.project.name)
-                parent_job.on_dependent_job_finished(self)
+
+    def failure(self):
+        """ The exception to raise when the job failed """
+        return qibuild.build.BuildFailed(self.project)
 
     def on_dependent_job_finished(self, job):
-        """ On Depend Job Finished """
+        """
+        Called when one of the dependencies of this job is built.
+        Return True if the job has no pending dependency left,
+        meaning it is ready to be scheduled.
+        """
         with self.lock:
             try:
                 self.deps.remove(job)
             except ValueError:
                 ui.debug(ui.red, "Job not in the deps list!", self.deps, job)
+            return not self.deps
+
+
+class ConfigureJob(BuildJob):
+    """
+    Configure a project. The output of CMake is written in the
+    configure.log file of the build directory, and only displayed
+    if something went wrong, so that projects configured at the same
+    time do not mix their outputs.
+    """
+
+    # dependencies.cmake also lists the sdk dirs of the test dependencies,
+    # their -config.cmake files must exist before CMake runs
+    dep_types = ["build", "test"]
+
+    def __str__(self):
+        """ String Representation """
+        return "<ConfigureJob %s>" % self.project.name
+
+    @property
+    def log_path(self):
+        """ Where to write the output of CMake """
+        return os.path.join(self.project.build_directory, "configure.log")
+
+    def execute(self, *_args, **kwargs):
+        """ Execute """
+        ui.info_count(self.index, self.num_projects,
+                      ui.green, "Configuring",
+                      ui.blue, self.project.name,
+                      update_title=True)
+        qisys.sh.mkdir(self.project.build_directory, recursive=True)
+        try:
+            with open(self.log_path, "w") as log:
+                self.project.configure(output=log, **kwargs)
+        except Exception:
+            with open(self.log_path, "r") as log:
+                ui.info(ui.red, "Output of CMake for", ui.reset, ui.bold, self.project.name,
+                        ui.reset, "\n" + log.read())
+            raise
+        ui.debug("CMake output saved in", self.log_path)
+
+    def failure(self):
+        """ The exception to raise when the job failed """
+        if self.exception is None:
+            return BuildJob.failure(self)
+        return self.exception
 
 
 class ParallelBuilder(object):
-    """ ParallelBuilder Builder Class """
+    """
+    ParallelBuilder Builder Class
+
+    Jobs whose dependencies are all built are put in a priority queue,
+    jobs on the longest chain of dependent jobs first. When the durations
+    of the previous builds are known, chains are weighted by them.
+    Workers report back through a second queue, so that the main thread
+    only wakes up when a job is done.
+    """
 
     def __init__(self):
         """ ParallelBuilder Init """
         self.all_jobs = []
         self.pending_jobs = []
-        self.running_jobs = Queue.Queue()
+        self.running_jobs = Queue.PriorityQueue()
+        self.finished_jobs = Queue.Queue()
+        self.failed = threading.Event()
         self._workers = list()
+        self._jobs_by_name = dict()
+        self._counter = itertools.count()
+        self._ready_jobs = list()
         self.failed_project = None
+        self.failed_job = None
         self.job_current_index = 0
         self.num_projects = 0
 
-    def prepare_build_jobs(self, projects):
-        """ Prepare Build Job """
+    def prepare_build_jobs(self, projects, build_times=None, job_class=BuildJob):
+        """
+        Prepare Build Job
+        :param build_times: optional dict project name -> duration
+                            of its last build, in seconds
+        :param job_class: :py:class:`BuildJob`, or :py:class:`ConfigureJob`
+                          to configure the projects instead
+        """
         # projects are received already sorted by build order
         # this means, no project can depend on projects which
         # come after it in the list!!!!
         self.num_projects = len(projects)
         for project in projects:
-            job = BuildJob(project)
+            job = job_class(project)
             self.all_jobs.append(job)
+            self._jobs_by_name[project.name] = job
             self._resolve_job_build_dependencies(job)
             # job has dependencies => pending
             if job.deps:
                 self.pending_jobs.append(job)
-            # job has no dependencies => running
+            # job has no dependencies => ready
             else:
-                self._schedule_job(job)
+                self._ready_jobs.append(job)
+        self._compute_priorities(build_times)
+        for job in self._ready_jobs:
+            self._schedule_job(job)
+        self._ready_jobs = list()
 
     def build(self, *args, **kwargs):
         """ Build """
@@ -111,43 +198,83 @@ class ParallelBuilder(object):
         kwargs.pop("num_workers", None)
         # start workers
         for i in range(0, num_workers):
-            worker = BuildWorker(self.running_jobs, i, *args, **kwargs)
+            worker = BuildWorker(self.running_jobs, i, *args,
+                                 finished=self.finished_jobs, failed=self.failed,
+                                 **kwargs)
             self._workers.append(worker)
             worker.start()
-        all_ok = True
-        while all_ok and (self.pending_jobs or not self.running_jobs.empty()):
-            # parse pending_jobs to see if any needs to be moved to running
-            for job in self.pending_jobs:
-                if not job.deps:
-                    self._schedule_job(job)
-                    self.pending_jobs.remove(job)
-            # check if any worker failed
-            for worker in self._workers:
-                if not worker.result.ok:
-                    all_ok = False
-                    self.failed_project = worker.result.failed_project
-                    break
+        num_finished = 0
+        num_jobs = len(self.all_jobs)
+        while num_finished < num_jobs:
+            # block until a worker is done with a job
+            job, ok = self.finished_jobs.get()
+            if not ok:
+                self.failed_project = job.project
+                self.failed_job = job
+                break
+            num_finished += 1
+            for parent_job in job.back_deps:
+                ui.debug("Signaling end to job", ui.reset, ui.bold, parent_job.project.name)
+                if parent_job.on_dependent_job_finished(job):
+                    self.pending_jobs.remove(parent_job)
+                    self._schedule_job(parent_job)
         # end (all done or error)
         # say to all workers to stop
         for worker in self._workers:
             worker.stop()
+            self.running_jobs.put((float("-inf"), next(self._counter), None))
         # join all workers before quitting
         for worker_thread in self._workers:
             worker_thread.join()
         # compilation failed
-        if not all_ok:
-            raise qibuild.build.BuildFailed(self.failed_project)
+        if self.failed_job:
+            raise self.failed_job.failure()
 
     def _schedule_job(self, job):
         """ Schedule Job """
         job.index = self.job_current_index
         self.job_current_index += 1
         job.num_projects = self.num_projects
-        self.running_jobs.put(job)
+        self.running_jobs.put((-job.priority, next(self._counter), job))
+
+    def get_critical_path(self):
+        """
+        Return the heaviest chain of jobs, in build order.
+        Must be called after :py:meth:`prepare_build_jobs`
+        """
+        res = list()
+        candidates = self.all_jobs
+        while candidates:
+            job = max(candidates, key=lambda x: x.priority)
+            res.append(job)
+            candidates = job.back_deps
+        return res
+
+    def _compute_priorities(self, build_times=None):
+        """
+        Set the priority of each job to the weight of the heaviest
+        chain of jobs waiting for it.
+        """
+        if build_times:
+            known = [build_times[x.project.name] for x in self.all_jobs
+                     if x.project.name in build_times]
+            # assume projects never built take an average time
+            default = float(sum(known)) / len(known) if known else 1
+            for job in self.all_jobs:
+                job.weight = build_times.get(job.project.name, default)
+        # all_jobs is sorted by build order, so every job depending on
+        # a given job comes after it
+        for job in reversed(self.all_jobs):
+            job.priority = job.weight
+            if job.back_deps:
+                job.priority += max(parent.priority for parent in job.back_deps)
 
     def _resolve_job_build_dependencies(self, job):
         """ Resolve Job Build Dependencies """
-        for p in job.project.build_depends:
+        names = set()
+        for dep_type in job.dep_types:
+            names.update(getattr(job.project, dep_type + "_depends", set()))
+        for p in sorted(names):
             dep_job = self._find_job_by_name(p)
             if dep_job:
                 job.add_dependency(dep_job)
@@ -157,10 +284,7 @@ class ParallelBuilder(object):
 
     def _find_job_by_name(self, name):
         """ Find Job By Name """
-        for job in self.all_jobs:
-            if job.project.name == name:
-                return job
-        return None
+        return self._jobs_by_name.get(name)
 
 
 class BuildResult(object):
@@ -180,6 +304,8 @@ class BuildWorker(threading.Thread):
         super(BuildWorker, self).__init__(name="BuildWorker#%i" % worker_index)
         self.index = worker_index
         self.queue = queue
+        self.finished = kwargs.pop("finished", None)
+        self.failed = kwargs.pop("failed", None) or threading.Event()
         self.args = args
         self.kwargs = kwargs
         self._should_stop = False
@@ -191,23 +317,34 @@ class BuildWorker(threading.Thread):
 
     def run(self):
         """ Run """
-        while not self._should_stop and self.result.ok:
-            job = None
+        while not self._should_stop:
+            # block until there is something to do, a None job means stop
+            _, _, job = self.queue.get()
+            if job is None:
+                break
+            if self.failed.is_set():
+                # another worker failed, do not start anything new
+                continue
+            job_ok = False
             try:
-                job = self.queue.get(True, 1)
-            except Queue.Empty:
-                # ignore empty exception, this can happen
-                pass
-            if job:
-                try:
-                    ui.info(ui.green, "Worker #%i starts working on " % (self.index + 1),
-                            ui.reset, ui.bold, job.project.name)
-                    job.execute(*self.args, **self.kwargs)
-                    self.queue.task_done()
-                except Exception as e:
+                ui.info(ui.green, "Worker #%i starts working on " % (self.index + 1),
+                        ui.reset, ui.bold, job.project.name)
+                job.execute(*self.args, **self.kwargs)
+                job_ok = True
+            except Exception as e:
+                job.exception = e
+                ui.error(*self.message_for_exception(e))
+            finally:
+                if not job_ok:
                     self.result.ok = False
                     self.result.failed_project = job.project
-                    ui.error(*self.message_for_exception(e))
+                    self.failed.set()
+                self.queue.task_done()
+                # always report back, the main thread is waiting for us
+                if self.finished is not None:
+                    self.finished.put((job, job_ok))
+            if not job_ok:
+                break
 
     @staticmethod
     def message_for_exception(exception):
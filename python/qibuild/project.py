@@ -21,6 +21,8 @@ import qibuild.dlls
 import qibuild.gcov
 import qibuild.cmake
 import qibuild.build
+import qibuild.build_times
+import qibuild.fingerprint
 import qibuild.dylibs
 import qibuild.breakpad
 import qibuild.test_runner
@@ -136,6 +138,8 @@ class BuildProject(object):
         self.run_depends = set()
         self.test_depends = set()
         self.host_depends = set()
+        # Written in dependencies.cmake, see write_dependencies_cmake()
+        self.dependencies_dirs = list()
 
     @property
     def name(self):
@@ -199,23 +203,13 @@ class BuildProject(object):
     @property
     def cmake_vars(self):
         """ CMake Vars """
-        cmake_vars = dict()
         try:
-            with open(self.cmake_cache, "r") as fp:
-                for r in fp.readlines():
-                    if not r[0].isalnum():
-                        continue
-                    sep1 = r.index(":")
-                    sep2 = r.index("=")
-                    var_name = r[0:sep1]
-                    var_type = r[sep1 + 1:sep2]
-                    if var_type == "UNINITIALIZED":
-                        continue
-                    var_value = r[sep2 + 1:-1]
-                    cmake_vars[var_name] = {"value": var_value, "type": var_type}
-        except Exception:
-            cmake_vars = dict()
-        return cmake_vars
+            cache = qibuild.cmake.load_cmake_cache(self.cmake_cache)
+        except (IOError, OSError):
+            return dict()
+        return dict((name, {"value": value, "type": var_type})
+                    for (name, (var_type, value)) in cache.entries.items()
+                    if var_type != "UNINITIALIZED")
 
     @property
     def qitest_json(self):
@@ -308,6 +302,7 @@ set(CMAKE_PREFIX_PATH ${{CMAKE_PREFIX_PATH}} CACHE INTERNAL ""  FORCE)
         dirs_to_add = sdk_dirs
         if host_dirs:
             dirs_to_add = host_dirs + sdk_dirs
+        self.dependencies_dirs = list(dirs_to_add)
         for dir_to_add in dirs_to_add:
             dep_to_add += """\
 list(FIND CMAKE_PREFIX_PATH "{dir_to_add}" _found)
@@ -330,8 +325,13 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         dep_cmake = os.path.join(self.build_directory, "dependencies.cmake")
         qisys.sh.write_file_if_different(to_write, dep_cmake)
 
-    def configure(self, **kwargs):
-        """ Delegate to :py:func:`qibuild.cmake.cmake`. """
+    def configure(self, skip_unchanged=False, **kwargs):
+        """
+        Delegate to :py:func:`qibuild.cmake.cmake`.
+        :param skip_unchanged: do nothing if the project was already
+                               configured with the same fingerprint
+                               (see :py:mod:`qibuild.fingerprint`)
+        """
         qisys.sh.mkdir(self.sdk_directory, recursive=True)
         cmake_args = self.cmake_args
         # only required the first time, afterwards this setting is
@@ -340,12 +340,25 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         cmake_qibuild_dir = os.path.join(cmake_qibuild_dir, "qibuild")
         cmake_qibuild_dir = qisys.sh.to_posix_path(cmake_qibuild_dir)
         cmake_args.append("-Dqibuild_DIR=%s" % cmake_qibuild_dir)
+        build_env = self.build_env
+        fingerprint = None
+        # CMake is run for its side effects when debugging it
+        if not any(kwargs.get(x) for x in ["profiling", "trace_cmake", "debug_trycompile"]):
+            fingerprint = qibuild.fingerprint.compute_fingerprint(self, cmake_args, env=build_env)
+        if skip_unchanged and fingerprint and \
+                qibuild.fingerprint.is_up_to_date(self.build_directory, fingerprint):
+            ui.info(ui.green, "Nothing changed since last configure of",
+                    ui.blue, self.name, ui.green, ", skipping")
+            return
+        qibuild.fingerprint.remove_fingerprint(self.build_directory)
         try:
             qibuild.cmake.cmake(self.path, self.build_directory,
-                                cmake_args, env=self.build_env, **kwargs)
+                                cmake_args, env=build_env, **kwargs)
         except qisys.command.CommandFailedException as error:
             raise qibuild.build.ConfigureFailed(self, error)
         self.generate_qitest_json()
+        if fingerprint:
+            qibuild.fingerprint.write_fingerprint(self.build_directory, fingerprint)
 
     def generate_qitest_json(self):
         """ Generate QiTest JSON """
@@ -393,11 +406,15 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
                 key = str(key)
                 value = str(value)
             build_env_str[key] = value
+        build_state = qibuild.build_times.get_build_state(self.build_directory)
         try:
             qisys.command.call(cmd, env=build_env_str)
         except qisys.command.CommandFailedException:
             raise qibuild.build.BuildFailed(self)
         timer.stop()
+        if not target and not qibuild.build_times.is_no_op_build(self.build_directory, build_state):
+            qibuild.build_times.record_build_time(self.build_worktree, self.name,
+                                                  timer.elapsed_time.total_seconds())
         # We need to call generate_qitest_json() here because
         # `qibuild make` may have caused a re-run of cmake
         self.generate_qitest_json()
@@ -428,7 +445,8 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         ui.warning("Unknown generator: %s, ignoring -j option" % cmake_generator)
         return list()
 
-    def install(self, destdir, prefix="/", components=None, split_debug=False):
+    def install(self, destdir, prefix="/", components=None, split_debug=False,
+                write_qitest_json=True):
         """
         Install the project.
         :param project: project name.
@@ -441,6 +459,10 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
            (see :ref:`cmake-install` section for the details)
         :package split_debug: split the debug symbols out of the binaries
             useful for `qibuild deploy`
+        :param write_qitest_json: when installing the test component,
+            append the tests to the qitest.json file of the destination.
+            Set to False when the caller writes them itself, see
+            :py:meth:`get_installed_tests`
         """
         installed = list()
         if components is None:
@@ -475,7 +497,7 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
             self.build(target="install", env=build_env)
             manifest_path = os.path.join(self.build_directory, "install_manifest.txt")
             installed.extend(read_install_manifest(manifest_path))
-        if "test" in components:
+        if "test" in components and write_qitest_json:
             self._install_qitest_json(destdir)
         if split_debug:
             self.split_debug(destdir, file_list=installed)
@@ -499,12 +521,18 @@ set(QIBUILD_PYTHON_PATH "%s" CACHE STRING "" FORCE)
         installed = read_install_manifest(manifest_path)
         return installed
 
+    def get_installed_tests(self):
+        """ Return the tests of the project, relocated so they can run from the install dir """
+        if not os.path.exists(self.qitest_json):
+            return list()
+        tests = qitest.conf.parse_tests(self.qitest_json)
+        return qitest.conf.relocate_tests(self, tests)
+
     def _install_qitest_json(self, destdir):
         """ Install QiTest JSON """
         if not os.path.exists(self.qitest_json):
             return
-        tests = qitest.conf.parse_tests(self.qitest_json)
-        tests = qitest.conf.relocate_tests(self, tests)
+        tests = self.get_installed_tests()
         qitest.conf.write_tests(tests, os.path.join(destdir, "qitest.json"), append=True)
 
     def run_tests(self, **kwargs):
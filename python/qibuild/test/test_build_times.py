@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+""" Test Build Times """
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import qibuild.build_times
+
+
+def test_short_builds_are_smoothed(build_worktree):
+    """ Incremental builds are taken into account, smoothed with the history """
+    qibuild.build_times.record_build_time(build_worktree, "world", 100)
+    qibuild.build_times.record_build_time(build_worktree, "world", 0.5)
+    duration = qibuild.build_times.read_build_times(build_worktree)["world"]
+    assert 0.5 < duration < 100
+
+
+def test_no_op_builds_are_detected(tmpdir):
+    """ Ninja builds with nothing to do do not touch .ninja_log """
+    build_dir = tmpdir.mkdir("build")
+    state = qibuild.build_times.get_build_state(build_dir.strpath)
+    assert state is None
+    assert not qibuild.build_times.is_no_op_build(build_dir.strpath, state)
+    ninja_log = build_dir.join(".ninja_log")
+    ninja_log.write("# ninja log v5\n")
+    state = qibuild.build_times.get_build_state(build_dir.strpath)
+    assert qibuild.build_times.is_no_op_build(build_dir.strpath, state)
+    ninja_log.write("0\t10\t0\tworld.o\t1234\n", mode="a")
+    assert not qibuild.build_times.is_no_op_build(build_dir.strpath, state)
+
+
+def test_durations_are_smoothed(build_worktree):
+    """ Test Durations Are Smoothed """
+    qibuild.build_times.record_build_time(build_worktree, "world", 100)
+    qibuild.build_times.record_build_time(build_worktree, "world", 200)
+    duration = qibuild.build_times.read_build_times(build_worktree)["world"]
+    assert 100 < duration < 200
@@ -9,9 +9,13 @@ from __future__ import print_function
 
 import os
 import sys
+import mock
 import pytest
 
 import qibuild.config
+import qibuild.worktree
+import qisys.qixml
+import qisys.worktree
 from qibuild.test.conftest import TestBuildWorkTree
 from qitoolchain.test.conftest import toolchains
 from qipy.test.conftest import qipy_action
@@ -52,6 +56,34 @@ def test_project_names_are_unique(build_worktree):
     assert "two projects with the same name" in str(e.value)
 
 
+def test_get_build_project_after_reload(build_worktree):
+    """ Lookups by name should follow the projects added and removed """
+    world_proj = build_worktree.create_project("world")
+    assert build_worktree.get_build_project("world") == world_proj
+    build_worktree.worktree.remove_project("world")
+    assert build_worktree.get_build_project("world", raises=False) is None
+    with pytest.raises(qisys.worktree.NoSuchProject):
+        build_worktree.get_build_project("world")
+    hello_proj = build_worktree.create_project("hello")
+    assert build_worktree.get_build_project("hello").path == hello_proj.path
+
+
+def test_qiproject_data_is_cached(build_worktree):
+    """ Unchanged qiproject.xml files are not parsed again """
+    world_proj = build_worktree.create_project("world")
+    hello_proj = build_worktree.create_project("hello", build_depends=["world"])
+    for proj in [world_proj, hello_proj]:
+        os.utime(proj.qiproject_xml, (0, 0))
+    build_worktree.worktree.reload()
+    with mock.patch("qisys.qixml.read", wraps=qisys.qixml.read) as mock_read:
+        worktree = qisys.worktree.WorkTree(build_worktree.root)
+        new_worktree = qibuild.worktree.BuildWorkTree(worktree)
+        hello = new_worktree.get_build_project("hello")
+    assert hello.build_depends == set(["world"])
+    read_paths = [x[0][0] for x in mock_read.call_args_list]
+    assert not [x for x in read_paths if x.endswith("qiproject.xml")]
+
+
 def test_bad_qibuild2_qiproject(cd_to_tmpdir):
     """ Test Bad QiBuild 2 Project """
     build_worktree = TestBuildWorkTree()
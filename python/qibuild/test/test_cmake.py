@@ -7,6 +7,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import io
 import os
 import mock
 import pytest
@@ -130,3 +131,73 @@ The following generators are available on this platform:
                        "Visual Studio 12 2013 Win64",
                        "Visual Studio 12 2013 ARM",
                        "Borland Makefiles"]
+
+
+CMAKE_CACHE = """\
+# This is the CMakeCache file.
+
+//Choose the type of build
+CMAKE_BUILD_TYPE:STRING=Debug
+//Path to a program.
+CMAKE_AR:FILEPATH=/usr/bin/ar
+CMAKE_OBJDUMP:FILEPATH=CMAKE_OBJDUMP-NOTFOUND
+WITH_FOO:BOOL=ON
+WITH_BAR:BOOL=off
+_INTERNAL_VAR:INTERNAL=1
+SPAM:UNINITIALIZED=eggs
+//Path to a library.
+pkgcfg_lib_GLIB_glib-2.0:FILEPATH=/usr/lib/libglib-2.0.so
+LIBXML++_DIR:PATH=/opt/libxml++/lib/cmake
+"""
+
+
+def test_read_cmake_cache(tmpdir):
+    """ Test Read CMake Cache """
+    cache_path = tmpdir.join("CMakeCache.txt")
+    cache_path.write(CMAKE_CACHE)
+    assert qibuild.cmake.read_cmake_cache(cache_path.strpath) == {
+        "CMAKE_BUILD_TYPE": "Debug",
+        "CMAKE_AR": "/usr/bin/ar",
+        "CMAKE_OBJDUMP": "CMAKE_OBJDUMP-NOTFOUND",
+        "WITH_FOO": "ON",
+        "WITH_BAR": "off",
+        "_INTERNAL_VAR": "1",
+        "SPAM": "eggs",
+        "pkgcfg_lib_GLIB_glib-2.0": "/usr/lib/libglib-2.0.so",
+        "LIBXML++_DIR": "/opt/libxml++/lib/cmake",
+    }
+    cache = qibuild.cmake.get_cmake_cache(tmpdir.strpath)
+    assert cache.get_type("CMAKE_AR") == "FILEPATH"
+    assert cache.get_path("CMAKE_AR") == "/usr/bin/ar"
+    assert cache.get_path("CMAKE_OBJDUMP") is None
+    assert cache.get_bool("WITH_FOO")
+    assert not cache.get_bool("WITH_BAR")
+    assert cache.get_bool("WITH_BAZ", default=True)
+    assert cache.get("NO_SUCH_VAR", default="foo") == "foo"
+    with pytest.raises(Exception) as e:
+        qibuild.cmake.get_cached_var(tmpdir.join("other").strpath, "CMAKE_AR")
+    assert "Could not find CMakeCache.txt" in str(e.value)
+
+
+def test_display_options_to_output(tmpdir):
+    """ With -J, the options are written in configure.log """
+    tmpdir.join("CMakeCache.txt").write(CMAKE_CACHE)
+    output = io.StringIO()
+    qibuild.cmake.display_options(tmpdir.strpath, output=output)
+    lines = output.getvalue().splitlines()
+    assert lines[0].strip() == "-- Build options:"
+    assert [x.split() for x in lines[1:]] == [["WITH_BAR", ":", "off"], ["WITH_FOO", ":", "ON"]]
+
+
+def test_cmake_cache_is_parsed_once(tmpdir):
+    """ CMakeCache.txt should only be parsed again when it changes """
+    cache_path = tmpdir.join("CMakeCache.txt")
+    cache_path.write(CMAKE_CACHE)
+    with mock.patch("qibuild.cmake.parse_cmake_cache",
+                    side_effect=qibuild.cmake.parse_cmake_cache) as parse:
+        for _ in range(10):
+            assert qibuild.cmake.get_cached_var(tmpdir.strpath, "CMAKE_BUILD_TYPE") == "Debug"
+        assert parse.call_count == 1
+        cache_path.write(CMAKE_CACHE.replace("=Debug", "=Release"))
+        assert qibuild.cmake.get_cached_var(tmpdir.strpath, "CMAKE_BUILD_TYPE") == "Release"
+        assert parse.call_count == 2
@@ -9,6 +9,7 @@ from __future__ import print_function
 
 import os
 import sys
+import time
 from contextlib import contextmanager
 from mock import patch
 import pytest
@@ -16,6 +17,7 @@ import pytest
 import qibuild.config
 import qibuild.parsers
 import qibuild.cmake_builder
+import qitest.conf
 
 
 def test_check_configure_has_been_called_before_building(build_worktree):
@@ -267,3 +269,78 @@ def test_post_install_all_with_dup(tmpdir):
                                                                            replace_duplicated_lib_by_symlink=True,
                                                                            remove_python_bytecode=True)
         assert len(input_files) == len(output_files) + 2
+
+
+def test_install_items_keeps_order():
+    """ Results must not depend on which item finished first """
+    class FakeProject(object):
+        """ Fake Project """
+
+        def __init__(self, name, delay):
+            """ FakeProject Init """
+            self.name = name
+            self.delay = delay
+
+        def install(self):
+            """ Install """
+            time.sleep(self.delay)
+            return ["lib/lib%s.so" % self.name, "share/common.txt"]
+
+    projects = [FakeProject("a", 0.2), FakeProject("b", 0.1), FakeProject("c", 0)]
+    started = list()
+    res = qibuild.cmake_builder.install_items(
+        projects, lambda x: x.install(), num_workers=3,
+        on_start=lambda i, total, x: started.append(x.name))
+    assert res == [x.install() for x in projects]
+    assert sorted(started) == ["a", "b", "c"]
+    overlaps = qibuild.cmake_builder.find_overlaps(projects, res)
+    assert overlaps == [(os.path.normpath("share/common.txt"), ["a", "b", "c"])]
+
+
+def test_write_qitest_json_keeps_order(tmpdir):
+    """ Tests are written in the order of the projects """
+    class FakeProject(object):
+        """ Fake Project """
+
+        def __init__(self, name, tests):
+            """ FakeProject Init """
+            self.name = name
+            self.tests = tests
+
+        def get_installed_tests(self):
+            """ Get Installed Tests """
+            return [{"name": x, "cmd": [x]} for x in self.tests]
+
+    projects = [FakeProject("b", ["test_b"]), FakeProject("c", list()),
+                FakeProject("a", ["test_a1", "test_a2"])]
+    qibuild.cmake_builder.write_qitest_json(projects, tmpdir.strpath)
+    tests = qitest.conf.parse_tests(tmpdir.join("qitest.json").strpath)
+    assert [x["name"] for x in tests] == ["test_b", "test_a1", "test_a2"]
+
+
+def test_find_overlaps_between_packages_and_projects():
+    """ A file of a package can be overwritten by a project """
+    class FakeItem(object):
+        """ Fake Project or Package """
+
+        def __init__(self, name):
+            """ FakeItem Init """
+            self.name = name
+
+    items = [FakeItem("boost"), FakeItem("foo")]
+    installed = [["lib/libboost.so"], ["lib/libfoo.so", "lib/libboost.so"]]
+    overlaps = qibuild.cmake_builder.find_overlaps(items, installed)
+    assert overlaps == [(os.path.normpath("lib/libboost.so"), ["boost", "foo"])]
+
+
+def test_install_items_failure():
+    """ The first failure is raised """
+    def install_fun(item):
+        """ Install Function """
+        if item == "b":
+            raise Exception("b failed")
+        return list()
+
+    with pytest.raises(Exception) as e:
+        qibuild.cmake_builder.install_items(["a", "b", "c"], install_fun, num_workers=2)
+    assert "b failed" in str(e.value)
@@ -7,8 +7,13 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import time
+import mock
+
 import qibuild.config
-from qibuild.deps import DepsSolver
+import qisys.test.test_sort
+import qitoolchain.qipackage
+from qibuild.deps import DepsGraph, DepsSolver
 
 
 def test_simple_deps(build_worktree):
@@ -153,3 +158,68 @@ def test_read_host_deps(build_worktree):
     _footool_proj = build_worktree.add_test_project("footool")
     usefootool_proj = build_worktree.add_test_project("usefootool")
     assert usefootool_proj.host_depends == {"footool"}
+
+
+def test_package_xml_read_once(build_worktree, toolchains):
+    """ Solving the dependencies of every project should not read package.xml files again """
+    toolchains.create("foo")
+    qibuild.config.add_build_config("foo", toolchain="foo")
+    toolchains.add_package("foo", "world")
+    toolchains.add_package("foo", "bar", build_depends=["world"])
+    projects = [build_worktree.create_project("hello%i" % i, build_depends=["bar"])
+                for i in range(5)]
+    build_worktree.set_active_config("foo")
+    deps_solver = DepsSolver(build_worktree)
+    with mock.patch("qitoolchain.qipackage.QiPackage.load_deps",
+                    autospec=True, side_effect=qitoolchain.qipackage.QiPackage.load_deps) as load_deps:
+        for project in projects:
+            packages = deps_solver.get_dep_packages([project], ["build"])
+            assert [x.name for x in packages] == ["world", "bar"]
+            deps_solver.get_sdk_dirs(project, ["build"])
+        assert load_deps.call_count == 2
+
+
+def test_graph_is_updated(build_worktree):
+    """ Projects added to the worktree should be taken into account """
+    world = build_worktree.create_project("world")
+    deps_solver = DepsSolver(build_worktree)
+    assert deps_solver.get_dep_projects([world], ["build"], reverse=True) == []
+    hello = build_worktree.create_project("hello", build_depends=["world"])
+    assert deps_solver.get_dep_projects([hello], ["build"]) == [world, hello]
+    assert deps_solver.get_dep_projects([world], ["build"], reverse=True) == [hello]
+
+
+def test_warn_on_cycles(build_worktree, record_messages):
+    """ Cycles are reported, and the projects are still sorted """
+    build_worktree.create_project("a", build_depends=["b"])
+    build_worktree.create_project("b", build_depends=["a"])
+    c_proj = build_worktree.create_project("c", build_depends=["a"])
+    deps_solver = DepsSolver(build_worktree)
+    dep_projects = deps_solver.get_dep_projects([c_proj], ["build"])
+    assert [x.name for x in dep_projects] == ["b", "a", "c"]
+    assert record_messages.find(r"a -> b -> a")
+
+
+def test_deps_graph_benchmark():
+    """ Solving the dependencies of each project of a big worktree should be fast """
+    class FakeProject(object):
+        """ Fake Project """
+
+        def __init__(self, name, build_depends):
+            """ FakeProject Init """
+            self.name = name
+            self.build_depends = build_depends
+            self.run_depends = set()
+            self.test_depends = set()
+
+    dag = qisys.test.test_sort.generate_dag(2000)
+    projects = [FakeProject(name, deps) for (name, deps) in dag.items()]
+    start = time.time()
+    graph = DepsGraph(projects, list())
+    for project in projects:
+        graph.get_sorted_names([project.name], ["build", "runtime", "test"])
+    elapsed = time.time() - start
+    print("Solved the dependencies of %i projects in %.3fs" % (len(projects), elapsed))
+    assert graph.get_reverse_names(["node0"], ["build"]) == \
+        sorted(x.name for x in projects if "node0" in x.build_depends)
+    assert elapsed < 30
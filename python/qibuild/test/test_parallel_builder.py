@@ -7,6 +7,9 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import pytest
+
+import qibuild.build
 import qibuild.parallel_builder
 
 
@@ -47,3 +50,119 @@ def test_simple():
     build_log = FakeProject.build_log
     assert is_before(build_log, "a", "c")
     assert is_before(build_log, "b", "c")
+
+
+def test_critical_path_first():
+    """ Jobs on the longest chain of dependencies are started first """
+    del FakeProject.build_log[:]
+    d = FakeProject("d")
+    a = FakeProject("a")
+    b = FakeProject("b", deps=["a"])
+    c = FakeProject("c", deps=["b"])
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([d, a, b, c])
+    builder.build(num_workers=1)
+    assert FakeProject.build_log[0] == "a"
+
+
+class BrokenProject(FakeProject):
+    """ A FakeProject that fails to build """
+
+    def build(self, *args, **kwargs):
+        """ Build """
+        raise Exception("Build failed")
+
+
+def test_failure():
+    """ A failing job stops the build and its dependants are never built """
+    del FakeProject.build_log[:]
+    a = BrokenProject("a")
+    b = FakeProject("b", deps=["a"])
+    c = FakeProject("c")
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([a, b, c])
+    with pytest.raises(qibuild.build.BuildFailed) as e:
+        builder.build(num_workers=2)
+    assert e.value.project.name == "a"
+    assert "b" not in FakeProject.build_log
+
+
+def test_critical_path_uses_build_times():
+    """ Chains are weighted by the duration of the previous builds """
+    a = FakeProject("a")
+    b = FakeProject("b", deps=["a"])
+    c = FakeProject("c")
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([a, b, c], build_times={"a": 1, "b": 2, "c": 10})
+    assert [x.project.name for x in builder.get_critical_path()] == ["c"]
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([a, b, c], build_times={"a": 1, "b": 20})
+    assert [x.project.name for x in builder.get_critical_path()] == ["a", "b"]
+
+
+class ConfigurableProject(FakeProject):
+    """
+    A FakeProject that writes to the output when configured, and
+    appends its name to configure_log once configured
+    """
+
+    def __init__(self, name, build_directory, configure_log, deps=None, test_deps=None,
+                 broken=False):
+        """ ConfigurableProject Init """
+        super(ConfigurableProject, self).__init__(name, deps=deps)
+        self.test_depends = test_deps or set()
+        self.build_directory = build_directory
+        self.configure_log = configure_log
+        self.broken = broken
+
+    def configure(self, output=None, **kwargs):
+        """ Configure """
+        output.write("configuring %s\n" % self.name)
+        if self.broken:
+            raise Exception("Configure failed")
+        self.configure_log.append(self.name)
+
+
+def test_configure_jobs(tmpdir):
+    """ Dependencies are configured first, the output ends up in configure.log """
+    configure_log = list()
+    a = ConfigurableProject("a", tmpdir.join("a").strpath, configure_log)
+    b = ConfigurableProject("b", tmpdir.join("b").strpath, configure_log)
+    c = ConfigurableProject("c", tmpdir.join("c").strpath, configure_log, deps=["a", "b"])
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([a, b, c], job_class=qibuild.parallel_builder.ConfigureJob)
+    builder.build(num_workers=2)
+    assert sorted(configure_log) == ["a", "b", "c"]
+    assert is_before(configure_log, "a", "c")
+    assert is_before(configure_log, "b", "c")
+    assert tmpdir.join("c", "configure.log").read() == "configuring c\n"
+
+
+def test_configure_failure(tmpdir, record_messages):
+    """ The original error is raised, and the output of CMake is displayed """
+    configure_log = list()
+    a = ConfigurableProject("a", tmpdir.join("a").strpath, configure_log, broken=True)
+    b = ConfigurableProject("b", tmpdir.join("b").strpath, configure_log, deps=["a"])
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([a, b], job_class=qibuild.parallel_builder.ConfigureJob)
+    with pytest.raises(Exception) as e:
+        builder.build(num_workers=2)
+    assert "Configure failed" in str(e.value)
+    assert record_messages.find("configuring a")
+    assert configure_log == list()
+
+
+def test_configure_waits_for_test_dependencies(tmpdir):
+    """ Test dependencies are configured first, but not built first """
+    configure_log = list()
+    gtest = ConfigurableProject("gtest", tmpdir.join("gtest").strpath, configure_log)
+    foo = ConfigurableProject("foo", tmpdir.join("foo").strpath, configure_log,
+                              test_deps=["gtest"])
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([gtest, foo], job_class=qibuild.parallel_builder.ConfigureJob)
+    assert [x.project.name for x in builder.get_critical_path()] == ["gtest", "foo"]
+    builder.build(num_workers=2)
+    assert configure_log == ["gtest", "foo"]
+    builder = qibuild.parallel_builder.ParallelBuilder()
+    builder.prepare_build_jobs([gtest, foo])
+    assert len(builder.get_critical_path()) == 1
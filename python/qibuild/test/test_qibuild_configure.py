@@ -42,6 +42,73 @@ def test_deps(qibuild_action):
     qibuild_action("configure", "-a")
 
 
+def test_configure_in_parallel(qibuild_action):
+    """ Test Configure In Parallel """
+    world_proj = qibuild_action.add_test_project("world")
+    hello_proj = qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello", "-J", "2")
+    for proj in [world_proj, hello_proj]:
+        assert os.path.exists(os.path.join(proj.build_directory, "CMakeCache.txt"))
+        assert os.path.exists(os.path.join(proj.build_directory, "configure.log"))
+
+
+def test_skip_unchanged(qibuild_action, record_messages):
+    """ Projects are only configured again when something changed """
+    world_proj = qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    record_messages.reset()
+    qibuild_action("configure", "hello")
+    assert record_messages.find("Nothing changed since last configure of")
+    assert os.path.exists(os.path.join(world_proj.build_directory, "CMakeCache.txt"))
+    # Changing a CMakeLists.txt, the flags, or using --force configures again
+    with open(os.path.join(world_proj.path, "CMakeLists.txt"), "a") as fp:
+        fp.write("\n# changed\n")
+    record_messages.reset()
+    qibuild_action("configure", "world")
+    assert not record_messages.find("Nothing changed")
+    record_messages.reset()
+    qibuild_action("configure", "world", "-DFOO=BAR")
+    assert not record_messages.find("Nothing changed")
+    record_messages.reset()
+    qibuild_action("configure", "world", "-DFOO=BAR", "--force")
+    assert not record_messages.find("Nothing changed")
+    record_messages.reset()
+    qibuild_action("configure", "world", "-DFOO=BAR")
+    assert record_messages.find("Nothing changed")
+
+
+def test_configure_again_when_dependencies_change(qibuild_action, qitoolchain_action,
+                                                  record_messages):
+    """ Changes in the -config.cmake files or in the toolchain packages are detected """
+    world_proj = qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    world_config = os.path.join(world_proj.sdk_directory, "cmake", "world-config.cmake")
+    with open(world_config, "a") as fp:
+        fp.write("\n# changed\n")
+    record_messages.reset()
+    qibuild_action("configure", "--single", "hello")
+    assert not record_messages.find("Nothing changed")
+    world_package = qibuild_action("package", "world")
+    qitoolchain_action("create", "foo")
+    qibuild.config.add_build_config("foo", toolchain="foo")
+    qitoolchain_action("add-package", "-c", "foo", world_package)
+    qibuild_action.build_worktree.worktree.remove_project("world", from_disk=True)
+    qibuild_action("configure", "-c", "foo", "hello")
+    record_messages.reset()
+    qibuild_action("configure", "-c", "foo", "hello")
+    assert record_messages.find("Nothing changed")
+    # Same path in the toolchain, new version
+    toolchain = qitoolchain.get_toolchain("foo")
+    package = toolchain.get_package("world")
+    package.version = "2.0"
+    toolchain.db.save()
+    record_messages.reset()
+    qibuild_action("configure", "-c", "foo", "hello")
+    assert not record_messages.find("Nothing changed")
+
+
 def test_single(qibuild_action, record_messages):
     """ Test Single """
     # We need to configure world at least once before testing anything
@@ -12,6 +12,7 @@ import os
 import qitest.project
 import qibuild.find
 import qibuild.config
+import qitoolchain
 from qibuild.test.conftest import QiBuildAction
 import qisys.command
 from qisys.test.conftest import skip_on_win
@@ -68,6 +69,18 @@ def test_devel_components_installed_by_default(qibuild_action, tmpdir):
     assert tmpdir.join("include").join("world").join("world.h").check()
 
 
+def test_install_in_parallel(qibuild_action, tmpdir):
+    """ Test Install In Parallel """
+    qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    qibuild_action("make", "hello")
+    installed = qibuild_action("install", "-J", "2", "hello", tmpdir.strpath)
+    assert tmpdir.join("include").join("world").join("world.h").check()
+    assert "include/world/world.h" in installed
+    assert qibuild.find.find_bin([tmpdir.strpath], "hello")
+
+
 def test_setting_prefix(qibuild_action, tmpdir):
     """ Test Setting Prefix """
     qibuild_action.add_test_project("world")
@@ -214,6 +227,20 @@ def test_json_merge_tests(qibuild_action, tmpdir):
     assert "ok" in test_names
 
 
+def test_json_tests_order_in_parallel(qibuild_action, tmpdir):
+    """ With -J, the tests are written in the order of the projects """
+    qibuild_action.add_test_project("testme")
+    qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "--all")
+    qibuild_action("make", "--all")
+    sequential = tmpdir.join("sequential")
+    parallel = tmpdir.join("parallel")
+    qibuild_action("install", "--all", "--with-tests", sequential.strpath)
+    qibuild_action("install", "--all", "--with-tests", "-J", "3", parallel.strpath)
+    assert parallel.join("qitest.json").read() == sequential.join("qitest.json").read()
+
+
 def test_do_not_write_tests_twice(qibuild_action, tmpdir):
     """ Test Do Not Write Tests Twice """
     qibuild_action.add_test_project("testme")
@@ -260,6 +287,33 @@ def test_no_packages(cd_to_tmpdir):
     assert not dest.join("lib", "libworld.so").check(file=True)
 
 
+def test_copy_strategy_for_packages(qibuild_action, qitoolchain_action, tmpdir):
+    """ Test Copy Strategy For Packages """
+    create_foo_toolchain_with_world_package(qibuild_action, qitoolchain_action)
+    qibuild_action("configure", "-c", "foo", "hello")
+    qibuild_action("make", "-c", "foo", "hello")
+    world_path = qitoolchain.get_toolchain("foo").get_package("world").path
+    dest = tmpdir.join("dest")
+    qibuild_action("install", "--config", "foo", "hello", dest.strpath)
+    assert not os.path.samefile(dest.join("lib", "libworld.so").strpath,
+                                os.path.join(world_path, "lib", "libworld.so"))
+    qibuild_action("install", "--config", "foo", "--copy-strategy", "hardlink",
+                   "hello", dest.strpath)
+    assert os.path.samefile(dest.join("lib", "libworld.so").strpath,
+                            os.path.join(world_path, "lib", "libworld.so"))
+
+
+def test_overlaps_between_packages_and_projects(qibuild_action, qitoolchain_action, tmpdir,
+                                               record_messages):
+    """ Files installed by both a package and a project are reported with -J """
+    create_foo_toolchain_with_world_package(qibuild_action, qitoolchain_action)
+    qibuild_action("configure", "-c", "foo", "hello")
+    qibuild_action("make", "-c", "foo", "hello")
+    dest = tmpdir.join("dest")
+    qibuild_action("install", "--config", "foo", "-J", "2", "hello", dest.strpath)
+    assert record_messages.find(r"share/qi/path.conf \(world, hello\)")
+
+
 def test_bin_sdk(qibuild_action, tmpdir):
     """ Test Bin SDK """
     qibuild_action.add_test_project("binsdk")
@@ -11,6 +11,7 @@ import pytest
 
 import qisys.command
 import qibuild.find
+import qibuild.build_times
 
 
 def test_running_from_build_dir(qibuild_action):
@@ -46,6 +47,24 @@ def test_running_from_build_dir_incremental(qibuild_action):
     qisys.command.call([hello])
 
 
+def test_print_critical_path(qibuild_action, record_messages):
+    """ Test Print Critical Path """
+    qibuild_action.add_test_project("world")
+    qibuild_action.add_test_project("hello")
+    qibuild_action("configure", "hello")
+    record_messages.reset()
+    qibuild_action("make", "hello", "--print-critical-path")
+    assert record_messages.find(r"world.*never built")
+    qibuild_action("make", "hello")
+    build_worktree = qibuild_action.build_worktree
+    build_times = qibuild.build_times.read_build_times(build_worktree)
+    assert sorted(build_times.keys()) == ["hello", "world"]
+    record_messages.reset()
+    qibuild_action("make", "hello", "--print-critical-path")
+    assert not record_messages.find("never built")
+    assert record_messages.find(r"\* hello")
+
+
 def test_using_host_tools_for_cross_compilation_no_system(qibuild_action, fake_ctc):
     """ Test Using Host Tools From Cross Compilation No System """
     qibuild_action.add_test_project("footool")
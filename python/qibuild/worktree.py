@@ -28,6 +28,8 @@ class BuildWorkTree(qisys.worktree.WorkTreeObserver):
         self.root = self.worktree.root
         self.build_config = qibuild.build_config.CMakeBuildConfig(self)
         self.build_projects = list()
+        # name -> BuildProject, rebuilt each time the projects are loaded
+        self._projects_by_name = dict()
         self._load_build_projects()
         worktree.register(self)
 
@@ -174,9 +176,9 @@ class BuildWorkTree(qisys.worktree.WorkTreeObserver):
 
     def get_build_project(self, name, raises=True):
         """ Get a :py:class:`.BuildProject` given its name. """
-        for build_project in self.build_projects:
-            if build_project.name == name:
-                return build_project
+        build_project = self._projects_by_name.get(name)
+        if build_project:
+            return build_project
         if raises:
             mess = ui.did_you_mean("No such qibuild project: %s" % name,
                                    name, [x.name for x in self.build_projects])
@@ -190,11 +192,14 @@ class BuildWorkTree(qisys.worktree.WorkTreeObserver):
     def _load_build_projects(self):
         """ Create BuildProject for every buildable project in the worktree. """
         self.build_projects = list()
+        self._projects_by_name = dict()
         for wt_project in self.worktree.projects:
             build_project = new_build_project(self, wt_project)
             if build_project:
                 self.check_unique_name(build_project)
                 self.build_projects.append(build_project)
+                self._projects_by_name[build_project.name] = build_project
+        self.worktree.qiproject_index.save()
 
     def configure_build_profile(self, name, flags):
         """ Configure a build profile for the worktree. """
@@ -221,9 +226,9 @@ class BuildWorkTree(qisys.worktree.WorkTreeObserver):
 
     def check_unique_name(self, new_project):
         """ Check Unique Name """
-        for project in self.build_projects:
-            if project.name == new_project.name:
-                raise Exception("""\
+        project = self._projects_by_name.get(new_project.name)
+        if project:
+            raise Exception("""\
 Found two projects with the same name ({project.name})
 In:
 * {project.path}
@@ -238,26 +243,62 @@ def new_build_project(build_worktree, project):
     """
     if not os.path.exists(project.qiproject_xml):
         return None
-    tree = qisys.qixml.read(project.qiproject_xml)
+    data = project.get_qiproject_data("qibuild", read_build_project_data)
+    if data is None:
+        return None
+    if not data["version3"]:
+        # qibuild2 used to check for a CMakeLists.txt
+        cmake_lists = os.path.join(project.path, "CMakeLists.txt")
+        if not os.path.exists(cmake_lists):
+            return None
+    build_project = qibuild.project.BuildProject(build_worktree, project)
+    build_project.name = data["name"]
+    build_project.version = data["version"]
+    build_project.build_depends = set(data["build_depends"])
+    build_project.run_depends = set(data["run_depends"])
+    build_project.test_depends = set(data["test_depends"])
+    build_project.host_depends = set(data["host_depends"])
+    return build_project
+
+
+def read_build_project_data(tree):
+    """
+    Read what is needed to create a BuildProject from the tree of a qiproject.xml,
+    as a json-serializable dict, or None if there is no BuildProject here
+    """
     root = tree.getroot()
-    if root.get("version") == "3":
+    version3 = root.get("version") == "3"
+    if version3:
         qibuild_elem = root.find("qibuild")
         if qibuild_elem is None:
             return None
     else:
-        # qibuild2 used to check for a CMakeLists.txt
-        cmake_lists = os.path.join(project.path, "CMakeLists.txt")
-        if not os.path.exists(cmake_lists):
-            return None
         qibuild_elem = root
     name = qibuild_elem.get("name")
     if not name:
         return None
-    build_project = qibuild.project.BuildProject(build_worktree, project)
-    build_project.name = name
-    build_project.version = qibuild_elem.get("version", "0.1")
-    qibuild.deps.read_deps_from_xml(build_project, qibuild_elem)
-    return build_project
+    deps = DepsHolder()
+    qibuild.deps.read_deps_from_xml(deps, qibuild_elem)
+    return {
+        "version3": version3,
+        "name": name,
+        "version": qibuild_elem.get("version", "0.1"),
+        "build_depends": sorted(deps.build_depends),
+        "run_depends": sorted(deps.run_depends),
+        "test_depends": sorted(deps.test_depends),
+        "host_depends": sorted(deps.host_depends),
+    }
+
+
+class DepsHolder(object):
+    """ Filled by :py:func:`qibuild.deps.read_deps_from_xml` """
+
+    def __init__(self):
+        """ DepsHolder Init """
+        self.build_depends = set()
+        self.run_depends = set()
+        self.test_depends = set()
+        self.host_depends = set()
 
 
 class BuildWorkTreeError(Exception):
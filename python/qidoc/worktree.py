@@ -25,18 +25,24 @@ class DocWorkTree(qisys.worktree.WorkTreeObserver):
         self.worktree = worktree
         self.root = worktree.root
         self.doc_projects = list()
+        # name -> doc project (template project excepted),
+        # rebuilt each time the projects are loaded
+        self._projects_by_name = dict()
         self._load_doc_projects()
         worktree.register(self)
 
     def _load_doc_projects(self):
         """ Load Doc Projects """
         self.doc_projects = list()
+        self._projects_by_name = dict()
         for worktree_project in self.worktree.projects:
             doc_project = new_doc_project(self, worktree_project)
             if doc_project:
                 if not isinstance(doc_project, TemplateProject):
                     self.check_unique_name(doc_project)
+                    self._projects_by_name[doc_project.name] = doc_project
                 self.doc_projects.append(doc_project)
+        self.worktree.qiproject_index.save()
 
     @property
     def template_project(self):
@@ -57,11 +63,9 @@ class DocWorkTree(qisys.worktree.WorkTreeObserver):
 
     def get_doc_project(self, name, raises=False):
         """ Get Doc Project """
-        for project in self.doc_projects:
-            if isinstance(project, TemplateProject):
-                continue
-            if project.name == name:
-                return project
+        project = self._projects_by_name.get(name)
+        if project:
+            return project
         if raises:
             mess = ui.did_you_mean("No such qidoc project: %s\n" % name,
                                    name, [x.name for x in self.doc_projects])
@@ -92,18 +96,40 @@ def new_doc_project(doc_worktree, project):
     qiproject_xml = project.qiproject_xml
     if not os.path.exists(qiproject_xml):
         return None
-    tree = qisys.qixml.read(project.qiproject_xml)
+    data = project.get_qiproject_data(
+        "qidoc", lambda tree: read_doc_project_data(tree, qiproject_xml))
+    if data is None:
+        return None
+    doc_type = data["type"]
+    if doc_type == "template":
+        return TemplateProject(doc_worktree, project)
+    if doc_type == "sphinx":
+        doc_project = SphinxProject(doc_worktree, project, data["name"], dest=data["dest"])
+    else:
+        doc_project = DoxygenProject(doc_worktree, project, data["name"], dest=data["dest"])
+    doc_project.depends.extend(data["depends"])
+    if data["prebuild_script"]:
+        doc_project.prebuild_script = data["prebuild_script"]
+    doc_project.examples = list(data["examples"])
+    if data["translated"]:
+        doc_project.translated = True
+        doc_project.linguas = list(data["linguas"])
+    return doc_project
+
+
+def read_doc_project_data(tree, qiproject_xml):
+    """
+    Read what is needed to create a doc project from the tree of a qiproject.xml,
+    as a json-serializable dict, or None if there is no doc project here
+    """
     root = tree.getroot()
     if root.get("version") == "3":
-        return _new_doc_project_3(doc_worktree, project)
-    return _new_doc_project_2(doc_worktree, project)
+        return _read_doc_project_data_3(root, qiproject_xml)
+    return _read_doc_project_data_2(root, qiproject_xml)
 
 
-def _new_doc_project_3(doc_worktree, project):
-    """ New Doc Project 3 """
-    qiproject_xml = project.qiproject_xml
-    tree = qisys.qixml.read(qiproject_xml)
-    root = tree.getroot()
+def _read_doc_project_data_3(root, qiproject_xml):
+    """ Read Doc Project Data 3 """
     qidoc_elem = root.find("qidoc")
     if qidoc_elem is None:
         return None
@@ -111,10 +137,10 @@ def _new_doc_project_3(doc_worktree, project):
     if doc_type is None:
         raise BadProjectConfig(qiproject_xml,
                                "Expecting a 'type' attribute")
-    return _new_doc_project(doc_worktree, project, qidoc_elem, doc_type)
+    return _read_doc_project_data(qidoc_elem, doc_type, qiproject_xml)
 
 
-def _new_doc_project_2(doc_worktree, project):
+def _read_doc_project_data_2(root, qiproject_xml):
     """
     Parse qidoc2 syntax in case the 'src' attribute is not used,
     else warn and suggest using `qidoc convert-worktree`.
@@ -122,11 +148,8 @@ def _new_doc_project_2(doc_worktree, project):
     # There is no way to be retro-compatible unless we parse
     # the 'src' attributes of 'spinxdoc' and 'doxygen' tags
     # in qisys.WorkTree ...
-    qiproject_xml = project.qiproject_xml
-    tree = qisys.qixml.read(qiproject_xml)
-    root = tree.getroot()
     if qisys.qixml.parse_bool_attr(root, "template_repo"):
-        return TemplateProject(doc_worktree, project)
+        return {"type": "template"}
     doc_elems = root.findall("sphinxdoc")
     doc_elems.extend(root.findall("doxydoc"))
     if not doc_elems:
@@ -140,39 +163,32 @@ def _new_doc_project_2(doc_worktree, project):
         doc_type = "sphinx"
     else:
         doc_type = "doxygen"
-    return _new_doc_project(doc_worktree, project, doc_elem, doc_type)
+    return _read_doc_project_data(doc_elem, doc_type, qiproject_xml)
 
 
-def _new_doc_project(doc_worktree, project, xml_elem, doc_type):
-    """ New Doc Project """
-    qiproject_xml = project.qiproject_xml
+def _read_doc_project_data(xml_elem, doc_type, qiproject_xml):
+    """ Read Doc Project Data """
     if doc_type == "template":
-        return TemplateProject(doc_worktree, project)
+        return {"type": "template"}
     name = xml_elem.get("name")
     if not name:
         raise BadProjectConfig(qiproject_xml,
                                "Expecting a 'name' attribute")
-    dest = xml_elem.get("dest")
-    doc_project = None
-    if doc_type == "sphinx":
-        doc_project = SphinxProject(doc_worktree, project, name, dest=dest)
-    elif doc_type == "doxygen":
-        doc_project = DoxygenProject(doc_worktree, project, name, dest=dest)
-    else:
+    if doc_type not in ["sphinx", "doxygen"]:
         raise BadProjectConfig(qiproject_xml,
                                "Unknown doc type: %s" % doc_type)
+    depends = list()
     depends_elem = xml_elem.findall("depends")
     for depend_elem in depends_elem:
         dep_name = depend_elem.get("name")
         if not dep_name:
             raise BadProjectConfig(qiproject_xml,
                                    "<depends> must have a 'name' attribute")
-        doc_project.depends.append(dep_name)
+        depends.append(dep_name)
+    prebuild_script = None
     prebuild = xml_elem.find("prebuild")
     if prebuild is not None:
-        script = prebuild.get("script")
-        if script:
-            doc_project.prebuild_script = script
+        prebuild_script = prebuild.get("script")
     examples = list()
     examples_elem = xml_elem.find("examples")
     if examples_elem is not None:
@@ -183,12 +199,20 @@ def _new_doc_project(doc_worktree, project, xml_elem, doc_type):
             else:
                 raise BadProjectConfig(qiproject_xml,
                                        "<example> must have a 'src' attribute")
-    doc_project.examples = examples
+    linguas = list()
     translate = xml_elem.find("translate")
     if translate is not None:
-        doc_project.translated = True
-        doc_project.linguas = qisys.qixml.parse_list_attr(translate, "linguas")
-    return doc_project
+        linguas = qisys.qixml.parse_list_attr(translate, "linguas")
+    return {
+        "type": doc_type,
+        "name": name,
+        "dest": xml_elem.get("dest"),
+        "depends": depends,
+        "prebuild_script": prebuild_script,
+        "examples": examples,
+        "translated": translate is not None,
+        "linguas": linguas,
+    }
 
 
 class BadProjectConfig(Exception):
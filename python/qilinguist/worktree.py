@@ -9,7 +9,6 @@ from __future__ import print_function
 
 import os
 
-import qisys.qixml
 import qisys.worktree
 from qisys import ui
 
@@ -22,17 +21,22 @@ class LinguistWorkTree(qisys.worktree.WorkTreeObserver):
         self.worktree = worktree
         self.root = worktree.root
         self.linguist_projects = list()
+        # name -> linguist project, rebuilt each time the projects are loaded
+        self._projects_by_name = dict()
         self._load_linguist_projects()
         worktree.register(self)
 
     def _load_linguist_projects(self):
         """ Load Linguist Projects """
         self.linguist_projects = list()
+        self._projects_by_name = dict()
         for worktree_project in self.worktree.projects:
             linguist_project = new_linguist_project(self, worktree_project)
             if linguist_project:
                 self.check_unique_name(linguist_project)
                 self.linguist_projects.append(linguist_project)
+                self._projects_by_name[linguist_project.name] = linguist_project
+        self.worktree.qiproject_index.save()
 
     def reload(self):
         """ Reload """
@@ -40,9 +44,9 @@ class LinguistWorkTree(qisys.worktree.WorkTreeObserver):
 
     def get_linguist_project(self, name, raises=False):
         """ Get Linguits Project """
-        for project in self.linguist_projects:
-            if project.name == name:
-                return project
+        project = self._projects_by_name.get(name)
+        if project:
+            return project
         if raises:
             mess = ui.did_you_mean("No such linguist project: %s" % name,
                                    name, [x.name for x in self.linguist_projects])
@@ -66,9 +70,29 @@ class LinguistWorkTree(qisys.worktree.WorkTreeObserver):
 
 def new_linguist_project(_linguist_worktree, project):
     """ New Linguist Project """
-    if not os.path.exists(project.qiproject_xml):
+    qiproject_xml = project.qiproject_xml
+    if not os.path.exists(qiproject_xml):
         return None
-    tree = qisys.qixml.read(project.qiproject_xml)
+    data = project.get_qiproject_data(
+        "qilinguist", lambda tree: read_linguist_project_data(tree, qiproject_xml))
+    if data is None:
+        return None
+    if data["tr"] == "linguist":
+        from qilinguist.qtlinguist import QtLinguistProject
+        new_project = QtLinguistProject(data["name"], project.path, domain=data["domain"],
+                                        linguas=list(data["linguas"]))
+    else:
+        from qilinguist.qigettext import GettextProject
+        new_project = GettextProject(data["name"], project.path, domain=data["domain"],
+                                     linguas=list(data["linguas"]))
+    return new_project
+
+
+def read_linguist_project_data(tree, qiproject_xml):
+    """
+    Read what is needed to create a linguist project from the tree of a qiproject.xml,
+    as a json-serializable dict, or None if there is no linguist project here
+    """
     root = tree.getroot()
     if root.get("version") != "3":
         return None
@@ -80,7 +104,7 @@ def new_linguist_project(_linguist_worktree, project):
             return None
     name = elem.get("name")
     if not name:
-        raise BadProjectConfig(project.qiproject_xml, "Expecting a 'name' attribute")
+        raise BadProjectConfig(qiproject_xml, "Expecting a 'name' attribute")
     domain = elem.get("domain")
     if not domain:
         domain = name
@@ -89,22 +113,14 @@ def new_linguist_project(_linguist_worktree, project):
         linguas = ["en_US"]
     tr_framework = elem.get("tr")
     if not tr_framework:
-        raise BadProjectConfig(project.qiproject_xml, "Expecting a 'tr' attribute")
+        raise BadProjectConfig(qiproject_xml, "Expecting a 'tr' attribute")
     if tr_framework not in ["linguist", "gettext"]:
         mess = """ \
 Unknow translation framework: {}.
 Choose between 'linguist' or 'gettext'
 """
         raise BadProjectConfig(mess.format(tr_framework))
-    if tr_framework == "linguist":
-        from qilinguist.qtlinguist import QtLinguistProject
-        new_project = QtLinguistProject(name, project.path, domain=domain,
-                                        linguas=linguas)
-    else:
-        from qilinguist.qigettext import GettextProject
-        new_project = GettextProject(name, project.path, domain=domain,
-                                     linguas=linguas)
-    return new_project
+    return {"name": name, "domain": domain, "linguas": linguas, "tr": tr_framework}
 
 
 class BadProjectConfig(Exception):
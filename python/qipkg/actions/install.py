@@ -18,6 +18,7 @@ def configure_parser(parser):
     parser.add_argument("--pkg", action="store_true", dest="pkg",
                         help="Generate and install .pkg files")
     parser.add_argument("dest")
+    qisys.parsers.copy_parser(parser)
     parser.set_defaults(pkg=False)
 
 
@@ -25,10 +26,11 @@ def do(args):
     """ Main entry point """
     pml_builder = qipkg.parsers.get_pml_builder(args)
     dest = args.dest
+    (copy_strategy, copy_jobs) = qisys.parsers.get_copy_options(args)
     if args.pkg:
         qisys.sh.mkdir(dest, recursive=True)
-        packages = pml_builder.package()
+        packages = pml_builder.package(copy_strategy=copy_strategy, copy_jobs=copy_jobs)
         for package in packages:
-            qisys.sh.install(package, dest)
+            qisys.sh.install(package, dest, strategy=copy_strategy)
     else:
-        pml_builder.install(dest)
+        pml_builder.install(dest, copy_strategy=copy_strategy, copy_jobs=copy_jobs)
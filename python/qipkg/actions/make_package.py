@@ -7,6 +7,7 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import qisys.parsers
 import qipkg.parsers
 import qipkg.metapackage
 
@@ -16,6 +17,8 @@ def configure_parser(parser):
     qipkg.parsers.pml_parser(parser)
     parser.add_argument("-o", "--output")
     qipkg.parsers.pkg_parser(parser)
+    qisys.parsers.compression_parser(parser)
+    qisys.parsers.copy_parser(parser)
 
 
 def do(args):
@@ -26,6 +29,11 @@ def do(args):
     with_toolchain = args.with_toolchain
     python_minify = args.python_minify
     pml_builder = qipkg.parsers.get_pml_builder(args)
+    (copy_strategy, copy_jobs) = qisys.parsers.get_copy_options(args)
     return pml_builder.package(output=output, with_breakpad=with_breakpad,
                                force=force, install_tc_packages=with_toolchain,
-                               python_minify=python_minify)
+                               python_minify=python_minify,
+                               compression_level=args.compression_level,
+                               compression_jobs=args.compression_jobs,
+                               copy_strategy=copy_strategy,
+                               copy_jobs=copy_jobs)
@@ -195,8 +195,14 @@ class PMLBuilder(object):
         for builder in self.builders:
             builder.build()
 
-    def install(self, destination, install_tc_packages=False, python_minify=False):
-        """ Install every project to the given destination """
+    def install(self, destination, install_tc_packages=False, python_minify=False,
+                copy_strategy="copy", copy_jobs=None):
+        """
+        Install every project to the given destination
+        :param copy_strategy: how the toolchain packages and the extra files
+                              are copied, see :py:func:`qisys.sh.install`
+        :param copy_jobs: number of threads copying files
+        """
         qisys.sh.mkdir(destination, recursive=True)
         # Copy the manifest
         qisys.sh.install(self.manifest_xml,
@@ -211,7 +217,8 @@ class PMLBuilder(object):
                 builder.dep_types = ["runtime"]
                 build_config = builder.build_config
                 builder.install(destination, components=["runtime"],
-                                install_tc_packages=install_tc_packages)
+                                install_tc_packages=install_tc_packages,
+                                copy_strategy=copy_strategy, copy_jobs=copy_jobs)
             else:
                 builder.install(destination)
         # Install self.pml_extra_files
@@ -221,12 +228,16 @@ class PMLBuilder(object):
             full_src = os.path.join(self.base_dir, src)
             rel_src = os.path.relpath(full_src, self.base_dir)
             full_dest = os.path.join(destination, rel_src)
-            qisys.sh.install(full_src, full_dest)
+            extension = os.path.splitext(rel_src)[1].strip().lower()
+            # Minified files are rewritten in place, and must not share
+            # their contents with the sources
+            minify = python_minify is True and extension == ".py"
+            qisys.sh.install(full_src, full_dest,
+                             strategy="copy" if minify else copy_strategy,
+                             num_jobs=copy_jobs)
             # Minify Python Files if requested
-            if python_minify is True:
-                extension = os.path.splitext(rel_src)[1].strip().lower()
-                if extension == ".py":
-                    minify_python(full_dest)
+            if minify:
+                minify_python(full_dest)
         # Generate and install translations
         ui.info(ui.bold, "-> Generating translations ...")
         pml_translator = qilinguist.pml_translator.PMLTranslator(self.pml_path)
@@ -243,6 +254,8 @@ class PMLBuilder(object):
         :param: with_breakpad generate debug symbols for usage with breakpad
         :param: force make package even if it does not satisfy default package requirements
         :param install_tc_packages also install toolchain packages
+        :param compression_level and compression_jobs see :py:func:`qisys.archive.compress`
+        :param copy_strategy and copy_jobs see :py:meth:`install`
         """
         output = kwargs.get('output', None)
         force = kwargs.get('force', False)
@@ -254,6 +267,10 @@ class PMLBuilder(object):
         strip_exe = kwargs.get('strip_exe', None)
         strip_args = kwargs.get('strip_args', None)
         build_config = kwargs.get('build_config', None)
+        compression_level = kwargs.get('compression_level', None)
+        compression_jobs = kwargs.get('compression_jobs', 0)
+        copy_strategy = kwargs.get('copy_strategy', "copy")
+        copy_jobs = kwargs.get('copy_jobs', None)
         build_target = None
         if self.cmake_builder and not build_config:
             build_config = self.cmake_builder.build_config
@@ -280,7 +297,8 @@ class PMLBuilder(object):
             ui.debug("With pkg name:", output)
 
         # Add everything from the staged path
-        self.install(self.stage_path, install_tc_packages=install_tc_packages, python_minify=python_minify)
+        self.install(self.stage_path, install_tc_packages=install_tc_packages, python_minify=python_minify,
+                     copy_strategy=copy_strategy, copy_jobs=copy_jobs)
         symbols_archive = None
         if with_breakpad and self.build_project:
             ui.info(ui.bold, "-> Generating breakpad symbols ...")
@@ -301,7 +319,8 @@ class PMLBuilder(object):
         ui.info(ui.bold, "-> Package generated in", output, "\n")
         ui.info(ui.bold, "-> Compressing package ...")
         qisys.archive.compress(self.stage_path, output=output, flat=True,
-                               display_progress=True)
+                               display_progress=True, level=compression_level,
+                               num_jobs=compression_jobs)
         qisys.sh.rm(self.stage_path)
         if symbols_archive:
             return [output, symbols_archive]
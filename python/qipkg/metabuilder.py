@@ -44,13 +44,16 @@ class MetaPMLBuilder(object):
                     "Building", pml_builder.pml_path)
             pml_builder.build()
 
-    def install(self, dest):
-        """ Install every project to the given destination """
+    def install(self, dest, **kwargs):
+        """
+        Install every project to the given destination
+        :param kwargs: passed to :py:meth:`qipkg.builder.PMLBuilder.install`
+        """
         n = len(self.pml_builders)
         for i, pml_builder in enumerate(self.pml_builders):
             ui.info(ui.green, "::", ui.reset, ui.bold, "[%i/%i]" % ((i + 1), n),
                     "Installing", pml_builder.pml_path)
-            pml_builder.install(dest)
+            pml_builder.install(dest, **kwargs)
 
     def deploy(self, url):
         """ Deploy every project to the given url """
@@ -68,12 +71,20 @@ class MetaPMLBuilder(object):
         # output = kwargs.get('output', None)
         force = kwargs.get('force', False)
         with_breakpad = kwargs.get('with_breakpad', False)
+        compression_level = kwargs.get('compression_level', None)
+        compression_jobs = kwargs.get('compression_jobs', 0)
+        copy_strategy = kwargs.get('copy_strategy', "copy")
+        copy_jobs = kwargs.get('copy_jobs', None)
         all_packages = list()
         n = len(self.pml_builders)
         for i, pml_builder in enumerate(self.pml_builders):
             ui.info(ui.green, "::", ui.reset, ui.bold, "[%i/%i]" % ((i + 1), n),
                     "Making package from", pml_builder.pml_path)
-            packages = pml_builder.package(with_breakpad=with_breakpad, force=force)
+            packages = pml_builder.package(with_breakpad=with_breakpad, force=force,
+                                           compression_level=compression_level,
+                                           compression_jobs=compression_jobs,
+                                           copy_strategy=copy_strategy,
+                                           copy_jobs=copy_jobs)
             if isinstance(packages, list):
                 all_packages.extend(packages)
             else:
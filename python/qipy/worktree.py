@@ -24,6 +24,8 @@ class PythonWorkTree(qisys.worktree.WorkTreeObserver):
         """ PythonWorkTree Init """
         self.worktree = worktree
         self.python_projects = list()
+        # name -> PythonProject, rebuilt each time the projects are loaded
+        self._projects_by_name = dict()
         self._load_python_projects()
         self.config = config
         worktree.register(self)
@@ -39,8 +41,8 @@ class PythonWorkTree(qisys.worktree.WorkTreeObserver):
 
     def _load_python_projects(self):
         """ Load Python Projects """
-        seen_names = dict()
         self.python_projects = list()
+        self._projects_by_name = dict()
         for project in self.worktree.projects:
             qiproject_xml = os.path.join(project.path, "qiproject.xml")
             if not os.path.exists(qiproject_xml):
@@ -48,21 +50,22 @@ class PythonWorkTree(qisys.worktree.WorkTreeObserver):
             new_project = new_python_project(self, project)
             if not new_project:
                 continue
-            if new_project.name in seen_names:
+            if new_project.name in self._projects_by_name:
                 mess = """ \
 Found two projects with the same name. (%s)
 %s
 %s
-""" % (new_project.name, seen_names[new_project.name], new_project.src)
+""" % (new_project.name, self._projects_by_name[new_project.name].src, new_project.src)
                 raise Exception(mess)
             self.python_projects.append(new_project)
-            seen_names[new_project.name] = new_project.src
+            self._projects_by_name[new_project.name] = new_project
+        self.worktree.qiproject_index.save()
 
     def get_python_project(self, name, raises=False):
         """ Get a Python project given its name """
-        for project in self.python_projects:
-            if project.name == name:
-                return project
+        project = self._projects_by_name.get(name)
+        if project:
+            return project
         if raises:
             mess = ui.did_you_mean("No such python project: %s" % name,
                                    name, [x.name for x in self.python_projects])
@@ -101,37 +104,66 @@ Found two projects with the same name. (%s)
 def new_python_project(worktree, project):
     """ New Python Project """
     qiproject_xml = project.qiproject_xml
-    tree = qisys.qixml.read(qiproject_xml)
+    data = project.get_qiproject_data(
+        "qipy", lambda tree: read_python_project_data(tree, qiproject_xml))
+    if data is None:
+        return None
+    python_project = qipy.project.PythonProject(worktree, project.src, data["name"])
+    for src in data["scripts"]:
+        python_project.scripts.append(qipy.project.Script(src))
+    for (name, src, qimodule) in data["modules"]:
+        module = qipy.project.Module(name, src)
+        module.qimodule = qimodule
+        python_project.modules.append(module)
+    for (name, src, qimodule) in data["packages"]:
+        package = qipy.project.Package(name, src)
+        package.qimodule = qimodule
+        python_project.packages.append(package)
+    if data["setup_with_distutils"] is not None:
+        python_project.setup_with_distutils = data["setup_with_distutils"]
+    return python_project
+
+
+def read_python_project_data(tree, qiproject_xml):
+    """
+    Read what is needed to create a PythonProject from the tree of a qiproject.xml,
+    as a json-serializable dict, or None if there is no python project here
+    """
     qipython_elem = tree.find("qipython")
     if qipython_elem is None:
         return None
     name = qisys.qixml.parse_required_attr(qipython_elem, "name",
                                            xml_path=qiproject_xml)
-    python_project = qipy.project.PythonProject(worktree, project.src, name)
+    scripts = list()
     script_elems = qipython_elem.findall("script")
     for script_elem in script_elems:
         src = qisys.qixml.parse_required_attr(script_elem, "src",
                                               xml_path=qiproject_xml)
-        script = qipy.project.Script(src)
-        python_project.scripts.append(script)
+        scripts.append(src)
+    modules = list()
     module_elems = qipython_elem.findall("module")
     for module_elem in module_elems:
         src = module_elem.get("src", "")
-        name = qisys.qixml.parse_required_attr(module_elem, "name",
-                                               xml_path=qiproject_xml)
-        module = qipy.project.Module(name, src)
-        module.qimodule = qisys.qixml.parse_bool_attr(module_elem, "qimodule")
-        python_project.modules.append(module)
+        module_name = qisys.qixml.parse_required_attr(module_elem, "name",
+                                                      xml_path=qiproject_xml)
+        qimodule = qisys.qixml.parse_bool_attr(module_elem, "qimodule")
+        modules.append([module_name, src, qimodule])
+    packages = list()
     package_elems = qipython_elem.findall("package")
     for package_elem in package_elems:
-        name = qisys.qixml.parse_required_attr(package_elem, "name",
-                                               xml_path=qiproject_xml)
+        package_name = qisys.qixml.parse_required_attr(package_elem, "name",
+                                                       xml_path=qiproject_xml)
         src = package_elem.get("src", "")
-        package = qipy.project.Package(name, src)
-        package.qimodule = qisys.qixml.parse_bool_attr(package_elem, "qimodule")
-        python_project.packages.append(package)
+        qimodule = qisys.qixml.parse_bool_attr(package_elem, "qimodule")
+        packages.append([package_name, src, qimodule])
+    setup_with_distutils = None
     setup_elem = qipython_elem.find("setup")
     if setup_elem is not None:
-        python_project.setup_with_distutils = \
-            qisys.qixml.parse_bool_attr(setup_elem, "with_distutils")
-    return python_project
+        setup_with_distutils = qisys.qixml.parse_bool_attr(setup_elem, "with_distutils")
+    return {
+        "name": name,
+        "scripts": scripts,
+        "modules": modules,
+        "packages": packages,
+        "setup_with_distutils": setup_with_distutils,
+    }
@@ -6,6 +6,7 @@
 Run the same command on each source project.
 Example:
     qisrc foreach -- git reset --hard origin/mytag
+    qisrc foreach -j 8 --timeout 3600 -- git gc
 Use -- to seprate qisrc arguments from the arguments of the command.
 """
 from __future__ import absolute_import
@@ -28,6 +29,7 @@ def configure_parser(parser):
     parser.add_argument("command", metavar="COMMAND", nargs="+")
     parser.add_argument("-c", "--ignore-errors", "--continue",
                         action="store_true", help="continue on error")
+    qisys.parsers.foreach_parser(parser)
     parser.set_defaults(git_only=True)
 
 
@@ -40,4 +42,6 @@ def do(args):
         worktree = qisys.parsers.get_worktree(args)
         projects = worktree.projects
     qisys.actions.foreach(projects, args.command,
-                          ignore_errors=args.ignore_errors)
+                          ignore_errors=args.ignore_errors,
+                          num_jobs=args.num_jobs, stream=args.stream,
+                          timeout=args.timeout)
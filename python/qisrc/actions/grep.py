@@ -6,19 +6,33 @@
 Run git grep on every project
 Options are the same as in git grep, e.g.:
   qisrc grep -- -niC2 foo
+Use -j to look in several projects at once, matches are then
+displayed as soon as a project is done, prefixed with the project src:
+  qisrc grep -j8 --max-matches 20 -- -n foo
 """
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
+import re
 import sys
 
 import qisrc.git
 import qisrc.parsers
 import qibuild.parsers
+import qisys.parallel
+import qisys.parsers
 from qisys import ui
 
+# Colors forced when running git grep in parallel, so that file names
+# and separators (':' for matches, '-' and '=' for context) can be
+# found in the output, whatever the user configuration is
+GREP_COLORS = ["color.grep.filename=magenta", "color.grep.separator=cyan"]
+FILENAME_RE = re.compile(r"^(\x1b\[35m)(.*?)(\x1b\[m)")
+SEPARATOR_RE = re.compile(r"\x1b\[36m([:=-]+)\x1b\[m")
+COLOR_RE = re.compile(r"\x1b\[[0-9;]*m")
+
 
 def configure_parser(parser):
     """ Configure parser for this action. """
@@ -26,6 +40,9 @@ def configure_parser(parser):
     qibuild.parsers.project_parser(parser, positional=False)
     parser.add_argument("--path", help="type of patch to print",
                         default="project", choices=['none', 'absolute', 'worktree', 'project'])
+    qisys.parsers.parallel_parser(parser, default=1)
+    parser.add_argument("--max-matches", type=int, metavar="N",
+                        help="stop looking in other projects after N matching lines")
     parser.add_argument("git_grep_opts", metavar="-- git grep options", nargs="+",
                         help="git grep options preceded with -- to escape the leading '-'")
 
@@ -35,6 +52,13 @@ def do(args):
     git_worktree = qisrc.parsers.get_git_worktree(args)
     git_projects = qisrc.parsers.get_git_projects(git_worktree, args, default_all=True,
                                                   use_build_deps=args.use_deps)
+    if not git_projects:
+        qisrc.worktree.on_no_matching_projects(git_worktree, groups=args.groups)
+        sys.exit(0)
+    if args.num_jobs != 1 or args.max_matches:
+        retcode = grep_parallel(git_projects, args.git_grep_opts, args.path,
+                                num_jobs=args.num_jobs, max_matches=args.max_matches)
+        sys.exit(retcode)
     git_grep_opts = args.git_grep_opts
     if args.path == 'none':
         git_grep_opts.insert(0, "-h")
@@ -45,9 +69,32 @@ def do(args):
             git_grep_opts.insert(0, "--null")
     if ui.config_color(sys.stdout):
         git_grep_opts.insert(0, "--color=always")
-    if not git_projects:
-        qisrc.worktree.on_no_matching_projects(git_worktree, groups=args.groups)
-        sys.exit(0)
+    retcode = grep_sequential(git_projects, git_grep_opts, args.path)
+    sys.exit(retcode)
+
+
+def grep_project(project, git_grep_opts, path):
+    """
+    Run git grep in one project
+    :returns: a tuple (status, output)
+    """
+    git = qisrc.git.Git(project.path)
+    (status, out) = git.call("grep", *git_grep_opts, raises=False)
+    if out != "":
+        if path == 'absolute' or path == 'worktree':
+            lines = out.splitlines()
+            out_lines = list()
+            for line in lines:
+                line_split = line.split('\0')
+                prepend = project.src if path == 'worktree' else project.path
+                line_split[0] = os.path.join(prepend, line_split[0])
+                out_lines.append(":".join(line_split))
+            out = '\n'.join(out_lines)
+    return status, out
+
+
+def grep_sequential(git_projects, git_grep_opts, path):
+    """ Look in each project, one after the other. Return the exit code """
     max_src = max(len(x.src) for x in git_projects)
     retcode = 1
     for i, project in enumerate(git_projects):
@@ -55,21 +102,91 @@ def do(args):
                       ui.green, "Looking in",
                       ui.blue, project.src.ljust(max_src),
                       end="\r")
-        git = qisrc.git.Git(project.path)
-        (status, out) = git.call("grep", *git_grep_opts, raises=False)
+        (status, out) = grep_project(project, git_grep_opts, path)
         if out != "":
-            if args.path == 'absolute' or args.path == 'worktree':
-                lines = out.splitlines()
-                out_lines = list()
-                for line in lines:
-                    line_split = line.split('\0')
-                    prepend = project.src if args.path == 'worktree' else project.path
-                    line_split[0] = os.path.join(prepend, line_split[0])
-                    out_lines.append(":".join(line_split))
-                out = '\n'.join(out_lines)
             ui.info("\n", ui.reset, out)
         if status == 0:
             retcode = 0
     if not out:
         ui.info(ui.reset)
-    sys.exit(retcode)
+    return retcode
+
+
+def find_matches(project, git_grep_opts, path, color=False):
+    """
+    Run git grep in one project, with file names relative to the worktree
+    (or absolute) unless path is 'none'
+    :returns: a tuple (status, lines), where lines is a list of
+              (line, is_match) tuples, is_match being False for context
+              lines and group separators
+    """
+    # File names are always asked for, even when path is 'none': without
+    # them (and without -n) nothing tells a match from a context line
+    opts = ["--color=always", "-H"]
+    if path == 'absolute' or path == 'worktree':
+        opts.append("-I")
+    args = list()
+    for config in GREP_COLORS:
+        args.extend(["-c", config])
+    args.append("grep")
+    args.extend(opts)
+    args.extend(git_grep_opts)
+    git = qisrc.git.Git(project.path)
+    (status, out) = git.call(*args, raises=False)
+    lines = list()
+    for line in out.splitlines():
+        separator = SEPARATOR_RE.search(line)
+        is_match = separator is not None and separator.group(1) == ":"
+        match = FILENAME_RE.match(line)
+        if match and path == 'none':
+            line = line[match.end():]
+            separator = SEPARATOR_RE.match(line)
+            if separator:
+                line = line[separator.end():]
+        elif match:
+            prepend = project.path if path == 'absolute' else project.src
+            filename = os.path.join(prepend, match.group(2))
+            line = match.group(1) + filename + match.group(3) + line[match.end():]
+        if not color:
+            line = COLOR_RE.sub("", line)
+        lines.append((line, is_match))
+    return status, lines
+
+
+def grep_parallel(git_projects, git_grep_opts, path, num_jobs=1, max_matches=None):
+    """
+    Look in num_jobs projects at once, displaying the matches of each
+    project as soon as it is done, and stopping after max_matches
+    matching lines. Return the exit code
+    """
+    color = ui.config_color(sys.stdout)
+
+    def grep(project):
+        """ Look in one project """
+        return find_matches(project, git_grep_opts, path, color=color)
+
+    retcode = 1
+    num_matches = 0
+    results = qisys.parallel.imap(git_projects, grep, n_jobs=num_jobs, ordered=False)
+    try:
+        for result in results:
+            if not result.ok:
+                raise result.exception
+            (status, lines) = result.value
+            if status == 0:
+                retcode = 0
+            to_print = list()
+            for (line, is_match) in lines:
+                if max_matches and num_matches >= max_matches:
+                    break
+                to_print.append(line)
+                if is_match:
+                    num_matches += 1
+            if to_print:
+                ui.info(ui.reset, "\n".join(to_print))
+            if max_matches and num_matches >= max_matches:
+                ui.info(ui.brown, "Stopping after", max_matches, "matches")
+                break
+    finally:
+        results.close()
+    return retcode
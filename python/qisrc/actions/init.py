@@ -22,6 +22,7 @@ def configure_parser(parser):
     """ Configure parser for this action """
     qisys.parsers.worktree_parser(parser)
     qisrc.parsers.groups_parser(parser)
+    qisys.parsers.parallel_parser(parser, default=1)
     parser.add_argument("manifest_url", nargs="?")
     parser.add_argument("-b", "--branch", dest="branch",
                         help="Use this branch for the manifest")
@@ -46,7 +47,8 @@ def do(args):
                                              groups=args.groups,
                                              branch=args.branch,
                                              review=args.review,
-                                             all_repos=args.all)
+                                             all_repos=args.all,
+                                             num_jobs=args.num_jobs)
         if not ok:
             sys.exit(1)
     ui.info(ui.green, "New qisrc worktree initialized in",
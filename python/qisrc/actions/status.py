@@ -20,6 +20,7 @@ def configure_parser(parser):
     """ Configure parser for this action """
     qisys.parsers.worktree_parser(parser)
     qisys.parsers.project_parser(parser)
+    qisys.parsers.parallel_parser(parser)
     group = parser.add_argument_group("qisrc status options")
     group.add_argument("--untracked-files", "-u",
                        dest="untracked_files",
@@ -44,16 +45,21 @@ def do(args):
         return
     num_projs = len(git_projects)
     max_len = max(len(p.src) for p in git_projects)
-    state_projects = list()
-    for (i, git_project) in enumerate(git_projects, start=1):
+
+    def on_progress(i, num_projs, result):
+        """ Display the projects as they are checked """
         if sys.stdout.isatty():
-            src = git_project.src
-            to_write = "Checking (%d/%d) " % (i, num_projs)
+            src = result.item.src
+            to_write = "Checking (%d/%d) " % (i + 1, num_projs)
             to_write += src.ljust(max_len)
             sys.stdout.write(to_write + "\r")
             sys.stdout.flush()
-        state_project = qisrc.status.check_state(git_project, args.untracked_files)
-        state_projects.append(state_project)
+
+    states = qisrc.status.iter_states(git_projects, args.untracked_files,
+                                      num_jobs=args.num_jobs, on_progress=on_progress)
+    # Projects are checked in parallel, display them in the usual order
+    position = dict((p.src, i) for (i, p) in enumerate(git_projects))
+    state_projects = sorted(states, key=lambda x: position[x.project.src])
     if sys.stdout.isatty():
         ui.info("Checking (%d/%d):" % (num_projs, num_projs), "done",
                 " " * max_len)
@@ -12,7 +12,6 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import sys
-import threading
 
 import qisrc.git
 import qisrc.sync
@@ -56,7 +55,7 @@ def do(args):
     """ Main entry point """
     reset = args.reset
     git_worktree = qisrc.parsers.get_git_worktree(args)
-    sync_ok = git_worktree.sync()
+    sync_ok = git_worktree.sync(num_jobs=args.num_jobs)
     if not sync_ok:
         sys.exit(1)
     git_projects = qisrc.parsers.get_git_projects(git_worktree, args,
@@ -70,31 +69,36 @@ def do(args):
     failed = list()
     ui.info(ui.green, ":: Syncing projects ...")
     max_src = max(len(x.src) for x in git_projects)
-    # wrap with a list to sidestep problem described in
-    # https://www.python.org/dev/peps/pep-3104/
-    i = [0]
-    lock = threading.Lock()
 
     def do_sync(git_project):
         """ Do Sync """
         if reset:
-            (status, out) = git_project.reset()
-        else:
-            (status, out) = git_project.sync(rebase_devel=args.rebase_devel)
-        with lock:
-            ui.info_count(i[0], len(git_projects),
-                          ui.blue, git_project.src.ljust(max_src))
-            if status is None:
-                ui.info(git_project.src, ui.brown, "  [skipped]")
-                skipped.append((git_project.src, out))
-            if status is False:
-                ui.info(git_project.src, ui.red, "  [failed]")
-                failed.append((git_project.src, out))
-            if out:
-                ui.info(ui.indent(out + "\n\n", num=2))
-            i[0] += 1
+            return git_project.reset()
+        return git_project.sync(rebase_devel=args.rebase_devel)
 
-    qisys.parallel.foreach(git_projects, do_sync, n_jobs=args.num_jobs)
+    def on_progress(i, total, result):
+        """ Called in the main thread each time a project is synced """
+        git_project = result.item
+        ui.info_count(i, total,
+                      ui.blue, git_project.src.ljust(max_src))
+        if not result.ok:
+            ui.info(git_project.src, ui.red, "  [failed]")
+            failed.append((git_project.src, str(result.exception)))
+            ui.info(ui.indent(result.traceback + "\n", num=2))
+            return
+        (status, out) = result.value
+        if status is None:
+            ui.info(git_project.src, ui.brown, "  [skipped]")
+            skipped.append((git_project.src, out))
+        if status is False:
+            ui.info(git_project.src, ui.red, "  [failed]")
+            failed.append((git_project.src, out))
+        if out:
+            ui.info(ui.indent(out + "\n\n", num=2))
+
+    for _ in qisys.parallel.imap(git_projects, do_sync, n_jobs=args.num_jobs,
+                                 ordered=False, on_progress=on_progress):
+        pass
     print_overview(len(git_projects), len(skipped), len(failed))
     if failed or skipped:
         sys.exit(1)
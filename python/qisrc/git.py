@@ -8,6 +8,7 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
+import re
 import functools
 import contextlib
 import subprocess
@@ -17,6 +18,9 @@ import qisys
 import qisys.command
 from qisys import ui
 
+# Version of the git executable, only read once
+_GIT_VERSION = list()
+
 
 class Git(object):
     """ The Git represent a git tree """
@@ -530,6 +534,27 @@ class Git(object):
         return "<Git repo in %s>" % self.repo
 
 
+def get_git_version():
+    """
+    Return the version of git as a tuple of ints,
+    for instance (2, 11, 0), or None if it could not be read
+    """
+    if not _GIT_VERSION:
+        version = None
+        try:
+            git = qisys.command.find_program("git") or "git"
+            out = qisys.command.check_output([git, "--version"])
+            if isinstance(out, bytes):
+                out = out.decode("utf-8", "replace")
+            match = re.search(r"(\d+)\.(\d+)(?:\.(\d+))?", out)
+            if match:
+                version = tuple(int(x or 0) for x in match.groups())
+        except Exception as e:
+            ui.debug("Could not get git version:", e)
+        _GIT_VERSION.append(version)
+    return _GIT_VERSION[0]
+
+
 def get_repo_root(path):
     """
     Return the root dir of a git worktree given a path.
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+"""
+Local bare mirrors of the remote repositories, shared by every
+worktree of the machine.
+
+New clones borrow the objects of the mirror, so that only what is
+missing from the mirror is downloaded, then stop depending on it
+(like ``git clone --reference <mirror> --dissociate``).
+
+Disabled by default, set QISRC_MIRRORS to a directory to enable it,
+or to "1" to use ~/.cache/qi/git-mirrors
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import re
+import hashlib
+import threading
+
+import qisys.sh
+import qisrc.git
+from qisys import ui
+
+# Mirrors already fetched by this process, so that each of them is
+# fetched at most once per `qisrc init` or `qisrc sync`
+_UPDATED = set()
+_URL_LOCKS = dict()
+_LOCK = threading.Lock()
+
+
+def get_mirrors_root():
+    """ Where to put the mirrors, or None if mirrors are disabled """
+    value = os.environ.get("QISRC_MIRRORS")
+    if not value or value.lower() in ["0", "false", "off"]:
+        return None
+    if value.lower() in ["1", "true", "on"]:
+        return qisys.sh.get_cache_path("qi", "git-mirrors")
+    return qisys.sh.to_native_path(value)
+
+
+def get_mirror_path(clone_url, mirrors_root=None):
+    """ Path to the bare mirror of the given url """
+    if mirrors_root is None:
+        mirrors_root = get_mirrors_root()
+    if mirrors_root is None:
+        return None
+    # Readable, but hashed so that different urls never collide
+    digest = hashlib.sha1(clone_url.encode("utf-8")).hexdigest()[:8]
+    name = re.sub(r"[^A-Za-z0-9.-]+", "_", clone_url.split("://")[-1]).strip("_.")
+    return os.path.join(mirrors_root, "%s-%s.git" % (name[-64:], digest))
+
+
+def update_mirror(clone_url):
+    """
+    Create or refresh the mirror of the given url.
+    Can be called from several threads at once, the mirror is
+    only fetched once per process.
+    :returns: the path to the mirror, or None if it is not usable
+    """
+    mirror_path = get_mirror_path(clone_url)
+    if not mirror_path:
+        return None
+    with _LOCK:
+        url_lock = _URL_LOCKS.setdefault(clone_url, threading.Lock())
+    with url_lock:
+        if clone_url in _UPDATED:
+            return _usable(mirror_path)
+        _UPDATED.add(clone_url)
+        if os.path.exists(mirror_path):
+            git = qisrc.git.Git(mirror_path)
+            rc, out = git.call("fetch", "--prune", "--quiet", raises=False)
+            if rc != 0:
+                ui.debug("Could not update mirror", mirror_path, ":\n", out)
+        else:
+            _create_mirror(clone_url, mirror_path)
+    return _usable(mirror_path)
+
+
+def _create_mirror(clone_url, mirror_path):
+    """
+    Clone the mirror in a temporary directory, then rename it, so that
+    other processes never see a half-cloned mirror.
+    """
+    parent = os.path.dirname(mirror_path)
+    qisys.sh.mkdir(parent, recursive=True)
+    tmp_path = "%s.tmp%i" % (mirror_path, os.getpid())
+    git = qisrc.git.Git(parent)
+    rc, out = git.call("clone", "--mirror", "--quiet", clone_url, tmp_path,
+                       cwd=parent, raises=False)
+    if rc != 0:
+        ui.debug("Could not create mirror of", clone_url, ":\n", out)
+        qisys.sh.rm(tmp_path)
+        return
+    try:
+        os.rename(tmp_path, mirror_path)
+    except OSError:
+        # Created by an other process in the mean time
+        qisys.sh.rm(tmp_path)
+
+
+def _usable(mirror_path):
+    """ Return mirror_path if it contains an object store """
+    if os.path.isdir(os.path.join(mirror_path, "objects")):
+        return mirror_path
+    return None
+
+
+def borrow_objects(git, mirror_path):
+    """
+    Make the repository use the objects of the mirror, as
+    ``git clone --reference`` does. Must be called before fetching.
+    """
+    alternates = _alternates_path(git)
+    qisys.sh.mkdir(os.path.dirname(alternates), recursive=True)
+    objects = qisys.sh.to_posix_path(os.path.join(mirror_path, "objects"))
+    with open(alternates, "w") as fp:
+        fp.write(objects + "\n")
+
+
+def dissociate(git):
+    """
+    Copy the objects borrowed from the mirror in the repository,
+    then stop using the mirror, as ``git clone --dissociate`` does,
+    so that removing the cache never breaks a worktree.
+    """
+    alternates = _alternates_path(git)
+    if not os.path.exists(alternates):
+        return
+    rc, out = git.call("repack", "-a", "-d", "-q", raises=False)
+    if rc != 0:
+        # Still usable, as long as the mirror is there
+        ui.warning("Could not copy objects from mirror in", git.repo, ":\n", out)
+        return
+    os.remove(alternates)
+
+
+def _alternates_path(git):
+    """ Path to the alternates file of the repository """
+    return os.path.join(git.repo, ".git", "objects", "info", "alternates")
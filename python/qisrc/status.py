@@ -7,7 +7,10 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import os
+
 import qisrc.git
+import qisys.parallel
 from qisys import ui
 
 
@@ -15,15 +18,12 @@ def stat_tracking_remote(git, branch, tracking):
     """ Check if branch is ahead and / or behind tracking. """
     if branch is None or tracking is None:
         return 0, 0
-    _, local_ref = git.call("rev-parse", branch, raises=False)
-    _, remote_ref = git.call("rev-parse", tracking, raises=False)
-    return stat_ahead_behind(git, local_ref, remote_ref)
+    return stat_ahead_behind(git, branch, tracking)
 
 
 def stat_fixed_ref(git, remote_ref):
     """ Check is HEAD is and and / or behind given ref. """
-    _, local_ref = git.call("rev-parse", "HEAD", raises=False)
-    return stat_ahead_behind(git, local_ref, remote_ref)
+    return stat_ahead_behind(git, "HEAD", remote_ref)
 
 
 def stat_ahead_behind(git, local_ref, remote_ref):
@@ -31,17 +31,87 @@ def stat_ahead_behind(git, local_ref, remote_ref):
     Returns a tuple (ahead, behind) describing how far
     from the remote ref the local ref is.
     """
-    behind = 0
-    ahead = 0
-    (ret, out) = git.call("rev-list", "--left-right",
-                          "%s..%s" % (remote_ref, local_ref), raises=False)
-    if ret == 0:
-        ahead = len(out.split())
-    (ret, out) = git.call("rev-list", "--left-right",
-                          "%s..%s" % (local_ref, remote_ref), raises=False)
-    if ret == 0:
-        behind = len(out.split())
-    return ahead, behind
+    (ret, out) = git.call("rev-list", "--left-right", "--count",
+                          "%s...%s" % (remote_ref, local_ref), raises=False)
+    if ret != 0:
+        return 0, 0
+    behind, ahead = out.split()
+    return int(ahead), int(behind)
+
+
+def parse_porcelain_v2(out):
+    """
+    Parse the output of ``git status --porcelain=v2 --branch``.
+    Return a dict with the keys 'head' (None when not on a branch),
+    'upstream', 'ahead', 'behind' (None when there is no upstream),
+    and 'lines', the changes in the ``git status --porcelain`` format.
+    """
+    res = {"head": None, "upstream": None, "ahead": None, "behind": None, "lines": list()}
+    for line in out.splitlines():
+        if line.startswith("# "):
+            words = line.split()
+            if words[1] == "branch.head" and words[2] != "(detached)":
+                res["head"] = words[2]
+            elif words[1] == "branch.upstream":
+                res["upstream"] = words[2]
+            elif words[1] == "branch.ab":
+                res["ahead"] = int(words[2])
+                res["behind"] = -int(words[3])
+        elif line.startswith(("1 ", "u ")):
+            fields = line.split(" ", 10 if line[0] == "u" else 8)
+            res["lines"].append(_porcelain_v1_line(fields[1], fields[-1]))
+        elif line.startswith("2 "):
+            fields = line.split(" ", 9)
+            path, orig_path = fields[-1].split("\t", 1)
+            res["lines"].append(_porcelain_v1_line(fields[1], "%s -> %s" % (orig_path, path)))
+        elif line.startswith(("? ", "! ")):
+            res["lines"].append(line[0] * 2 + line[1:])
+    return res
+
+
+def parse_porcelain_v1(out):
+    """
+    Parse the output of ``git status --porcelain --branch``, for versions
+    of git too old to know about ``--porcelain=v2`` (before 2.11).
+    Return the same dict as :py:func:`parse_porcelain_v2`.
+    """
+    res = {"head": None, "upstream": None, "ahead": None, "behind": None, "lines": list()}
+    for line in out.splitlines():
+        if not line.startswith("## "):
+            if line:
+                res["lines"].append(line)
+            continue
+        head = line[3:]
+        info = ""
+        if head.endswith("]") and " [" in head:
+            head, info = head[:-1].split(" [", 1)
+        if head.startswith("HEAD (no branch)"):
+            continue
+        for prefix in ["Initial commit on ", "No commits yet on "]:
+            if head.startswith(prefix):
+                head = head[len(prefix):]
+        if "..." in head:
+            head, res["upstream"] = head.split("...", 1)
+            if info != "gone":
+                res["ahead"], res["behind"] = 0, 0
+                for word in info.split(", "):
+                    if word.startswith("ahead "):
+                        res["ahead"] = int(word.split()[1])
+                    elif word.startswith("behind "):
+                        res["behind"] = int(word.split()[1])
+        res["head"] = head
+    return res
+
+
+def supports_porcelain_v2():
+    """ ``git status --porcelain=v2`` was added in git 2.11 """
+    version = qisrc.git.get_git_version()
+    return version is None or version >= (2, 11)
+
+
+def _porcelain_v1_line(xy_code, path):
+    """ Format a change the way ``git status --porcelain`` does """
+    return "%s %s" % (xy_code.replace(".", " "), path)
 
 
 class ProjectState(object):
@@ -76,20 +146,35 @@ class ProjectState(object):
 
 
 def check_state(project, untracked):
-    """ Check and register the state of a project. """
+    """
+    Check and register the state of a project.
+    Most of the information comes from a single call to ``git status``.
+    """
     state_project = ProjectState(project)
     git = qisrc.git.Git(project.path)
-    if not git.is_valid():
+    if not os.path.isdir(project.path):
+        state_project.valid = False
+        return state_project
+    porcelain_v2 = supports_porcelain_v2()
+    args = ["--porcelain=v2" if porcelain_v2 else "--porcelain", "--branch"]
+    if not untracked:
+        args.append("--untracked-files=no")
+    (ret, out) = git.status(*args, raises=False)
+    if ret != 0:
         state_project.valid = False
         return state_project
-    state_project.clean = git.is_clean(untracked=untracked)
+    if porcelain_v2:
+        git_status = parse_porcelain_v2(out)
+    else:
+        git_status = parse_porcelain_v1(out)
+    state_project.clean = not git_status["lines"]
     if project.fixed_ref:
         state_project.ahead, state_project.behind = stat_fixed_ref(git, project.fixed_ref)
         state_project.fixed_ref = project.fixed_ref
-        _set_status(git, state_project, untracked=untracked)
+        _set_status(git_status, state_project)
         return state_project
-    state_project.current_branch = git.get_current_branch()
-    state_project.tracking = git.get_tracking_branch()
+    state_project.current_branch = git_status["head"]
+    state_project.tracking = git_status["upstream"]
     if project.default_remote and project.default_branch:
         state_project.manifest_branch = "%s/%s" % (project.default_remote.name, project.default_branch.name)
     if state_project.current_branch is None:
@@ -98,27 +183,40 @@ def check_state(project, untracked):
     if project.default_branch:
         if state_project.current_branch != project.default_branch.name:
             state_project.incorrect_proj = True
-    (state_project.ahead, state_project.behind) = stat_tracking_remote(
-        git,
-        state_project.current_branch,
-        state_project.tracking)
+    if git_status["ahead"] is not None:
+        state_project.ahead = git_status["ahead"]
+        state_project.behind = git_status["behind"]
     if state_project.incorrect_proj:
         (state_project.ahead_manifest, state_project.behind_manifest) = stat_tracking_remote(
-            git, state_project.current_branch, "%s/%s" % (
-                project.default_remote.name, project.default_branch.name))
-    _set_status(git, state_project, untracked=untracked)
+            git, state_project.current_branch, state_project.manifest_branch)
+    _set_status(git_status, state_project)
     return state_project
 
 
-def _set_status(git, state_project, untracked=False):
+def iter_states(projects, untracked, num_jobs=1, on_progress=None):
+    """
+    Check the state of the projects using num_jobs threads,
+    yielding each ProjectState as soon as it is known.
+    :param on_progress: see :py:func:`qisys.parallel.imap`
+    """
+    def check(project):
+        """ Check the state of one project """
+        return check_state(project, untracked)
+
+    for result in qisys.parallel.imap(projects, check, n_jobs=num_jobs,
+                                      ordered=False, on_progress=on_progress):
+        if not result.ok:
+            raise result.exception
+        yield result.value
+
+
+def _set_status(git_status, state_project):
     """
     When project is not clean, display git status.
     (untracked files and the like)
     """
     if not state_project.sync_and_clean:
-        out = git.get_status(untracked)
-        if out is not None:
-            state_project.status = [x for x in out.splitlines() if x.strip()]
+        state_project.status = git_status["lines"]
 
 
 def _print_behind_ahead(behind, ahead):
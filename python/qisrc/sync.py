@@ -10,8 +10,10 @@ from __future__ import print_function
 import os
 
 import qisrc.git
+import qisrc.project
 import qisrc.manifest
 import qisys.qixml
+import qisys.parallel
 from qisys import ui
 from qisys.qixml import etree
 
@@ -33,7 +35,7 @@ class WorkTreeSyncer(object):
         self.old_repos = list()
         self.new_repos = list()
 
-    def sync(self):
+    def sync(self, num_jobs=1):
         """
         Synchronize with a remote manifest:
         * clone missing repos
@@ -45,7 +47,7 @@ class WorkTreeSyncer(object):
         # backup old repos configuration now, so that
         # we know what to sync
         self.old_repos = self.get_old_repos()
-        return self.sync_repos()
+        return self.sync_repos(num_jobs=num_jobs)
 
     @property
     def manifest_xml(self):
@@ -73,7 +75,7 @@ class WorkTreeSyncer(object):
             git.commit("-m", "initial commit")
         return res
 
-    def sync_repos(self, force=False):
+    def sync_repos(self, force=False, num_jobs=1):
         """ Update the manifest, inspect changes,
         and updates the git worktree accordingly.
         """
@@ -88,7 +90,8 @@ class WorkTreeSyncer(object):
             ui.info()
         self._sync_manifest()
         self.new_repos = self.read_remote_manifest()
-        res = self._sync_repos(self.old_repos, self.new_repos, force=force)
+        res = self._sync_repos(self.old_repos, self.new_repos, force=force,
+                               num_jobs=num_jobs)
         # re-read self.old_repos so we can do several syncs:
         self.old_repos = self.get_old_repos(warn_if_missing_group=False)
         # if everything went well, save the manifests configurations:
@@ -158,7 +161,7 @@ class WorkTreeSyncer(object):
         qisys.qixml.write(tree, self.manifest_xml)
 
     def configure_manifest(self, url, branch="master", groups=None, all_repos=False,
-                           ref=None, review=None, force=False):
+                           ref=None, review=None, force=False, num_jobs=1):
         """ Add a manifest to the list. Will be stored in .qi/manifests/<name> """
         if review is None:
             # not set explicitely by the user,
@@ -172,7 +175,7 @@ class WorkTreeSyncer(object):
         self.manifest.ref = ref
         self.manifest.review = review
         self.manifest.all_repos = all_repos
-        res = self.sync_repos(force=force)
+        res = self.sync_repos(force=force, num_jobs=num_jobs)
         self.configure_projects()
         self.dump_manifest_config()
         return res
@@ -293,8 +296,12 @@ Please run `qisrc init MANIFEST_URL`
         if not transaction.ok:
             raise Exception("Update failed\n" + transaction.output)
 
-    def _sync_repos(self, old_repos, new_repos, force=False):
-        """ Sync the remote repo configurations with the git worktree """
+    def _sync_repos(self, old_repos, new_repos, force=False, num_jobs=1):
+        """
+        Sync the remote repo configurations with the git worktree
+        :param num_jobs: number of repositories to clone or configure
+                         at the same time
+        """
         res = True
         # 1/ create, remove or move the git projects:
         # Compute the work that needs to be done:
@@ -318,41 +325,50 @@ Please run `qisrc init MANIFEST_URL`
                         ui.reset, "updating", ui.blue, old_repo.src)
                 if new_repo.review and not old_repo.review:
                     ui.info(ui.tabs(2), ui.green, "(now using code review)")
-                project = self.git_worktree.get_git_project(new_repo.src)
-                project.read_remote_config(new_repo)
-                project.save_config()
+            self._configure_repos([(x[1], x[1].src) for x in to_update], num_jobs=num_jobs)
         for repo in to_rm:
             self.git_worktree.remove_repo(repo)
         if to_add:
             ui.info(ui.green, ":: Cloning new repositories ...")
-        for i, repo in enumerate(to_add):
-            ui.info_count(i, len(to_add),
-                          ui.blue, repo.project,
-                          ui.green, "->",
-                          ui.blue, repo.src,
-                          ui.white, "(%s)" % repo.default_branch)
-            project = self.git_worktree.get_git_project(repo.src)
-            if project:  # Repo is already there, re-apply config
-                project.read_remote_config(repo)
-                project.save_config()
-                continue
-            if not self.git_worktree.clone_missing(repo):
-                res = False
-            else:
-                project = self.git_worktree.get_git_project(repo.src)
-                project.read_remote_config(repo)
-                project.save_config()
+        to_clone = [x for x in to_add if not self.git_worktree.get_git_project(x.src)]
+        failed = self.git_worktree.clone_missing_repos(to_clone, num_jobs=num_jobs)
+        if failed:
+            res = False
+            ui.error("Failed to clone the following repositories:")
+            for repo in failed:
+                ui.info(ui.red, " *", ui.reset, ui.blue, repo.src)
+        # Re-apply config, both for the repos that were already there
+        # and for the new ones
+        to_configure = [x for x in to_add if x not in failed]
+        self._configure_repos([(x, x.src) for x in to_configure], num_jobs=num_jobs)
         if to_move:
             ui.info(ui.green, ":: Moving repositories ...")
+        moved = list()
         for (repo, new_src) in to_move:
             if self.git_worktree.move_repo(repo, new_src, force=force):
-                project = self.git_worktree.get_git_project(new_src)
-                project.read_remote_config(repo)
-                project.save_config()
+                moved.append((repo, new_src))
             else:
                 res = False
+        self._configure_repos(moved, num_jobs=num_jobs)
         return res
 
+    def _configure_repos(self, repos_and_srcs, num_jobs=1):
+        """
+        Apply the configuration from the manifest to the git projects,
+        running the git commands of up to num_jobs projects at the same time.
+        :param repos_and_srcs: a list of tuples (repo, src of the git project)
+        """
+        projects = list()
+        for (repo, src) in repos_and_srcs:
+            project = self.git_worktree.get_git_project(src)
+            # May ask for code review setup, so not in a thread
+            project.read_remote_config(repo)
+            projects.append(project)
+        qisys.parallel.foreach(projects, qisrc.project.GitProject.apply_config,
+                               n_jobs=num_jobs)
+        if projects:
+            self.git_worktree.save_git_config()
+
     def sync_from_manifest_file(self, xml_path):
         """
         Just synchronize the manifest coming from one xml file.
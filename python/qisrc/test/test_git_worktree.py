@@ -7,8 +7,13 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import os
+
+import qisys.sh
 import qisys.qixml
 import qisys.worktree
+import qisrc.git
+import qisrc.mirror
 import qisrc.worktree
 from qisrc.git_config import Remote
 
@@ -110,6 +115,79 @@ def test_clone_missing_wrong_branch(git_worktree, git_server, record_messages):
     assert not new_git_worktree.git_projects
 
 
+def test_clone_missing_repos(git_worktree, git_server, record_messages):
+    """ Test Clone Missing Repos """
+    repos = [git_server.create_repo(x) for x in ["foo", "bar", "lib/spam", "lib/eggs"]]
+    repos[1].default_branch = "devel"
+    failed = git_worktree.clone_missing_repos(repos, num_jobs=3)
+    assert failed == [repos[1]]
+    assert record_messages.find("Cloning repo failed")
+    srcs = [x.src for x in git_worktree.git_projects]
+    assert srcs == ["foo", "lib/eggs", "lib/spam"]
+    new_git_worktree = qisrc.worktree.GitWorkTree(git_worktree.worktree)
+    assert [x.src for x in new_git_worktree.git_projects] == srcs
+
+
+def test_clone_missing_nested_repos(git_worktree, git_server):
+    """ A nested repo is not removed when cloning its parent fails """
+    repos = [git_server.create_repo(x) for x in ["lib", "lib/spam", "lib/spam/eggs", "foo"]]
+    repos[0].default_branch = "devel"
+    batches = qisrc.worktree.get_nested_batches(repos)
+    assert [[x.src for x in batch] for batch in batches] == \
+        [["lib", "foo"], ["lib/spam"], ["lib/spam/eggs"]]
+    failed = git_worktree.clone_missing_repos(repos, num_jobs=4)
+    assert failed == [repos[0]]
+    srcs = [x.src for x in git_worktree.git_projects]
+    assert srcs == ["foo", "lib/spam", "lib/spam/eggs"]
+    for project in git_worktree.git_projects:
+        assert os.path.isdir(os.path.join(project.path, ".git"))
+
+
+def test_clone_missing_with_mirrors(git_worktree, git_server, tmpdir, monkeypatch):
+    """ Test Clone Missing With Mirrors """
+    mirrors = tmpdir.join("mirrors")
+    monkeypatch.setenv("QISRC_MIRRORS", mirrors.strpath)
+    monkeypatch.setattr(qisrc.mirror, "_UPDATED", set())
+    foo_repo = git_server.create_repo("foo")
+    git_worktree.clone_missing(foo_repo)
+    mirror_path = qisrc.mirror.get_mirror_path(foo_repo.clone_url)
+    assert mirror_path.startswith(mirrors.strpath)
+    assert os.path.isdir(os.path.join(mirror_path, "objects"))
+    foo_proj = git_worktree.get_git_project("foo")
+    # The clone no longer depends on the mirror
+    assert not os.path.exists(os.path.join(foo_proj.path, ".git", "objects", "info", "alternates"))
+    qisys.sh.rm(mirror_path)
+    git = qisrc.git.Git(foo_proj.path)
+    rc, _ = git.call("fsck", raises=False)
+    assert rc == 0
+    assert git.get_current_branch() == "master"
+
+
+def test_mirror_fetched_once(git_server, tmpdir, monkeypatch):
+    """ Test Mirror Fetched Once """
+    monkeypatch.setenv("QISRC_MIRRORS", tmpdir.join("mirrors").strpath)
+    monkeypatch.setattr(qisrc.mirror, "_UPDATED", set())
+    foo_repo = git_server.create_repo("foo")
+    mirror_path = qisrc.mirror.update_mirror(foo_repo.clone_url)
+    assert mirror_path
+    git_server.push_file("foo", "new.txt", "new\n")
+    mirror_git = qisrc.git.Git(mirror_path)
+    before = mirror_git.call("rev-parse", "refs/heads/master", raises=False)[1]
+    assert qisrc.mirror.update_mirror(foo_repo.clone_url) == mirror_path
+    assert mirror_git.call("rev-parse", "refs/heads/master", raises=False)[1] == before
+    # Next sync:
+    monkeypatch.setattr(qisrc.mirror, "_UPDATED", set())
+    qisrc.mirror.update_mirror(foo_repo.clone_url)
+    assert mirror_git.call("rev-parse", "refs/heads/master", raises=False)[1] != before
+
+
+def test_mirrors_disabled(monkeypatch):
+    """ Test Mirrors Disabled """
+    monkeypatch.delenv("QISRC_MIRRORS", raising=False)
+    assert qisrc.mirror.get_mirrors_root() is None
+    assert qisrc.mirror.update_mirror("git@example.com:foo.git") is None
+
+
 def test_network_error_while_cloning(git_worktree, git_server):
     """ Test Network Error While Cloning """
     foo_repo = git_server.create_repo("foo")
@@ -7,6 +7,8 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import qisys.ui
+
 
 def test_qisrc_foreach(qisrc_action, record_messages):
     """ Test QiSrc Foreach """
@@ -44,3 +46,42 @@ def test_do_not_warn_on_subgroups(qisrc_action, git_server, record_messages):
     qisrc_action("foreach", "--group", "small", "ls")
     assert not record_messages.find(r"\[WARN \]")
     assert record_messages.find(r"\* \(1/1\) b")
+
+
+def test_parallel_output_in_order(qisrc_action, record_messages):
+    """ Test Parallel Output In Order """
+    git_worktree = qisrc_action.git_worktree
+    for name in ["a", "b", "c", "d"]:
+        git_worktree.create_git_project(name)
+    qisrc_action("foreach", "-j", "4", "--", "python", "-c", "import os; print('in ' + os.getcwd())")
+    messages = [x for x in qisys.ui._MESSAGES if x.strip()]  # pylint:disable=protected-access
+    positions = [i for (i, x) in enumerate(messages) if x.startswith("in ")]
+    assert len(positions) == 4
+    for name, position in zip(["a", "b", "c", "d"], positions):
+        assert "/4) %s" % name in messages[position - 1]
+        assert messages[position].strip().endswith(name)
+
+
+def test_parallel_errors_summary(qisrc_action, record_messages):
+    """ Test Parallel Errors Summary """
+    git_worktree = qisrc_action.git_worktree
+    git_worktree.create_git_project("ok")
+    git_worktree.create_git_project("ko")
+    script = "import os, sys; sys.exit(3 if os.getcwd().endswith('ko') else 0)"
+    rc = qisrc_action("foreach", "-j", "2", "--continue", "--", "python", "-c", script,
+                      retcode=True)
+    assert rc == 1
+    assert record_messages.find(r"ko\s+\(exit code: 3\)")
+    assert not record_messages.find(r"ok\s+\(exit code")
+
+
+def test_stream_with_timeout(qisrc_action, record_messages):
+    """ Test Stream With Timeout """
+    git_worktree = qisrc_action.git_worktree
+    git_worktree.create_git_project("slow")
+    script = "import sys, time; sys.stdout.write('started\\n'); sys.stdout.flush(); time.sleep(30)"
+    rc = qisrc_action("foreach", "--stream", "--timeout", "1", "--continue",
+                      "--", "python", "-c", script, retcode=True)
+    assert rc == 1
+    assert record_messages.find(r"slow\s+\| started")
+    assert record_messages.find(r"slow\s+\(timed out\)")
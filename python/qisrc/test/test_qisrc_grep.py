@@ -56,3 +56,59 @@ def test_worktree_paths(qisrc_action, record_messages):
     setup_projects(qisrc_action)
     _rc = qisrc_action("grep", "--path", "worktree", "--", "-i", "-l", "Spam", retcode=True)
     assert record_messages.find("foo/a.txt")
+
+
+def test_parallel(qisrc_action, record_messages):
+    """ Test Parallel """
+    setup_projects(qisrc_action)
+    record_messages.reset()
+    rc = qisrc_action("grep", "-j", "2", "spam", retcode=True)
+    assert rc == 0
+    assert record_messages.find("foo/a.txt:this is spam")
+    assert not record_messages.find("bar/")
+    rc = qisrc_action("grep", "-j", "2", "eggs", retcode=True)
+    assert rc == 1
+
+
+def test_max_matches(qisrc_action, record_messages):
+    """ Test Max Matches """
+    foo_proj = qisrc_action.create_git_project("foo")
+    foo_path = py.path.local(foo_proj.path)  # pylint:disable=no-member
+    foo_path.join("a.txt").write("spam 1\nspam 2\nspam 3\n")
+    qisrc.git.Git(foo_proj.path).add("a.txt")
+    record_messages.reset()
+    rc = qisrc_action("grep", "--max-matches", "2", "spam", retcode=True)
+    assert rc == 0
+    assert record_messages.find("spam 2")
+    assert not record_messages.find("spam 3")
+    assert record_messages.find("Stopping after 2 matches")
+
+
+def test_max_matches_with_context(qisrc_action, record_messages):
+    """ Test Max Matches With Context """
+    foo_proj = qisrc_action.create_git_project("foo")
+    foo_path = py.path.local(foo_proj.path)  # pylint:disable=no-member
+    foo_path.join("a.txt").write("spam 1\neggs\nspam 2\neggs\nspam 3\n")
+    qisrc.git.Git(foo_proj.path).add("a.txt")
+    record_messages.reset()
+    rc = qisrc_action("grep", "--max-matches", "2", "--", "-C1", "spam", retcode=True)
+    assert rc == 0
+    assert record_messages.find("foo/a.txt-eggs")
+    assert record_messages.find("foo/a.txt:spam 2")
+    assert not record_messages.find("spam 3")
+
+
+def test_max_matches_with_context_and_no_path(qisrc_action, record_messages):
+    """ Context lines are not counted as matches, even without file names """
+    foo_proj = qisrc_action.create_git_project("foo")
+    foo_path = py.path.local(foo_proj.path)  # pylint:disable=no-member
+    foo_path.join("a.txt").write("spam 1\neggs\nspam 2\neggs\nspam 3\n")
+    qisrc.git.Git(foo_proj.path).add("a.txt")
+    record_messages.reset()
+    rc = qisrc_action("grep", "--max-matches", "2", "--path", "none", "--", "-C1", "spam",
+                      retcode=True)
+    assert rc == 0
+    assert record_messages.find("spam 2")
+    assert not record_messages.find("spam 3")
+    assert not record_messages.find("a.txt")
+    assert record_messages.find("Stopping after 2 matches")
@@ -10,6 +10,7 @@ from __future__ import print_function
 import py
 
 import qisrc.git
+import qisrc.status
 from qisrc.test.conftest import TestGitWorkTree
 
 
@@ -95,3 +96,91 @@ def test_fixed_ref_behind(qisrc_action, git_server, record_messages):
     git.call("reset", "--hard", "HEAD~1")
     qisrc_action("status")
     assert record_messages.find("fixed ref v0.1 -1")
+
+
+def test_ahead_and_dirty(qisrc_action, git_server, record_messages, capsys):
+    """ Test Ahead And Dirty """
+    git_server.create_repo("foo.git")
+    git_server.create_repo("bar.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_worktree = TestGitWorkTree()
+    foo1 = git_worktree.get_git_project("foo")
+    foo_git = qisrc.git.Git(foo1.path)
+    foo_git.commit("--allow-empty", "-m", "local change")
+    foo_path = py.path.local(foo1.path)  # pylint:disable=no-member
+    foo_path.join("foo.txt").write("modified")
+    foo_git.add("foo.txt")
+    foo_git.call("mv", "foo.txt", "renamed.txt")
+    qisrc_action("status", "-j", "2")
+    assert record_messages.find("foo : master tracking \\+1")
+    assert record_messages.find("Dirty projects: 1")
+    out, _ = capsys.readouterr()
+    assert "A  foo/renamed.txt" in out
+
+
+def test_parse_porcelain_v2():
+    """ Test Parse Porcelain V2 """
+    out = "\n".join([
+        "# branch.oid 5b6e1a3c2d1e9f7a8b0c4d2e6f1a3b5c7d9e0f12",
+        "# branch.head master",
+        "# branch.upstream origin/master",
+        "# branch.ab +2 -3",
+        "1 .M N... 100644 100644 100644 abc abc src/a.c",
+        "2 R. N... 100644 100644 100644 abc abc R100 new name.txt\told.txt",
+        "u UU N... 100644 100644 100644 100644 abc abc abc conflict.txt",
+        "? untracked.txt",
+    ])
+    res = qisrc.status.parse_porcelain_v2(out)
+    assert res["head"] == "master"
+    assert res["upstream"] == "origin/master"
+    assert (res["ahead"], res["behind"]) == (2, 3)
+    assert res["lines"] == [
+        " M src/a.c",
+        "R  old.txt -> new name.txt",
+        "UU conflict.txt",
+        "?? untracked.txt",
+    ]
+    detached = qisrc.status.parse_porcelain_v2("# branch.oid abc\n# branch.head (detached)\n")
+    assert detached["head"] is None
+    assert detached["ahead"] is None
+
+
+def test_parse_porcelain_v1():
+    """ Test Parse Porcelain V1 """
+    out = "\n".join([
+        "## master...origin/master [ahead 2, behind 3]",
+        " M src/a.c",
+        "R  old.txt -> new name.txt",
+        "?? untracked.txt",
+    ])
+    res = qisrc.status.parse_porcelain_v1(out)
+    assert res["head"] == "master"
+    assert res["upstream"] == "origin/master"
+    assert (res["ahead"], res["behind"]) == (2, 3)
+    assert res["lines"] == [" M src/a.c", "R  old.txt -> new name.txt", "?? untracked.txt"]
+    synced = qisrc.status.parse_porcelain_v1("## master...origin/master")
+    assert (synced["ahead"], synced["behind"]) == (0, 0)
+    gone = qisrc.status.parse_porcelain_v1("## master...origin/master [gone]")
+    assert gone["upstream"] == "origin/master"
+    assert gone["ahead"] is None
+    no_upstream = qisrc.status.parse_porcelain_v1("## devel")
+    assert no_upstream["head"] == "devel"
+    assert no_upstream["upstream"] is None
+    detached = qisrc.status.parse_porcelain_v1("## HEAD (no branch)")
+    assert detached["head"] is None
+
+
+def test_status_with_old_git(qisrc_action, git_server, record_messages, monkeypatch, capsys):
+    """ git older than 2.11 does not know about --porcelain=v2 """
+    monkeypatch.setattr(qisrc.git, "get_git_version", lambda: (1, 9, 1))
+    git_server.create_repo("foo.git")
+    qisrc_action("init", git_server.manifest_url)
+    git_worktree = TestGitWorkTree()
+    foo1 = git_worktree.get_git_project("foo")
+    foo_git = qisrc.git.Git(foo1.path)
+    foo_git.commit("--allow-empty", "-m", "local change")
+    py.path.local(foo1.path).join("new.txt").write("new")  # pylint:disable=no-member
+    qisrc_action("status", "-u")
+    assert record_messages.find("foo : master tracking \\+1")
+    out, _ = capsys.readouterr()
+    assert "?? foo/new.txt" in out
@@ -12,9 +12,11 @@ import copy
 import operator
 
 import qisrc.git
+import qisrc.mirror
 import qisrc.sync
 import qisrc.snapshot
 import qisrc.project
+import qisys.parallel
 import qisys.worktree
 from qisys import ui
 
@@ -46,17 +48,21 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
         self._root_xml = qisys.qixml.read(self.git_xml).getroot()
         worktree.register(self)
         self.git_projects = list()
+        # src -> GitProject, rebuilt each time the projects are loaded
+        self._projects_by_src = dict()
         self.load_git_projects()
         self.syncer = qisrc.sync.WorkTreeSyncer(self)
         self.branch = self.syncer.manifest.branch
 
     def configure_manifest(self, manifest_url, groups=None, all_repos=False,
-                           branch="master", ref=None, review=None, force=False):
+                           branch="master", ref=None, review=None, force=False,
+                           num_jobs=1):
         """ Add a new manifest to this worktree """
         self.branch = branch
         return self.syncer.configure_manifest(manifest_url, groups=groups,
                                               branch=branch, ref=ref, review=review,
-                                              force=force, all_repos=all_repos)
+                                              force=force, all_repos=all_repos,
+                                              num_jobs=num_jobs)
 
     def configure_projects(self, projects):
         """ Configure Projects """
@@ -66,13 +72,14 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
         """ Run a sync using just the xml file given as parameter """
         return self.syncer.sync_from_manifest_file(xml_path)
 
-    def sync(self):
+    def sync(self, num_jobs=1):
         """ Delegates to WorkTreeSyncer """
-        return self.syncer.sync()
+        return self.syncer.sync(num_jobs=num_jobs)
 
     def load_git_projects(self):
         """ Build a list of git projects using the xml configuration """
         self.git_projects = list()
+        self._projects_by_src = dict()
         for worktree_project in self.worktree.projects:
             project_src = worktree_project.src
             if not qisrc.git.is_git(worktree_project.path):
@@ -82,13 +89,14 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
             if git_elem is not None:
                 git_project.load_xml(git_elem)
             self.git_projects.append(git_project)
+            self._projects_by_src[git_project.src] = git_project
 
     def get_git_project(self, path, raises=False, auto_add=False):
         """ Get a git project by its sources """
         src = self.worktree.normalize_path(path)
-        for git_project in self.git_projects:
-            if git_project.src == src:
-                return git_project
+        git_project = self._projects_by_src.get(src)
+        if git_project:
+            return git_project
         if auto_add:
             # In the case of submodules, the project may already be found
             # in the qisys WorkTree, but not yet in the GitWorkTree.
@@ -206,30 +214,77 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
 
     def _clone_missing(self, git_project, repo):
         """ Clone Missing """
-        branch = repo.default_branch
-        fixed_ref = repo.fixed_ref
-        clone_url = repo.clone_url
-        qisys.sh.mkdir(git_project.path, recursive=True)
-        git = qisrc.git.Git(git_project.path)
-        remote_name = repo.default_remote.name
-        try:
-            git.init()
-            git.remote("add", remote_name, clone_url)
-            git.fetch(remote_name, "--quiet")
-            if branch:
-                git.checkout("-b", branch, "%s/%s" % (remote_name, branch))
-            if fixed_ref:
-                git.checkout("-q", fixed_ref)
-        except Exception:
-            ui.error("Cloning repo failed")
-            if git.is_empty():
-                qisys.sh.rm(git_project.path)
+        ok, out = clone_repo(git_project.path, repo)
+        if not ok:
+            ui.error("Cloning repo failed\n" + out)
             self.worktree.remove_project(repo.src)
             return False
         self.save_project_config(git_project)
         self.load_git_projects()
         return True
 
+    def clone_missing_repos(self, repos, num_jobs=1):
+        """
+        Add several new projects, cloning up to num_jobs repositories
+        at the same time.
+        A repo nested in an other one is only cloned once its parent is done,
+        since a failed clone removes its directory.
+        The output of each clone is displayed once it is done, in the
+        same order as repos (parents first), and the worktree is only
+        reloaded once.
+        :returns: the list of the repos that could not be cloned
+        """
+        to_clone = list()
+        to_add = list()
+        for repo in repos:
+            path = qisys.sh.to_native_path(os.path.join(self.root, repo.src))
+            if os.path.exists(path) and qisrc.git.get_repo_root(path) == path:
+                git = qisrc.git.Git(path)
+                if git.is_valid() and git.is_empty():
+                    ui.warning("Removing empty git project in", repo.src)
+                    qisys.sh.rm(path)
+                    to_clone.append(repo)
+                else:
+                    # Do nothing, the remote will be re-configured later
+                    # anyway
+                    to_add.append(repo)
+            else:
+                # Either a new project, or a project nested in an other
+                # git repository
+                to_clone.append(repo)
+
+        def clone(repo):
+            """ Clone one repo, called from a worker thread """
+            path = qisys.sh.to_native_path(os.path.join(self.root, repo.src))
+            return clone_repo(path, repo)
+
+        failed = list()
+        num_done = 0
+        for batch in get_nested_batches(to_clone):
+            results = qisys.parallel.imap(batch, clone, n_jobs=num_jobs)
+            for result in results:
+                repo = result.item
+                ui.info_count(num_done, len(to_clone),
+                              ui.blue, repo.project,
+                              ui.green, "->",
+                              ui.blue, repo.src,
+                              ui.white, "(%s)" % repo.default_branch)
+                num_done += 1
+                if result.ok:
+                    (ok, out) = result.value
+                else:
+                    (ok, out) = (False, result.traceback)
+                if ok:
+                    to_add.append(repo)
+                else:
+                    ui.error("Cloning repo failed\n" + out)
+                    failed.append(repo)
+        srcs = [x.src for x in to_add if not self.worktree.has_project(x.src)]
+        if srcs:
+            self.worktree.add_projects(srcs)
+        self.save_git_config()
+        return failed
+
     def move_repo(self, repo, new_src, force=False):
         """ Move a project in the worktree (same remote url, different src) """
         project = self.get_git_project(repo.src)
@@ -365,6 +420,52 @@ class GitWorkTree(qisys.worktree.WorkTreeObserver):
         return "<GitWorkTree in %s>" % self.root
 
 
+def get_nested_batches(repos):
+    """
+    Split the repos in batches that can be cloned at the same time:
+    a repo comes after every repo whose src contains its own.
+    The order of the repos is kept inside each batch.
+    """
+    srcs = [qisys.sh.to_posix_path(x.src).rstrip("/") for x in repos]
+    batches = list()
+    for (repo, src) in zip(repos, srcs):
+        depth = len([x for x in srcs if src.startswith(x + "/")])
+        while len(batches) <= depth:
+            batches.append(list())
+        batches[depth].append(repo)
+    return [x for x in batches if x]
+
+
+def clone_repo(path, repo):
+    """
+    Clone the given repo in the given path, without registering it in the
+    worktree. Can be called from several threads at once.
+    :returns: a tuple (ok, output of the git commands that failed)
+    """
+    branch = repo.default_branch
+    fixed_ref = repo.fixed_ref
+    remote_name = repo.default_remote.name
+    mirror_path = qisrc.mirror.update_mirror(repo.clone_url)
+    qisys.sh.mkdir(path, recursive=True)
+    git = qisrc.git.Git(path)
+    with git.transaction() as transaction:
+        git.init()
+        if mirror_path:
+            qisrc.mirror.borrow_objects(git, mirror_path)
+        git.remote("add", remote_name, repo.clone_url)
+        git.fetch(remote_name, "--quiet")
+        if branch:
+            git.checkout("-b", branch, "%s/%s" % (remote_name, branch))
+        if fixed_ref:
+            git.checkout("-q", fixed_ref)
+    if not transaction.ok and git.is_empty():
+        qisys.sh.rm(path)
+        return transaction.ok, transaction.output
+    if mirror_path:
+        qisrc.mirror.dissociate(git)
+    return transaction.ok, transaction.output
+
+
 def on_no_matching_projects(worktree, groups=None):
     """ What to do when we find an empty worktree """
     if groups and len(groups) > 1:
@@ -8,34 +8,172 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import sys
+import time
+import functools
+import threading
+import subprocess
 
 import qisys
 import qisys.command
+import qisys.parallel
 from qisys import ui
 
 
-def foreach(projects, cmd, ignore_errors=True):
+def foreach(projects, cmd, ignore_errors=True, num_jobs=1, stream=False, timeout=None):
     """
     Execute the command on every project
     :param ignore_errors: whether to stop at first failure
+    :param num_jobs: number of commands to run at once. When running
+        more than one command at once, the output of each command is
+        captured, and displayed once it is done, in the order of the projects.
+    :param stream: display the output of the commands as soon as it is
+        written instead, each line being prefixed by the project
+    :param timeout: for all the projects, in seconds. Commands still running
+        when it expires are killed, and the remaining projects are skipped.
     """
-    errors = list()
     ui.info(ui.green, "Running `%s` on every project" % " ".join(cmd))
+    if num_jobs == 1 and not stream and timeout is None:
+        errors = _foreach_sequential(projects, cmd, ignore_errors)
+    else:
+        errors = _foreach_parallel(projects, cmd, ignore_errors,
+                                   num_jobs=num_jobs, stream=stream, timeout=timeout)
+    if not errors:
+        return
+    print()
+    ui.info(ui.red, "Command failed on the following projects:")
+    for project, reason in errors:
+        ui.info(ui.green, " * ", ui.reset, ui.blue, project.src, ui.reset, "(%s)" % reason)
+    sys.exit(1)
+
+
+def _foreach_sequential(projects, cmd, ignore_errors):
+    """ Run the commands one after the other, without capturing their output """
+    errors = list()
     for i, project in enumerate(projects):
         ui.info_count(i, len(projects), ui.blue, project.src)
         command = cmd[:]
         try:
             qisys.command.call(command, cwd=project.path)
-        except qisys.command.CommandFailedException:
+        except qisys.command.CommandFailedException as e:
             if ignore_errors:
-                errors.append(project)
+                errors.append((project, _describe_returncode(e.returncode)))
                 continue
             else:
                 raise
-    if not errors:
-        return
-    print()
-    ui.info(ui.red, "Command failed on the following projects:")
-    for project in errors:
-        ui.info(ui.green, " * ", ui.reset, ui.blue, project.src)
-    sys.exit(1)
+    return errors
+
+
+def _foreach_parallel(projects, cmd, ignore_errors, num_jobs=1, stream=False, timeout=None):
+    """ Helper for foreach, when commands run in threads or have a timeout """
+    executable = qisys.command.find_program(cmd[0])
+    if not executable:
+        raise qisys.command.NotInPath(cmd[0])
+    cmd = [executable] + cmd[1:]
+    deadline = None
+    if timeout is not None:
+        deadline = time.time() + timeout
+    max_len = max(len(x.src) for x in projects) if projects else 0
+    lock = threading.Lock()
+
+    def on_line(project, line):
+        """ Display a line of output, prefixed by the project """
+        with lock:
+            ui.info(ui.blue, project.src.ljust(max_len), ui.reset, "|", line)
+
+    def run(project):
+        """ Run the command in one project """
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None, False, ""
+        line_callback = None
+        if stream:
+            line_callback = functools.partial(on_line, project)
+        return _run_command(cmd, project.path, timeout=remaining, on_line=line_callback)
+
+    errors = list()
+    results = qisys.parallel.imap(projects, run, n_jobs=num_jobs, ordered=not stream)
+    try:
+        for i, result in enumerate(results):
+            error = _check_result(i, len(projects), result, stream, lock)
+            if not error:
+                continue
+            # Only stop on commands which failed by themselves
+            if not ignore_errors and result.ok and result.value[0] and not result.value[1]:
+                raise qisys.command.CommandFailedException(cmd, result.value[0],
+                                                           cwd=result.item.path)
+            errors.append((result.item, error))
+    finally:
+        results.close()
+    return errors
+
+
+def _check_result(i, n, result, stream, lock):
+    """
+    Display the result of the command in one project
+    :returns: what went wrong, or None
+    """
+    project = result.item
+    if not result.ok:
+        ui.info_count(i, n, ui.blue, project.src)
+        return "error: %s" % result.exception
+    returncode, timed_out, out = result.value
+    if stream:
+        if returncode is not None:
+            with lock:
+                ui.info_count(i, n, ui.blue, project.src, ui.reset,
+                              "done" if returncode == 0 else _describe_returncode(returncode))
+    else:
+        ui.info_count(i, n, ui.blue, project.src)
+        if out:
+            ui.info(out, end="" if out.endswith("\n") else "\n")
+    if timed_out:
+        return "timed out"
+    if returncode is None:
+        return "skipped: timeout expired"
+    if returncode != 0:
+        return _describe_returncode(returncode)
+    return None
+
+
+def _run_command(cmd, cwd, timeout=None, on_line=None):
+    """
+    Run the command, killing it after timeout seconds.
+    If on_line is given, it is called with each line of output,
+    else the output is returned.
+    :returns: a tuple (returncode, timed out, output)
+    """
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    timed_out = threading.Event()
+
+    def kill():
+        """ Called when the timeout expires """
+        timed_out.set()
+        process.kill()
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+    try:
+        if on_line:
+            for line in iter(process.stdout.readline, b""):
+                on_line(line.decode("utf-8", "replace").rstrip())
+            process.wait()
+            out = ""
+        else:
+            out = process.communicate()[0].decode("utf-8", "replace")
+    finally:
+        if timer:
+            timer.cancel()
+        process.stdout.close()
+    return process.returncode, timed_out.is_set(), out
+
+
+def _describe_returncode(returncode):
+    """ Human readable version of the return code of a command """
+    if returncode < 0:
+        return "killed by signal: %s" % qisys.command.str_from_signal(-returncode)
+    return "exit code: %i" % returncode
@@ -8,8 +8,11 @@ This module can manipulate:
 * ``*.zip`` archives on all platforms
 * ``*.tar.gz`` and ``*.tar.bz2`` archives on UNIX
 * ``*.tar.xz`` archive is only supported on Linux
+* ``*.tar.zst`` archives when the ``zstd`` program is installed
 The default archive format is zip, to ensure platform interoperability,
 and also because this is the qiBuild package format.
+Archives are extracted in process, large zip archives being inflated
+by several threads at once.
 All archives should have a unique top directory.
 To enforce platform interoperability :
 * symlinks are dereferenced:
@@ -25,17 +28,40 @@ from __future__ import print_function
 import os
 import re
 import sys
+import time
+import tarfile
 import posixpath
 import operator
+import threading
 import subprocess
+import contextlib
 import zipfile
+import zlib
 import six
 
 import qisys.sh
 import qisys.command
+import qisys.parallel
 from qisys import ui
 
-KNOWN_ALGOS = ["zip", "tar", "gzip", "bzip2", "xz"]
+KNOWN_ALGOS = ["zip", "tar", "gzip", "bzip2", "xz", "zstd"]
+
+# Lowest and highest compression levels accepted by each algorithm
+# (tar archives are not compressed, so any level is ignored)
+COMPRESSION_LEVELS = {
+    "zip": (0, 9),
+    "gzip": (1, 9),
+    "bzip2": (1, 9),
+    "xz": (0, 9),
+    "zstd": (1, 19),
+}
+
+# Zip archives with less uncompressed data than this are
+# inflated in the calling thread
+PARALLEL_ZIP_MIN_SIZE = 16 * 1024 ** 2
+
+# Size of the parts of the files deflated by each thread
+DEFLATE_CHUNK_SIZE = 1024 ** 2
 
 
 class InvalidArchive(Exception):
@@ -62,18 +88,33 @@ def _check_algo(algo):
     raise Exception(mess)
 
 
+def _check_level(algo, level):
+    """ Check that the compression level is supported by the algo """
+    if level is None or algo not in COMPRESSION_LEVELS:
+        return
+    (lowest, highest) = COMPRESSION_LEVELS[algo]
+    if lowest <= level <= highest:
+        return
+    mess = "Invalid compression level for %s: %i\n" % (algo, level)
+    mess += "The level must be between %i and %i" % (lowest, highest)
+    raise Exception(mess)
+
+
 # Symlink support in zip archive (for both compression and extraction)
 # Widely inspired from:
 # http://www.mail-archive.com/python-list@python.org/msg34223.html
 
 
 def _compress_zip(directory, quiet=True, verbose=False, display_progress=False,
-                  flat=False, output=None):
+                  flat=False, output=None, level=None, num_jobs=0):
     """
     Compress directory in a .zip file
     :param directory:        directory to add to the archive
     :param archive_basepath: output archive basepath (without extension)
     :param quiet:            quiet mode (print nothing)
+    :param level:            compression level, from 0 to 9 (default: 6)
+    :param num_jobs:         number of threads deflating the files
+                             (default: one per CPU)
     :return: path to the generated archive (archive_basepath.zip)
     """
     if quiet and verbose:
@@ -82,7 +123,10 @@ Please set only one of these two options to 'True'
 """
         raise ValueError(mess)
     ui.debug("Compressing", directory, "to", output)
-    archive = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+    kwargs = dict()
+    if level is not None and sys.version_info >= (3, 7):
+        kwargs["compresslevel"] = level
+    archive = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, allowZip64=True, **kwargs)
     # a list of tuple src, arcname to be added in the archive
     to_add = list()
     for root, directories, filenames in os.walk(directory):
@@ -98,43 +142,196 @@ Please set only one of these two options to 'True'
                 arcname = rel_path
             else:
                 arcname = os.path.join(os.path.basename(directory), rel_path)
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                continue
             to_add.append((full_path, arcname))
+
+    def on_added(i, full_path):
+        """ Display the progress of the compression """
+        if not quiet and not display_progress:
+            rel_path = os.path.relpath(full_path, directory)
+            sys.stdout.write("adding {0}\n".format(rel_path.encode('ascii', "ignore")))
+            sys.stdout.flush()
+        if display_progress:
+            ui.info_progress(i, len(to_add), "Done")
+
+    with contextlib.closing(archive):
+        if qisys.parallel.get_num_jobs(num_jobs) > 1 and _can_deflate_in_parallel(archive):
+            _write_zip_parallel(archive, to_add, level, num_jobs, on_added)
+        else:
+            _write_zip_sequential(archive, to_add, on_added)
+    return output
+
+
+def _symlink_zip_info(full_path, arcname):
+    """ The ZipInfo and the contents of the zip member storing a symlink """
+    content = os.readlink(full_path)  # pylint:disable=no-member
+    attr = zipfile.ZipInfo(arcname)
+    attr.create_system = 3
+    # long type of hex val of '0xA1ED0000L',
+    # say, symlink attr magic..
+    attr.external_attr = 2716663808
+    return attr, content
+
+
+def _write_zip_sequential(archive, to_add, on_added):
+    """ Add the files to the archive one after the other """
     for i, (full_path, arcname) in enumerate(to_add):
         if os.path.islink(full_path):
-            content = os.readlink(full_path)  # pylint:disable=no-member
-            attr = zipfile.ZipInfo(arcname)
-            attr.create_system = 3
-            # long type of hex val of '0xA1ED0000L',
-            # say, symlink attr magic..
-            attr.external_attr = 2716663808
+            attr, content = _symlink_zip_info(full_path, arcname)
             zip_call = archive.writestr
-        elif os.path.isdir(full_path):
-            continue
         else:
             attr = full_path
             content = arcname
             zip_call = archive.write
-        if not quiet and not display_progress:
-            rel_path = os.path.relpath(full_path, directory)
-            sys.stdout.write("adding {0}\n".format(rel_path.encode('ascii', "ignore")))
-            sys.stdout.flush()
-        if display_progress:
-            ui.info_progress(i, len(to_add), "Done")
+        on_added(i, full_path)
         if six.PY3:
             zip_call(attr, content)
         else:
             zip_call(attr, content.encode('ascii', "ignore"))
-    archive.close()
-    return output
 
 
-def _extract_zip(archive, directory, quiet, verbose, strict_mode=True):
+def _can_deflate_in_parallel(archive):
+    """
+    Files are deflated in parallel by writing the members ourselves,
+    which needs the ZipFile internals of Python >= 3.6
+    """
+    return hasattr(zipfile.ZipInfo, "from_file") and hasattr(archive, "start_dir") \
+        and archive.fp.seekable()
+
+
+def _write_zip_parallel(archive, to_add, level, num_jobs, on_added):
+    """
+    Add the files to the archive, splitting them in chunks deflated by
+    num_jobs threads, as pigz does. Each chunk but the last one of a file
+    ends with a sync flush, so that their concatenation is a valid
+    deflate stream. Chunks are written in order by the calling thread,
+    so the archive is the same whatever the number of threads.
+    """
+    if level is None:
+        level = zlib.Z_DEFAULT_COMPRESSION
+    num_jobs = qisys.parallel.get_num_jobs(num_jobs)
+    jobs = list()
+    for (i, (full_path, arcname)) in enumerate(to_add):
+        if os.path.islink(full_path):
+            jobs.append(_DeflateJob(i, full_path, arcname))
+            continue
+        size = os.path.getsize(full_path)
+        offset = 0
+        while True:
+            chunk_size = min(DEFLATE_CHUNK_SIZE, size - offset)
+            last = offset + chunk_size >= size
+            jobs.append(_DeflateJob(i, full_path, arcname, offset, chunk_size, last, level))
+            if last:
+                break
+            offset += chunk_size
+    member = None
+    # Only keep a few chunks per thread in memory
+    batch_size = num_jobs * 4
+    for start in range(0, len(jobs), batch_size):
+        batch = jobs[start:start + batch_size]
+        for result in qisys.parallel.imap(batch, _deflate_chunk, n_jobs=num_jobs):
+            if not result.ok:
+                raise result.exception
+            job = result.item
+            if job.offset is None:
+                on_added(job.index, job.full_path)
+                attr, content = _symlink_zip_info(job.full_path, job.arcname)
+                archive.writestr(attr, content)
+                continue
+            if job.offset == 0:
+                on_added(job.index, job.full_path)
+                member = _RawZipMember(archive, job.full_path, job.arcname)
+            member.write(*result.value)
+            if job.last:
+                member.close()
+
+
+class _DeflateJob(object):
+    """ A chunk of a file to deflate, or a symlink if offset is None """
+
+    def __init__(self, index, full_path, arcname, offset=None, size=0, last=True, level=None):
+        """ _DeflateJob Init """
+        self.index = index
+        self.full_path = full_path
+        self.arcname = arcname
+        self.offset = offset
+        self.size = size
+        self.last = last
+        self.level = level
+
+    def __repr__(self):
+        """ _DeflateJob Representation """
+        return "%s[%s:+%i]" % (self.full_path, self.offset, self.size)
+
+
+def _deflate_chunk(job):
+    """ Return the chunk of the file and its raw deflated data """
+    if job.offset is None:
+        return None
+    with open(job.full_path, "rb") as fp:
+        fp.seek(job.offset)
+        data = fp.read(job.size)
+    compressor = zlib.compressobj(job.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    flush_mode = zlib.Z_FINISH if job.last else zlib.Z_SYNC_FLUSH
+    return data, compressor.compress(data) + compressor.flush(flush_mode)
+
+
+class _RawZipMember(object):
+    """
+    Write already deflated data as a member of a zip archive,
+    the same way ZipFile.write() does
+    """
+
+    def __init__(self, archive, full_path, arcname):
+        """ _RawZipMember Init """
+        self.archive = archive
+        self.zinfo = zipfile.ZipInfo.from_file(full_path, arcname)
+        self.zinfo.compress_type = zipfile.ZIP_DEFLATED
+        self.zinfo.compress_size = 0
+        self.zinfo.CRC = 0
+        self.zip64 = self.zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        self.file_size = 0
+        self.compress_size = 0
+        self.crc = 0
+        archive.fp.seek(archive.start_dir)
+        self.zinfo.header_offset = archive.fp.tell()
+        archive._writecheck(self.zinfo)  # pylint:disable=protected-access
+        archive._didModify = True  # pylint:disable=protected-access
+        archive.fp.write(self.zinfo.FileHeader(self.zip64))
+
+    def write(self, data, deflated):
+        """ Append a chunk of the file """
+        self.file_size += len(data)
+        self.crc = zlib.crc32(data, self.crc) & 0xffffffff
+        self.compress_size += len(deflated)
+        self.archive.fp.write(deflated)
+
+    def close(self):
+        """ Write the sizes and the CRC in the header, and register the member """
+        archive = self.archive
+        zinfo = self.zinfo
+        zinfo.file_size = self.file_size
+        zinfo.compress_size = self.compress_size
+        zinfo.CRC = self.crc
+        if not self.zip64 and max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT:
+            raise Exception("File size too large for a zip archive without zip64: %s" % zinfo.filename)
+        archive.start_dir = archive.fp.tell()
+        archive.fp.seek(zinfo.header_offset)
+        archive.fp.write(zinfo.FileHeader(self.zip64))
+        archive.fp.seek(archive.start_dir)
+        archive.filelist.append(zinfo)
+        archive.NameToInfo[zinfo.filename] = zinfo
+
+
+def _extract_zip(archive, directory, quiet, verbose, strict_mode=True, num_jobs=0):
     """
     Extract a zip archive into directory
     :param archive:   path of the archive
     :param directory: extract location
     :param quiet:     quiet mode (print nothing)
     :param verbose:   verbose mode (print all the archive content)
+    :param num_jobs:  number of threads inflating the files (default: one per CPU)
     :return: path to the extracted archive (directory/topdir)
     """
     if quiet and verbose:
@@ -143,64 +340,57 @@ Please set only one of these two options to 'True'
 """
         raise ValueError(mess)
     ui.debug("Extracting", archive, "to", directory)
+    start = time.time()
     try:
         archive_ = zipfile.ZipFile(archive, allowZip64=True)
     except zipfile.BadZipfile:
         mess = 'ZIP file seems corrupted. Try removing it and relaunch command.\n'
         mess += '              rm ' + archive + '\n'
         raise Exception(mess)
-    members = archive_.infolist()
-    # There is always the top dir as the first element of the archive
-    # (or so we hope)
-    # BUG ON !!!
-    # zipped ro files do not appears as members, so the following
-    # stratement failed if the whole content of the archive is read-only.
-    orig_topdir = members[0].filename.split(posixpath.sep)[0]
-    size = len(members)
-    directories = list()
-    for (i, member) in enumerate(members):
-        member_top_dir = member.filename.split(posixpath.sep)[0]
-        if i != 0 and member_top_dir != orig_topdir:
-            # something wrong: members do not have the
-            # same basename
-            mess = "Invalid member %s in archive:\n" % member.filename
-            mess += "Every file must be in the same top dir (%s != %s)" % \
-                (orig_topdir, member_top_dir)
-            if strict_mode:
-                raise InvalidArchive(mess)
-        new_path = os.path.join(directory, member.filename)
-        qisys.sh.mkdir(os.path.dirname(new_path), recursive=True)
-        if member.external_attr == 2716663808:
-            target = archive_.read(member.filename)
-            os.symlink(target, new_path)  # pylint:disable=no-member
-        else:
-            archive_.extract(member, path=directory)
-            # Fix permision on extracted file unless it is a directory
-            # or if we are on windows
-            if member.filename.endswith("/"):
+    with contextlib.closing(archive_):
+        members = archive_.infolist()
+        # There is always the top dir as the first element of the archive
+        # (or so we hope)
+        # BUG ON !!!
+        # zipped ro files do not appears as members, so the following
+        # stratement failed if the whole content of the archive is read-only.
+        orig_topdir = members[0].filename.split(posixpath.sep)[0]
+        directories = list()
+        files = list()
+        for (i, member) in enumerate(members):
+            member_top_dir = member.filename.split(posixpath.sep)[0]
+            if i != 0 and member_top_dir != orig_topdir:
+                # something wrong: members do not have the
+                # same basename
+                mess = "Invalid member %s in archive:\n" % member.filename
+                mess += "Every file must be in the same top dir (%s != %s)" % \
+                    (orig_topdir, member_top_dir)
+                if strict_mode:
+                    raise InvalidArchive(mess)
+            new_path = os.path.join(directory, member.filename)
+            qisys.sh.mkdir(os.path.dirname(new_path), recursive=True)
+            if member.external_attr == 2716663808:
+                target = archive_.read(member.filename)
+                os.symlink(target, new_path)  # pylint:disable=no-member
+            elif member.filename.endswith("/"):
+                archive_.extract(member, path=directory)
                 directories.append(member)
                 qisys.sh.mkdir(new_path)
-                new_st = 0o777
+                # Writable until every file has been extracted
+                _chmod(new_path, 0o777)
             else:
-                new_st = member.external_attr >> 16
-            # permissions are meaningless on windows, here only the exension counts
-            if not sys.platform.startswith("win"):
-                if new_st != 0:
-                    os.chmod(new_path, new_st)
-            if not quiet:
-                qisys.ui.info_progress(i, size, "Done")
-            elif verbose and sys.stdout.isatty():
-                sys.stdout.write(member.encode('ascii', "ignore"))
-                sys.stdout.flush()
+                files.append(member)
+        num_bytes = sum(x.file_size for x in files)
+        if num_bytes < PARALLEL_ZIP_MIN_SIZE:
+            num_jobs = 1
+        _inflate_zip_members(archive, archive_, files, directory,
+                             quiet, verbose, num_jobs)
     # Reverse sort directories, and then fix perm on these
     directories = sorted(directories, key=operator.attrgetter('filename'), reverse=True)
     for zipinfo in directories:
         dirpath = os.path.join(directory, zipinfo.filename)
-        new_st = zipinfo.external_attr >> 16
-        if not sys.platform.startswith("win"):
-            if new_st != 0:
-                os.chmod(dirpath, new_st)
-    archive_.close()
+        _chmod(dirpath, zipinfo.external_attr >> 16)
+    _report_throughput(archive, len(files), num_bytes, start)
     ui.debug(archive, "extracted in", directory)
     if strict_mode:
         res = os.path.join(directory, orig_topdir)
@@ -209,7 +399,67 @@ Please set only one of these two options to 'True'
     return res
 
 
-def _get_tar_command(action, algo, filename, directory, quiet, add_opts=None, flat=False):
+def _inflate_zip_members(archive, archive_, members, directory, quiet, verbose, num_jobs):
+    """
+    Extract the given members of a zip archive, using num_jobs threads.
+    Each thread reads the archive through its own ZipFile object.
+    """
+    num_jobs = qisys.parallel.get_num_jobs(num_jobs, len(members))
+    local = threading.local()
+    opened = list()
+    opened_lock = threading.Lock()
+
+    def extract_member(member):
+        """ Extract one file and fix its permissions """
+        zip_file = getattr(local, "zip_file", None)
+        if zip_file is None:
+            if num_jobs == 1:
+                zip_file = archive_
+            else:
+                zip_file = zipfile.ZipFile(archive, allowZip64=True)
+                with opened_lock:
+                    opened.append(zip_file)
+            local.zip_file = zip_file
+        zip_file.extract(member, path=directory)
+        _chmod(os.path.join(directory, member.filename), member.external_attr >> 16)
+
+    def on_progress(i, total, result):
+        """ Display the progress of the extraction """
+        if not quiet:
+            qisys.ui.info_progress(i, total, "Done")
+        elif verbose and sys.stdout.isatty():
+            sys.stdout.write(result.item.filename + "\n")
+            sys.stdout.flush()
+
+    try:
+        for result in qisys.parallel.imap(members, extract_member, n_jobs=num_jobs,
+                                          ordered=False, on_progress=on_progress):
+            if not result.ok:
+                raise result.exception
+    finally:
+        for zip_file in opened:
+            zip_file.close()
+
+
+def _chmod(path, mode):
+    """ Set the permissions of an extracted file, unless they are unknown """
+    # permissions are meaningless on windows, here only the exension counts
+    if sys.platform.startswith("win"):
+        return
+    if mode != 0:
+        os.chmod(path, mode)
+
+
+def _report_throughput(archive, num_files, num_bytes, start):
+    """ Tell how fast the archive was extracted """
+    elapsed = max(time.time() - start, 1e-6)
+    ui.debug("Extracted %i files (%.1f MB) from %s in %.2fs (%.1f MB/s)" %
+             (num_files, num_bytes / 1024.0 ** 2, archive, elapsed,
+              num_bytes / 1024.0 ** 2 / elapsed))
+
+
+def _get_tar_command(action, algo, filename, directory, quiet, add_opts=None, flat=False,
+                     compress_program=None):
     """
     Generate a tar command line
     :param action:    compression/exctraction switch [compress|extract]
@@ -222,6 +472,8 @@ def _get_tar_command(action, algo, filename, directory, quiet, add_opts=None, fl
                       generated tar command line
     :param flat:      if False, put all files in a common top dir
                       (default: False)
+    :param compress_program: command line of the compression program
+                      to use instead of the default one for algo
     :return: the list containing the whole tar commnand
     """
     cmd = [qisys.command.find_program("tar", raises=True)]
@@ -241,7 +493,12 @@ def _get_tar_command(action, algo, filename, directory, quiet, add_opts=None, fl
         cmd += ["--extract"]
         cwd = directory
         data = None
-    if algo != "tar":
+    if compress_program:
+        cmd += ["--use-compress-program", compress_program]
+    elif algo == "zstd":
+        # Older versions of tar have no --zstd option
+        cmd += ["--use-compress-program", "zstd"]
+    elif algo != "tar":
         cmd += ["--{0}".format(algo)]
     cmd += ["--file", filename]
     if cwd == "":
@@ -252,7 +509,8 @@ def _get_tar_command(action, algo, filename, directory, quiet, add_opts=None, fl
     return cmd
 
 
-def _compress_tar(directory, output=None, algo=None, quiet=True, verbose=False, flat=False):
+def _compress_tar(directory, output=None, algo=None, quiet=True, verbose=False, flat=False,
+                  level=None, num_jobs=0):
     """
     Compress directory in a .tar.* archive
     :param directory:        directory to add to the archive
@@ -262,6 +520,10 @@ def _compress_tar(directory, output=None, algo=None, quiet=True, verbose=False,
     :param verbose:          verbose mode (print all the archive content)
     :param flat:             if False, put all files in a common top dir
                              (default: False)
+    :param level:            compression level (default: the one of the program)
+    :param num_jobs:         number of threads compressing the archive, when
+                             a multi-threaded program is available
+                             (default: one per CPU)
     :return: path to the generated archive (archive_basepath.tar.*)
     """
     if quiet and verbose:
@@ -270,7 +532,9 @@ Please set only one of these two options to 'True'
 """
         raise ValueError(mess)
     ui.debug("Compressing", directory, "to", output)
-    cmd = _get_tar_command("compress", algo, output, directory, quiet, flat=flat)
+    compress_program = _get_compress_program(algo, level=level, num_jobs=num_jobs)
+    cmd = _get_tar_command("compress", algo, output, directory, quiet, flat=flat,
+                           compress_program=compress_program)
     try:
         if verbose:
             __printed = qisys.command.check_output(cmd, stderr=subprocess.STDOUT)
@@ -285,6 +549,38 @@ Please set only one of these two options to 'True'
     return output
 
 
+def _get_compress_program(algo, level=None, num_jobs=0):
+    """
+    Command line of the program tar should use to compress the archive,
+    or None to let tar use its default one.
+    Multi-threaded programs (pigz, lbzip2, pbzip2, xz -T, zstd -T) are used
+    when they are available.
+    """
+    if algo == "tar":
+        return None
+    threads = str(qisys.parallel.get_num_jobs(num_jobs))
+    candidates = {
+        "gzip": [["pigz", "-p", threads]],
+        "bzip2": [["lbzip2", "-n", threads], ["pbzip2", "-p" + threads]],
+        "xz": [["xz", "-T", threads]],
+        "zstd": [["zstd", "-T" + threads]],
+    }
+    cmd = None
+    for candidate in candidates.get(algo, list()):
+        if qisys.command.find_program(candidate[0]):
+            cmd = candidate
+            break
+    if cmd is None:
+        if algo == "zstd":
+            raise Exception("Could not find zstd, which is required to create .tar.zst archives")
+        if level is None:
+            return None
+        cmd = [algo]
+    if level is not None:
+        cmd.append("-%i" % level)
+    return " ".join(cmd)
+
+
 def _extract_tar(archive, directory, algo, quiet, verbose, output_filter=None):
     """
     Extract a .tar.* archive into directory
@@ -295,6 +591,131 @@ def _extract_tar(archive, directory, algo, quiet, verbose, output_filter=None):
     :param verbose:   verbose mode (print all the archive content)
     :param output_filter:  regex applied on all outputs
     :return: path to the extracted archive (directory/topdir)
+    The archive is read once, the top directory being guessed
+    from its first member:
+    * if it starts with '/' or '.', the first component of every path is
+      removed, and the files are extracted in a directory named after the archive
+    * otherwise, the archive is extracted as is in directory
+    """
+    if quiet and verbose:
+        mess = """Unconsistent arguments: both 'quiet' and 'verbose' options are set.
+Please set only one of these two options to 'True'
+"""
+        raise ValueError(mess)
+    ui.debug("Extracting", archive, "to", directory)
+    if algo == "zstd" and "zst" not in getattr(tarfile.TarFile, "OPEN_METH", dict()):
+        return _extract_tar_command(archive, directory, algo, quiet, verbose,
+                                    output_filter=output_filter)
+    start = time.time()
+    try:
+        # Streaming mode: the archive is only read once, from start to end
+        tar = tarfile.open(archive, "r|*")
+    except tarfile.CompressionError:
+        # For instance xz on Python2
+        return _extract_tar_command(archive, directory, algo, quiet, verbose,
+                                    output_filter=output_filter)
+    except (tarfile.TarError, EnvironmentError, EOFError) as err:
+        raise Exception(_tar_error_message(archive, directory, err))
+    destdir = directory
+    strip = False
+    directories = list()
+    num_files = 0
+    num_bytes = 0
+    try:
+        with contextlib.closing(tar):
+            for (i, member) in enumerate(tar):
+                if i == 0:
+                    (directory, destdir, strip) = _get_tar_layout(archive, directory, member.name)
+                    qisys.sh.mkdir(directory, recursive=True)
+                if not quiet:
+                    if not output_filter or not re.search(output_filter, member.name):
+                        print(member.name)
+                name = _get_tar_member_path(member.name, strip)
+                if not name:
+                    continue
+                member.name = name
+                if member.islnk():
+                    linkname = _get_tar_member_path(member.linkname, strip)
+                    if not linkname:
+                        continue
+                    member.linkname = linkname
+                if member.isdir():
+                    # Permissions are set once every file is extracted,
+                    # in case the directory is read-only
+                    qisys.sh.mkdir(os.path.join(directory, name), recursive=True)
+                    directories.append(member)
+                    continue
+                _extract_tar_member(tar, member, directory)
+                num_files += 1
+                num_bytes += member.size
+            for member in sorted(directories, key=operator.attrgetter("name"), reverse=True):
+                dirpath = os.path.join(directory, member.name)
+                tar.chmod(member, dirpath)
+                tar.utime(member, dirpath)
+    except (tarfile.TarError, EnvironmentError, EOFError) as err:
+        raise Exception(_tar_error_message(archive, directory, err))
+    _report_throughput(archive, num_files, num_bytes, start)
+    return destdir
+
+
+def _get_tar_layout(archive, directory, first_name):
+    """
+    Guess where to extract the archive from the name of its first member
+    :return: a tuple (extract location, path to the extracted archive,
+             whether to strip the first component of the paths)
+    """
+    if first_name[0] in ["/", "."]:
+        archroot = os.path.basename(archive)
+        archroot = archroot.rsplit(".", 1)[0]
+        if archroot.endswith(".tar"):
+            archroot = archroot.rsplit(".tar", 1)[0]
+        directory = os.path.join(directory, archroot)
+        return directory, directory, True
+    topdir = first_name.split("/", 1)[0]
+    return directory, os.path.join(directory, topdir), False
+
+
+def _get_tar_member_path(name, strip):
+    """
+    Path of the member relative to the extract location, as tar would
+    compute it: without leading '/', and without its first component if
+    strip is True.
+    Return None if the member must not be extracted.
+    """
+    parts = name.lstrip("/").split("/")
+    if strip:
+        parts = parts[1:]
+    parts = [x for x in parts if x not in ["", "."]]
+    if ".." in parts:
+        ui.warning("Skipping member containing '..':", name)
+        return None
+    return "/".join(parts)
+
+
+def _extract_tar_member(tar, member, directory):
+    """ Extract one member, keeping its permissions, even with recent Pythons """
+    kwargs = dict()
+    if hasattr(tarfile, "fully_trusted_filter"):
+        # Do what tar does: keep symlinks, modes and so on
+        kwargs["filter"] = "fully_trusted"
+    path = os.path.join(directory, member.name)
+    if os.path.lexists(path) and not os.path.isdir(path):
+        os.remove(path)
+    tar.extract(member, path=directory, **kwargs)
+
+
+def _tar_error_message(archive, directory, err):
+    """ Error message when the archive could not be read """
+    mess = "Could not extract %s to %s\n" % (archive, directory)
+    mess += "Extracting tar failed\n"
+    mess += str(err)
+    return mess
+
+
+def _extract_tar_command(archive, directory, algo, quiet, verbose, output_filter=None):
+    """
+    Same as :py:func:`_extract_tar`, by calling the ``tar`` program, for
+    the formats the tarfile module does not support
     """
     if quiet and verbose:
         mess = """Unconsistent arguments: both 'quiet' and 'verbose' options are set.
@@ -335,7 +756,7 @@ Please set only one of these two options to 'True'
     else:
         destdir = os.path.join(directory, topdir)
     cmd = _get_tar_command("extract", algo, archive, directory, quiet, add_opts=opts)
-    qisys.sh.mkdir(directory)
+    qisys.sh.mkdir(directory, recursive=True)
     try:
         if verbose:
             printed = qisys.command.check_output(cmd, stderr=subprocess.STDOUT)
@@ -354,7 +775,8 @@ Please set only one of these two options to 'True'
 
 
 def compress(directory, algo="zip", output=None, flat=False,
-             quiet=False, verbose=False, display_progress=False):
+             quiet=False, verbose=False, display_progress=False,
+             level=None, num_jobs=0):
     """
     Compress directory in an archive
     :param directory: directory to add to the archive
@@ -365,6 +787,10 @@ def compress(directory, algo="zip", output=None, flat=False,
                       (default: False)
     :param flat:      if false, put all files in a common top dir
                       (default: False)
+    :param level:     compression level (default: the one of the algorithm),
+                      see COMPRESSION_LEVELS for the valid ones
+    :param num_jobs:  number of threads compressing the archive
+                      (default: one per CPU)
     :return: path to the generated archive
     """
     if quiet and verbose:
@@ -373,6 +799,7 @@ Please set only one of these two options to 'True'
 """
         raise ValueError(mess)
     _check_algo(algo)
+    _check_level(algo, level)
     directory = qisys.sh.to_native_path(directory)
     directory = os.path.abspath(directory)
     if output is None:
@@ -380,10 +807,12 @@ Please set only one of these two options to 'True'
     if algo == "zip":
         archive_path = _compress_zip(directory, quiet=quiet, verbose=verbose,
                                      display_progress=display_progress,
-                                     output=output, flat=flat)
+                                     output=output, flat=flat,
+                                     level=level, num_jobs=num_jobs)
     else:
         archive_path = _compress_tar(directory, quiet=quiet, verbose=verbose,
-                                     output=output, algo=algo, flat=flat)
+                                     output=output, algo=algo, flat=flat,
+                                     level=level, num_jobs=num_jobs)
     return archive_path
 
 
@@ -398,13 +827,15 @@ def get_default_output(directory, algo):
         res += ".tar.bz2"
     elif algo == "xz":
         res += ".tar.xz"
+    elif algo == "zstd":
+        res += ".tar.zst"
     elif algo == "zip":
         res += ".zip"
     return res
 
 
 def extract(archive, directory, algo=None, quiet=False,
-            verbose=False, strict_mode=True):
+            verbose=False, strict_mode=True, num_jobs=0):
     """
     Extract a an archive into directory
     :param archive:   path of the archive
@@ -412,6 +843,8 @@ def extract(archive, directory, algo=None, quiet=False,
     :param algo:      uncompression method (default: guessed from the archive name)
     :param quiet:     silent mode (default: False)
     :param verbose:   verbose mode, print all the archive content (default: False)
+    :param num_jobs:  number of threads inflating large zip archives
+                      (default: one per CPU)
     :return: path to the extracted archive (directory/topdir)
     """
     if algo:
@@ -424,7 +857,7 @@ def extract(archive, directory, algo=None, quiet=False,
     archive = os.path.abspath(archive)
     if algo == "zip":
         extract_location = _extract_zip(archive, directory, quiet, verbose,
-                                        strict_mode=strict_mode)
+                                        strict_mode=strict_mode, num_jobs=num_jobs)
     else:
         extract_location = _extract_tar(archive, directory, algo, quiet, verbose)
     return extract_location
@@ -445,6 +878,8 @@ def guess_algo(archive):
         algo = "bzip2"
     elif "xz" in extension:
         algo = "xz"
+    elif "zst" in extension:
+        algo = "zstd"
     else:
         algo = extension
     return algo
@@ -523,9 +523,12 @@ def check_is_in_path(executable, env=None):
         raise NotInPath(executable, env=env)
 
 
-def call(cmd, cwd=None, env=None, ignore_ret_code=False, quiet=False, build_config=None):
+def call(cmd, cwd=None, env=None, ignore_ret_code=False, quiet=False, build_config=None,
+         output=None):
     """
     Execute a command line.
+    If output is a file object, the output of the command (stdout and stderr)
+    is written there instead of the console.
     If ignore_ret_code is False:
         raise CommandFailedException if returncode is None.
     Else:
@@ -555,7 +558,11 @@ def call(cmd, cwd=None, env=None, ignore_ret_code=False, quiet=False, build_conf
     if env:
         env = dict(((str(key), str(val)) for key, val in env.items()))
     call_kwargs = {"env": env, "cwd": cwd}
-    if quiet or ui.CONFIG.get("quiet"):
+    if output is not None:
+        output.flush()
+        call_kwargs["stdout"] = output
+        call_kwargs["stderr"] = subprocess.STDOUT
+    elif quiet or ui.CONFIG.get("quiet"):
         call_kwargs["stdout"] = subprocess.PIPE
     returncode = subprocess.call(cmd, **call_kwargs)
     if returncode != 0 and not ignore_ret_code:
@@ -8,59 +8,194 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import threading
-import functools
-import collections
+import traceback
+import multiprocessing
+import six
 
+import qisys.command
 
-def foreach(source, action, n_jobs=0):
+if six.PY3:
+    import queue as Queue
+else:
+    import Queue
+
+
+class Result(object):
+    """ What happened when calling the action on one item """
+
+    def __init__(self, index, item):
+        """ Result Init """
+        self.index = index
+        self.item = item
+        self.value = None
+        self.exception = None
+        self.traceback = None
+
+    @property
+    def ok(self):
+        """ True if the action did not raise """
+        return self.exception is None
+
+    def __repr__(self):
+        """ String Representation """
+        if self.ok:
+            return "<Result %s: %s>" % (self.item, self.value)
+        return "<Result %s: %s failed>" % (self.item, self.exception.__class__.__name__)
+
+
+class ForeachError(Exception):
+    """ Raised by foreach() when the action failed for some items """
+
+    def __init__(self, failures):
+        """ ForeachError Init """
+        super(ForeachError, self).__init__()
+        self.failures = failures
+
+    def __str__(self):
+        """ String Representation """
+        mess = "%i item(s) failed:\n" % len(self.failures)
+        for failure in self.failures:
+            mess += " * %s: %s\n" % (failure.item, failure.exception)
+        return mess
+
+
+def get_num_jobs(n_jobs, num_items=None):
+    """
+    Number of threads to use: the number of CPUs if n_jobs is 0 or None,
+    and never more than the number of items.
+    """
+    if not n_jobs:
+        try:
+            n_jobs = multiprocessing.cpu_count()
+        except NotImplementedError:
+            n_jobs = 1
+    if num_items is not None:
+        n_jobs = min(n_jobs, num_items)
+    return max(n_jobs, 1)
+
+
+def foreach(source, action, n_jobs=0, on_progress=None):
     """
     Parallel for
-    If n_jobs == 0, there is no limit to the number of jobs, i.e. a thread is
-    launched for each item in `source`.
+    Call action on every item in `source`, using at most n_jobs threads.
+    If n_jobs == 0, one thread per CPU is used.
     If n_jobs == 1, this is equivalent to:
     >>> for i in source:
     >>>     action(i)
+    Return the list of the values returned by action, in the same
+    order as `source`.
+    If the action raises for some items, the other items are still processed,
+    then a ForeachError listing every failure is raised.
+    :param on_progress: see :py:func:`imap`
     """
-    if not n_jobs:
-        _foreach_no_limit(source, action)
-    elif n_jobs == 1:
-        for item in source:
-            action(item)
+    results = list(imap(source, action, n_jobs=n_jobs, on_progress=on_progress))
+    failures = [x for x in results if not x.ok]
+    if failures:
+        raise ForeachError(failures)
+    return [x.value for x in results]
+
+
+def imap(source, action, n_jobs=0, ordered=True, on_progress=None):
+    """
+    Same as foreach, but yield a :py:class:`Result` for each item
+    as soon as it is available, failures included.
+    If ordered is False, results are yielded in the order they complete.
+    :param on_progress: called in the calling thread each time an item is done,
+                        as on_progress(i, total, result), i being the number
+                        of items done before this one, so that
+                        ``ui.info_count`` can be called directly.
+    Stop starting new items when ``qisys.command.SIGINT_EVENT`` is set,
+    or when the iteration is stopped by the caller.
+    If some items were not processed because of SIGINT_EVENT,
+    KeyboardInterrupt is raised.
+    """
+    items = list(source)
+    if not items:
+        return
+    n_jobs = get_num_jobs(n_jobs, len(items))
+    if n_jobs == 1:
+        results = _imap_sequential(items, action)
     else:
-        _foreach_with_limit(source, action, n_jobs)
+        results = _imap_threads(items, action, n_jobs)
+    pending = dict()
+    next_index = 0
+    num_done = 0
+    try:
+        for result in results:
+            if on_progress:
+                on_progress(num_done, len(items), result)
+            num_done += 1
+            if not ordered:
+                yield result
+                continue
+            pending[result.index] = result
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+    finally:
+        results.close()
+    if num_done < len(items):
+        raise KeyboardInterrupt()
 
 
-def _foreach_worker(q, action):
-    """ Foreach Worker """
-    while True:
+def _run(action, result):
+    """ Call action on the item of result, storing the return value or the exception """
+    try:
+        result.value = action(result.item)
+    except (Exception, SystemExit) as e:
+        result.exception = e
+        result.traceback = traceback.format_exc()
+
+
+def _imap_sequential(items, action):
+    """ Process the items in the calling thread """
+    for index, item in enumerate(items):
+        if qisys.command.SIGINT_EVENT.is_set():
+            return
+        result = Result(index, item)
+        _run(action, result)
+        yield result
+
+
+def _imap_threads(items, action, n_jobs):
+    """ Process the items in n_jobs threads, yielding results as they come """
+    todo = Queue.Queue()
+    for index, item in enumerate(items):
+        todo.put(Result(index, item))
+    done = Queue.Queue()
+    stop = threading.Event()
+
+    def worker():
+        """ Process items until there is nothing left to do, then put None in the done queue """
         try:
-            item = q.popleft()
-        except IndexError:
-            break
-        action(item)
-
-
-def _foreach_with_limit(source, action, n_jobs):
-    """ Foreach With Limit """
-    assert n_jobs >= 0
-    q = collections.deque()
-    for item in source:
-        q.append(item)
-    threads = [threading.Thread(target=functools.partial(_foreach_worker, q, action))
-               for _ in range(n_jobs)]
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
-
-
-def _foreach_no_limit(source, action):
-    """ Foreach No Limit """
-    threads = [
-        threading.Thread(target=functools.partial(action, item))
-        for item in source
-    ]
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
+            while not stop.is_set() and not qisys.command.SIGINT_EVENT.is_set():
+                try:
+                    result = todo.get_nowait()
+                except Queue.Empty:
+                    break
+                _run(action, result)
+                done.put(result)
+        finally:
+            done.put(None)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_jobs)]
+    for thread in threads:
+        thread.start()
+    running = len(threads)
+    try:
+        while running:
+            result = done.get()
+            if result is None:
+                running -= 1
+            else:
+                yield result
+    except KeyboardInterrupt:
+        qisys.command.SIGINT_EVENT.set()
+        raise
+    finally:
+        # Either everything is done, or the caller stopped iterating,
+        # or ctrl-c was pressed: in any case, do not start anything else
+        stop.set()
+        for thread in threads:
+            thread.join()
+
@@ -49,6 +49,62 @@ def parallel_parser(parser, default=cpu_count()):
                         "(default: %(default)s)")
 
 
+def foreach_parser(parser):
+    """ Given a parser, add the options of the foreach actions. """
+    group = parser.add_argument_group("foreach options")
+    parallel_parser(group, default=1)
+    group.add_argument("--stream", action="store_true",
+                       help="when using -j, display the output as soon as it is written, "
+                       "prefixed by the project, instead of one project at a time")
+    group.add_argument("--timeout", type=int, metavar="SECONDS",
+                       help="kill the commands still running after this many seconds, "
+                       "and skip the remaining projects")
+
+
+def compression_parser(parser):
+    """ Given a parser, add the options controlling how archives are compressed. """
+    group = parser.add_argument_group("compression options")
+    group.add_argument("--compression-level", dest="compression_level", type=int,
+                       metavar="LEVEL",
+                       help="compression level, from 0 (fastest) to 9 (smallest) for zip "
+                       "and xz, from 1 to 9 for gzip and bzip2, from 1 to 19 for zstd")
+    group.add_argument("--compression-jobs", dest="compression_jobs", type=int,
+                       default=0, metavar="N",
+                       help="number of threads compressing the archive "
+                       "(default: one per CPU)")
+
+
+def copy_parser(parser):
+    """ Given a parser, add the options controlling how files are installed. """
+    group = parser.add_argument_group("copy options")
+    group.add_argument("--copy-strategy", dest="copy_strategy",
+                       choices=qisys.sh.COPY_STRATEGIES,
+                       help="how to install files: copy them (default), use hard links, "
+                       "use copy-on-write clones (reflink), or only copy files "
+                       "which changed (update). Defaults to $QI_COPY_STRATEGY. "
+                       "Only applies to the files installed by this command")
+    group.add_argument("--copy-jobs", dest="copy_jobs", type=int, metavar="N",
+                       help="number of threads copying files "
+                       "(default: $QI_COPY_JOBS, or %i)" % qisys.sh.DEFAULT_COPY_JOBS)
+
+
+def get_copy_options(args):
+    """
+    The copy strategy and the number of copy threads given on the command
+    line, or in the QI_COPY_STRATEGY and QI_COPY_JOBS environment variables.
+    Return a tuple (strategy, num_jobs), to be passed explicitly to the
+    code installing files, see :py:func:`qisys.sh.install`
+    """
+    strategy = getattr(args, "copy_strategy", None) or os.environ.get("QI_COPY_STRATEGY") or "copy"
+    if strategy not in qisys.sh.COPY_STRATEGIES:
+        raise Exception("Unknown copy strategy: %s (choose between %s)" %
+                        (strategy, ", ".join(qisys.sh.COPY_STRATEGIES)))
+    num_jobs = getattr(args, "copy_jobs", None) or os.environ.get("QI_COPY_JOBS")
+    if num_jobs:
+        num_jobs = int(num_jobs)
+    return strategy, num_jobs
+
+
 def log_parser(parser):
     """ Given a parser, add the options controlling log. """
     group = parser.add_argument_group("logging options")
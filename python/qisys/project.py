@@ -47,15 +47,26 @@ class WorkTreeProject(object):
         """ Write the Licence """
         qisrc.license.write_license(self.qiproject_xml, value)
 
+    def read_qiproject_xml(self):
+        """
+        Return the parsed qiproject.xml.
+        The tree is shared by all the worktree objects and must not be modified
+        """
+        return self.worktree.qiproject_index.read(self.qiproject_xml)
+
+    def get_qiproject_data(self, layer, parse):
+        """
+        Return what ``parse`` reads from the qiproject.xml tree,
+        see :py:meth:`qisys.worktree.QiProjectIndex.get_data`
+        """
+        return self.worktree.qiproject_index.get_data(self.qiproject_xml, layer, parse)
+
     def parse_qiproject_xml(self):
         """ Parse the qiproject.xml, filling the subprojects list """
         if not os.path.exists(self.qiproject_xml):
             return
-        tree = qisys.qixml.read(self.qiproject_xml)
-        project_elems = tree.findall("project")
-        for project_elem in project_elems:
-            sub_src = qisys.qixml.parse_required_attr(project_elem, "src",
-                                                      xml_path=self.qiproject_xml)
+        sub_srcs = self.get_qiproject_data("worktree", self._read_sub_srcs)
+        for sub_src in sub_srcs:
             if sub_src == ".":
                 continue
             full_path = os.path.join(self.path, sub_src)
@@ -67,6 +78,11 @@ Found an invalid sub project: {1}
 """.format(self.qiproject_xml, sub_src, full_path))
             self.subprojects.append(sub_src)
 
+    def _read_sub_srcs(self, tree):
+        """ The 'src' attributes of the <project> elements """
+        return [qisys.qixml.parse_required_attr(x, "src", xml_path=self.qiproject_xml)
+                for x in tree.findall("project")]
+
     def __repr__(self):
         """ String Representation """
         return "<WorkTreeProject in %s>" % self.src
@@ -13,8 +13,14 @@ from __future__ import print_function
 import os
 import re
 import io
+import json
+import base64
+import socket
 import ftplib
+import hashlib
+import threading
 import six
+from six.moves import http_client
 
 import qibuild.config
 import qisys.sh
@@ -23,12 +29,16 @@ from qisys import ui
 
 if six.PY3:
     from urllib import parse as urlparse
+    from urllib.error import HTTPError
     from urllib.request import HTTPPasswordMgrWithDefaultRealm, HTTPBasicAuthHandler,\
-        build_opener, install_opener, urlopen
+        build_opener, install_opener, urlopen, Request, getproxies, proxy_bypass
 else:
     import urlparse
     from urllib2 import HTTPPasswordMgrWithDefaultRealm, HTTPBasicAuthHandler,\
-        build_opener, install_opener, urlopen
+        build_opener, install_opener, urlopen, Request, HTTPError
+    from urllib import getproxies, proxy_bypass
+
+BUFF_SIZE = 100 * 1024
 
 
 def progress_callback(total, done):
@@ -62,8 +72,11 @@ def get_ftp_access(server_name):
     return access.username, access.password, access.root
 
 
-def authenticated_urlopen(location):
-    """ A wrapper around urlopen adding authentication information if provided by the user. """
+def authenticated_urlopen(location, headers=None):
+    """
+    A wrapper around urlopen adding authentication information if provided by the user.
+    :param headers: a dict of additional request headers
+    """
     passman = HTTPPasswordMgrWithDefaultRealm()
     server_name = urlparse.urlsplit(location).netloc
     access = get_server_access(server_name)
@@ -75,6 +88,8 @@ def authenticated_urlopen(location):
     authhandler = HTTPBasicAuthHandler(passman)
     opener = build_opener(authhandler)
     install_opener(opener)
+    if headers:
+        return urlopen(Request(location, headers=headers))
     return urlopen(location)
 
 
@@ -109,7 +124,8 @@ def open_remote_location(location, timeout=10):
 
 
 def download(url, output_dir, output_name=None,
-             callback=progress_callback, clobber=True, message=None):
+             callback=progress_callback, clobber=True, message=None,
+             sha256=None, conditional=False):
     """
     Download a file from an url, and save it in output_dir.
     :param output_name: The name of the file will be the basename of the url,
@@ -120,6 +136,13 @@ def download(url, output_dir, output_name=None,
         Will be printed right before the progress bar.
     :param clobber: If False, the file won't be overwritten if it
         already exists (True by default)
+    :param sha256: the expected sha256 of the file. An exception
+        is raised if the downloaded file does not match.
+    :param conditional: If True and the file already exists, only download
+        it again if it changed on the server (HTTP only)
+    HTTP downloads go to a .part file first, which is kept if the
+    download fails, so that the next download of the same url only
+    fetches what is missing. Connections to the same server are reused.
     :return: the path to the downloaded file
     """
     qisys.sh.mkdir(output_dir, recursive=True)
@@ -133,13 +156,17 @@ def download(url, output_dir, output_name=None,
         return dest_name
     if message:
         ui.info(*message)
+    url_split = urlparse.urlsplit(url)
+    if url_split.scheme in ["http", "https"]:
+        _download_http(url, dest_name, callback=callback,
+                       sha256=sha256, conditional=conditional)
+        return dest_name
     try:
         dest_file = open(dest_name, "wb")
     except Exception as e:
         mess = "Could not save %s to %s\n" % (url, dest_name)
         mess += "Error was %s" % e
         raise Exception(mess)
-    url_split = urlparse.urlsplit(url)
     url_obj = None
     server_name = url_split.netloc
     try:
@@ -176,10 +203,9 @@ def download(url, output_dir, output_name=None,
             else:
                 content_length = url_obj.headers.dict['content-length']
             size = int(content_length)
-            buff_size = 100 * 1024
             xferd = 0
             while xferd < size:
-                data = url_obj.read(buff_size)
+                data = url_obj.read(BUFF_SIZE)
                 if not data:
                     break
                 xferd += len(data)
@@ -196,9 +222,237 @@ def download(url, output_dir, output_name=None,
     if error:
         qisys.sh.rm(dest_name)
         raise Exception(error)
+    if sha256:
+        _check_sha256(dest_name, sha256, url)
     return dest_name
 
 
+def _download_http(url, dest_name, callback=None, sha256=None, conditional=False):
+    """
+    Helper for download(), resuming the previous download
+    if there is one, and using conditional requests.
+    """
+    info = _read_download_info(dest_name)
+    headers = dict()
+    if conditional and os.path.exists(dest_name) and info.get("url") == url:
+        if info.get("etag"):
+            headers["If-None-Match"] = info["etag"]
+        if info.get("last_modified"):
+            headers["If-Modified-Since"] = info["last_modified"]
+    part_name = dest_name + ".part"
+    part_info = info.get("part", dict())
+    offset = 0
+    if os.path.exists(part_name) and part_info.get("url") == url:
+        offset = os.path.getsize(part_name)
+    if offset:
+        headers["Range"] = "bytes=%i-" % offset
+        # Only resume if the file did not change on the server in the mean time
+        validator = part_info.get("etag") or part_info.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+    error = None
+    response = None
+    try:
+        (status, response_headers, response) = http_get(url, headers=headers)
+        if status in [304, 416]:
+            response.read()
+        if status == 304:
+            ui.debug("Not modified:", url)
+            return
+        if status == 416:
+            # Nothing left to download, or the .part file is bogus:
+            # start again from scratch
+            qisys.sh.rm(part_name)
+            info.pop("part", None)
+            _write_download_info(dest_name, info)
+            headers.pop("Range")
+            headers.pop("If-Range", None)
+            (status, response_headers, response) = http_get(url, headers=headers)
+            offset = 0
+            if status == 304:
+                response.read()
+                return
+        if status not in [200, 206]:
+            raise Exception("HTTP Error %i" % status)
+        if status == 200:
+            offset = 0
+        etag = response_headers.get("etag")
+        last_modified = response_headers.get("last-modified")
+        info["part"] = {"url": url, "etag": etag, "last_modified": last_modified}
+        _write_download_info(dest_name, info)
+        content_length = response_headers.get("content-length")
+        size = offset + int(content_length) if content_length else None
+        xferd = offset
+        with open(part_name, "ab" if offset else "wb") as part_file:
+            while True:
+                data = response.read(BUFF_SIZE)
+                if not data:
+                    break
+                xferd += len(data)
+                if callback and size:
+                    callback(size, xferd)
+                part_file.write(data)
+        if size is not None and xferd < size:
+            raise Exception("Connection closed after %i of %i bytes" % (xferd, size))
+    except Exception as e:
+        error = "Could not download file from %s\n to %s\n" % (url, dest_name)
+        error += "Error was: %s" % e
+    finally:
+        if response:
+            response.close()
+    if error:
+        # Keep the .part file, to resume next time
+        _forget_connection(url)
+        raise Exception(error)
+    if sha256:
+        try:
+            _check_sha256(part_name, sha256, url)
+        except Exception:
+            qisys.sh.rm(part_name)
+            raise
+    qisys.sh.rm(dest_name)
+    os.rename(part_name, dest_name)
+    if conditional:
+        _write_download_info(dest_name, {"url": url, "etag": etag, "last_modified": last_modified})
+    else:
+        # Only needed to resume the download or for the next conditional request
+        forget_download(dest_name)
+
+
+def sha256sum(path):
+    """ Return the sha256 of a file, as an hexadecimal string """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for data in iter(lambda: fp.read(BUFF_SIZE), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def _check_sha256(path, sha256, url):
+    """ Raise if the sha256 of the file does not match """
+    actual = sha256sum(path)
+    if actual.lower() != sha256.lower():
+        mess = "Checksum mismatch for %s\n" % url
+        mess += "Expected sha256: %s\n" % sha256
+        mess += "Actual sha256:   %s" % actual
+        raise Exception(mess)
+
+
+def _get_download_info_path(dest_name):
+    """ Where to store what is known about the download of a file """
+    key = hashlib.sha1(os.path.abspath(dest_name).encode("utf-8")).hexdigest()
+    return qisys.sh.get_cache_path("qi", "downloads", key + ".json")
+
+
+def forget_download(dest_name):
+    """ Remove what is known about the download of a file, when the file is removed """
+    qisys.sh.rm(_get_download_info_path(dest_name))
+
+
+def _read_download_info(dest_name):
+    """ Return the url, ETag and Last-Modified header of the last download """
+    path = _get_download_info_path(dest_name)
+    if not os.path.exists(path):
+        return dict()
+    try:
+        with open(path, "r") as fp:
+            return json.load(fp)
+    except ValueError:
+        return dict()
+
+
+def _write_download_info(dest_name, info):
+    """ Save the url, ETag and Last-Modified header of the last download """
+    with open(_get_download_info_path(dest_name), "w") as fp:
+        json.dump(info, fp)
+
+
+class _Connections(threading.local):
+    """ The HTTP connections kept open by each thread, by scheme and server """
+
+    def __init__(self):
+        """ _Connections Init """
+        super(_Connections, self).__init__()
+        self.by_server = dict()
+
+
+_CONNECTIONS = _Connections()
+
+
+def http_get(url, headers=None, max_redirects=5):
+    """
+    Send a GET request, reusing the connection opened for the previous
+    requests to the same server by the same thread, and following redirects.
+    Go through urllib when a proxy is configured.
+    :returns: a tuple (status, headers as a dict with lower case keys, response).
+              The response must be read until the end or closed.
+    """
+    headers = headers or dict()
+    for _ in range(max_redirects + 1):
+        url_split = urlparse.urlsplit(url)
+        if url_split.scheme in getproxies() and not proxy_bypass(url_split.hostname):
+            return _urllib_get(url, headers)
+        connection = _get_connection(url_split)
+        path = url_split.path or "/"
+        if url_split.query:
+            path += "?" + url_split.query
+        request_headers = dict(headers)
+        access = get_server_access(url_split.netloc)
+        if access and access.username and access.password:
+            credentials = "%s:%s" % (access.username, access.password)
+            token = base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+            request_headers["Authorization"] = "Basic " + token
+        try:
+            connection.request("GET", path, headers=request_headers)
+            response = connection.getresponse()
+        except (http_client.HTTPException, socket.error):
+            # The server may have closed the connection we kept, try again
+            # with a new one
+            connection.close()
+            connection.request("GET", path, headers=request_headers)
+            response = connection.getresponse()
+        response_headers = dict((k.lower(), v) for (k, v) in response.getheaders())
+        if response.status in [301, 302, 303, 307, 308] and "location" in response_headers:
+            response.read()
+            url = urlparse.urljoin(url, response_headers["location"])
+            continue
+        return response.status, response_headers, response
+    raise Exception("Too many redirects")
+
+
+def _get_connection(url_split):
+    """ The connection to the server of the url, for the current thread """
+    key = (url_split.scheme, url_split.netloc)
+    connection = _CONNECTIONS.by_server.get(key)
+    if connection is None:
+        if url_split.scheme == "https":
+            connection = http_client.HTTPSConnection(url_split.netloc)
+        else:
+            connection = http_client.HTTPConnection(url_split.netloc)
+        _CONNECTIONS.by_server[key] = connection
+    return connection
+
+
+def _forget_connection(url):
+    """ Close the connection to the server of the url after an error """
+    url_split = urlparse.urlsplit(url)
+    connection = _CONNECTIONS.by_server.pop((url_split.scheme, url_split.netloc), None)
+    if connection:
+        connection.close()
+
+
+def _urllib_get(url, headers):
+    """ Same as http_get, using urllib """
+    try:
+        response = authenticated_urlopen(url, headers=headers)
+        status = response.getcode()
+    except HTTPError as e:
+        response = e
+        status = e.code
+    response_headers = dict((k.lower(), v) for (k, v) in response.info().items())
+    return status, response_headers, response
+
+
 def deploy(local_directory, remote_url, filelist=None):
     """ Deploy a local directory to a remote url. """
     # ensure destination directory exist before deploying data
@@ -33,6 +33,30 @@ CONFIG_PATH = xdg_config_home
 CACHE_PATH = xdg_cache_home
 SHARE_PATH = xdg_data_home
 
+# How install() copies files:
+# * copy: always copy the contents
+# * hardlink: use hard links, or copy if not on the same file system
+# * reflink: share the contents on copy-on-write file systems (btrfs, xfs),
+#   or copy when not supported
+# * update: do not copy files which look identical (same inode, or
+#   same size, mode and modification time)
+# The default is always "copy": commands which let the user choose
+# (with --copy-strategy or QI_COPY_STRATEGY) pass the strategy explicitly,
+# see qisys.parsers.get_copy_options()
+COPY_STRATEGIES = ["copy", "hardlink", "reflink", "update"]
+# Files are copied one after the other unless --copy-jobs or
+# QI_COPY_JOBS asks for more threads
+DEFAULT_COPY_JOBS = 1
+# From linux/fs.h
+_FICLONE = 0x40049409
+
+
+def _check_copy_strategy(strategy):
+    """ Raise if the copy strategy is unknown """
+    if strategy not in COPY_STRATEGIES:
+        raise Exception("Unknown copy strategy: %s (choose between %s)" %
+                        (strategy, ", ".join(COPY_STRATEGIES)))
+
 
 def set_home(home):
     """ Set Home """
@@ -173,62 +197,154 @@ def _copy_link(src, dest, quiet):
     os.symlink(target, dest)  # pylint:disable=no-member
 
 
-def _handle_dirs(src, dest, root, directories, filter_fun, quiet):
-    """ Helper function used by install() """
-    installed = list()
-    rel_root = os.path.relpath(root, src)
-    # To avoid filering './' stuff
-    if rel_root == ".":
-        rel_root = ""
-    new_root = os.path.join(dest, rel_root)
-    for directory in directories:
-        to_filter = os.path.join(rel_root, directory)
-        if not filter_fun(to_filter):
-            continue
-        dsrc = os.path.join(root, directory)
-        ddest = os.path.join(new_root, directory)
-        if os.path.islink(dsrc):
-            _copy_link(dsrc, ddest, quiet)
-            installed.append(directory)
-        else:
-            if os.path.lexists(ddest) and not os.path.isdir(ddest):
-                raise Exception("Expecting a directory but found a file: %s" % ddest)
-            mkdir(ddest, recursive=True)
-    return installed
+def list_tree(src):
+    """
+    List the contents of the src directory, in the order :py:func:`install`
+    installs them, as a list of tuples (kind, relative/path), kind being
+    'dir', 'link' (to a file or to a directory), or 'file'.
+    Links to directories are not followed.
+    """
+    res = list()
+    for (root, dirs, files) in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        # To avoid filering './' stuff
+        if rel_root == ".":
+            rel_root = ""
+        for name in dirs:
+            kind = "link" if os.path.islink(os.path.join(root, name)) else "dir"
+            res.append((kind, os.path.join(rel_root, name)))
+        for name in files:
+            kind = "link" if os.path.islink(os.path.join(root, name)) else "file"
+            res.append((kind, os.path.join(rel_root, name)))
+    return res
 
 
-def _handle_files(src, dest, root, files, filter_fun, quiet):
-    """ Helper function used by install() """
+def install_entries(src, dest, entries, filter_fun=None, quiet=False,
+                    strategy="copy", num_jobs=None):
+    """
+    Install some of the contents of the src directory to dest, without
+    looking for files in src.
+    :param entries: the list returned by :py:func:`list_tree`, or a subset of it
+    :param filter_fun: only install the entries for which filter_fun(relative/path)
+                       returns True
+    :param strategy: see :py:func:`copy_file`
+    :param num_jobs: number of threads copying the files (default: DEFAULT_COPY_JOBS)
+    Return the list of files installed (with relative paths)
+    """
     installed = list()
-    rel_root = os.path.relpath(root, src)
-    if rel_root == ".":
-        rel_root = ""
-    new_root = os.path.join(dest, rel_root)
-    for f in files:
-        if not filter_fun(os.path.join(rel_root, f)):
+    to_copy = list()
+    created = set()
+    for (kind, rel_path) in entries:
+        if filter_fun and not filter_fun(rel_path):
             continue
-        fsrc = os.path.join(root, f)
-        fdest = os.path.join(new_root, f)
-        rel_path = os.path.join(rel_root, f)
-        if os.path.islink(fsrc):
-            mkdir(new_root, recursive=True)
+        fsrc = os.path.join(src, rel_path)
+        fdest = os.path.join(dest, rel_path)
+        if kind == "link":
             _copy_link(fsrc, fdest, quiet)
-            installed.append(rel_path)
+            # Like directories, links to directories are not listed
+            if not os.path.isdir(fsrc):
+                installed.append(rel_path)
+        elif kind == "dir":
+            if os.path.lexists(fdest) and not os.path.isdir(fdest):
+                raise Exception("Expecting a directory but found a file: %s" % fdest)
+            mkdir(fdest, recursive=True)
         else:
             if os.path.lexists(fdest) and os.path.isdir(fdest):
                 raise Exception("Expecting a file but found a directory: %s" % fdest)
             if not quiet:
                 print("-- Installing %s" % fdest.encode('ascii', "ignore"))
-            mkdir(new_root, recursive=True)
-            # We do not want to fail if dest exists but is read only
-            # (following what `install` does, but not what `cp` does)
-            rm(fdest)
-            shutil.copy(fsrc, fdest)
+            parent = os.path.dirname(fdest)
+            if parent not in created:
+                mkdir(parent, recursive=True)
+                created.add(parent)
+            to_copy.append((fsrc, fdest))
             installed.append(rel_path)
+    copy_files(to_copy, strategy=strategy, num_jobs=num_jobs)
     return installed
 
 
-def install(src, dest, filter_fun=None, quiet=False):
+def copy_files(pairs, strategy="copy", num_jobs=None):
+    """
+    Call :py:func:`copy_file` on each (src, dest) pair, using num_jobs threads
+    (default: DEFAULT_COPY_JOBS)
+    """
+    # qisys.parallel depends on this module
+    import qisys.parallel
+    _check_copy_strategy(strategy)
+    if not num_jobs:
+        num_jobs = DEFAULT_COPY_JOBS
+
+    def copy_pair(pair):
+        """ Copy one file """
+        return copy_file(pair[0], pair[1], strategy=strategy)
+
+    for result in qisys.parallel.imap(pairs, copy_pair, n_jobs=num_jobs, ordered=False):
+        if not result.ok:
+            raise result.exception
+
+
+def copy_file(src, dest, strategy="copy"):
+    """
+    Copy the src file to dest, replacing dest even if it is read-only
+    (following what `install` does, but not what `cp` does)
+    :param strategy: one of COPY_STRATEGIES, see the top of this module
+    Return False if the file was not copied because it was up to date
+    """
+    if strategy == "update" and _looks_identical(src, dest):
+        return False
+    rm(dest)
+    if strategy == "hardlink":
+        try:
+            os.link(src, dest)
+            return True
+        except (OSError, AttributeError):
+            # Not on the same file system, or not supported
+            pass
+    if strategy == "reflink" and _reflink(src, dest):
+        return True
+    if strategy == "update":
+        # Keep the modification time, so that next time the file is skipped
+        shutil.copy2(src, dest)
+    else:
+        shutil.copy(src, dest)
+    return True
+
+
+def _looks_identical(src, dest):
+    """ True if dest is src, or has the same size, mode and modification time """
+    try:
+        src_stat = os.stat(src)
+        dest_stat = os.lstat(dest)
+    except OSError:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+        return True
+    return stat.S_ISREG(dest_stat.st_mode) and \
+        src_stat.st_size == dest_stat.st_size and \
+        stat.S_IMODE(src_stat.st_mode) == stat.S_IMODE(dest_stat.st_mode) and \
+        int(src_stat.st_mtime) == int(dest_stat.st_mtime)
+
+
+def _reflink(src, dest):
+    """
+    Make dest a copy-on-write clone of src.
+    Return False if the file system does not support it
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as src_file, open(dest, "wb") as dest_file:
+            fcntl.ioctl(dest_file.fileno(), _FICLONE, src_file.fileno())
+    except (IOError, OSError):
+        rm(dest)
+        return False
+    shutil.copymode(src, dest)
+    return True
+
+
+def install(src, dest, filter_fun=None, quiet=False, strategy="copy", num_jobs=None):
     """
     Install a directory or a file to a destination.
     If filter_fun is not None, then the file will only be
@@ -242,6 +358,8 @@ def install(src, dest, filter_fun=None, quiet=False):
             |__ Current  -> 4.0
             |__ 4        -> 4.0
             |__ 4.0
+    Files are copied using the given strategy, by num_jobs threads,
+    see :py:func:`copy_files`.
     Return the list of files installed (with relative paths)
     """
     installed = list()
@@ -261,10 +379,9 @@ def install(src, dest, filter_fun=None, quiet=False):
     if os.path.isdir(src):
         if src == dest:
             raise Exception("source and destination are the same directory")
-        for (root, dirs, files) in os.walk(src):
-            dirs = _handle_dirs(src, dest, root, dirs, filter_fun, quiet)
-            files = _handle_files(src, dest, root, files, filter_fun, quiet)
-            installed.extend(files)
+        installed = install_entries(src, dest, list_tree(src),
+                                    filter_fun=filter_fun, quiet=quiet,
+                                    strategy=strategy, num_jobs=num_jobs)
     else:
         # Emulate posix `install' behavior:
         # if dest is a dir, install in the directory, else
@@ -276,10 +393,8 @@ def install(src, dest, filter_fun=None, quiet=False):
         mkdir(os.path.dirname(dest), recursive=True)
         if sys.stdout.isatty() and not quiet:
             print("-- Installing %s" % dest)
-        # We do not want to fail if dest exists but is read only
-        # (following what `install` does, but not what `cp` does)
-        rm(dest)
-        shutil.copy(src, dest)
+        _check_copy_strategy(strategy)
+        copy_file(src, dest, strategy=strategy)
         installed.append(os.path.basename(src))
     return installed
 
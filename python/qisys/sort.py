@@ -7,7 +7,12 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
-__all__ = ["DagError", "assert_dag", "topological_sort"]
+import collections
+
+__all__ = ["DagError", "CycleError", "assert_dag", "topological_sort", "find_cycles"]
+
+# Fake node depending on all the heads given to topological_sort()
+_ROOT = object()
 
 
 class DagError(Exception):
@@ -26,6 +31,20 @@ class DagError(Exception):
                % (self.node, self.parent, self.node, self.result)
 
 
+class CycleError(DagError):
+    """ Raised by topological_sort() when asked to report cycles """
+
+    def __init__(self, cycles):
+        """ CycleError Init """
+        DagError.__init__(self, cycles[0][0], cycles[0][-1], cycles[0])
+        self.cycles = cycles
+
+    def __str__(self):
+        """ String Representation """
+        return "Circular dependency error:\n" + "\n".join(
+            " * " + " -> ".join(cycle + [cycle[0]]) for cycle in self.cycles)
+
+
 def assert_dag(data):
     """
     Check if data is a dag
@@ -41,11 +60,13 @@ def assert_dag(data):
         ...
     DagError: Circular dependency error: Starting from 'e', node 'e' depends on 'e', complete path []
     """
+    if not find_cycles(data):
+        return
     for node, _ in data.items():
-        _topological_sort(data, node, node, True)
+        _assert_dag_from(data, node)
 
 
-def topological_sort(data, heads):
+def topological_sort(data, heads, raise_on_cycles=False):
     """
     Topological sort
     data should be a dictionary like that (it's a dag):
@@ -59,6 +80,8 @@ def topological_sort(data, heads):
              If a depend on b and b depend on a, the solution is [ a, b ].
              This is ok in our case but could be a problem in other situation.
              (you know what? try to use the result you will see if it work!).
+             Use raise_on_cycles=True to get a CycleError listing the
+             cycles instead.
     >>> topological_sort({
     ...   'head'         : ['telepathe', 'opennao-tools', 'naoqi'],
     ...   'toolchain'    : [],
@@ -101,38 +124,174 @@ def topological_sort(data, heads):
     ...   'i' : ( 'y', 'o' ),
     ...   'e' : ( 'g', 'c' )}, [ 'a', 'q' ])
     ['g', 'c', 'e', 'b', 'd', 'a', 'u', 'y', 'o', 'i', 'q']
+    >>> topological_sort({
+    ...   'a' : ( 'b', ),
+    ...   'b' : ( 'a', ),
+    ... }, 'a', raise_on_cycles=True)
+    Traceback (most recent call last):
+        ...
+    CycleError: Circular dependency error:
+     * a -> b -> a
     """
-    if isinstance(heads, list):
-        data['internalfakehead'] = heads
-        head = 'internalfakehead'
-        result = _topological_sort(data, head, head)
-        return [x for x in result if x != 'internalfakehead']
-    head = heads
-    return _topological_sort(data, head, head)
-
-
-def _topological_sort(data, head, top_node, raise_exception=False, result=None, visited=None):
-    """ Internal function """
-    if not result:
-        result = []
-    if not visited:
-        visited = []
-    deps = data.get(head, list())
-    if head in visited:
-        if head == top_node and raise_exception:
-            raise DagError(head, head, result)
-        return result
-    visited.append(head)
-    for i in deps:
-        try:
-            result.index(i)
-        except ValueError:
-            # the item does not exist
-            result = _topological_sort(data, i, top_node, raise_exception, result, visited)
-    result.append(head)
+    if not isinstance(heads, list):
+        heads = [heads]
+    result = _topological_sort(data, heads)
+    if raise_on_cycles:
+        cycles = find_cycles(data, heads=heads)
+        if cycles:
+            raise CycleError(cycles)
     return result
 
 
+def find_cycles(data, heads=None):
+    """
+    Return a list of cycles found in data, each cycle being a list of nodes
+    where each node depends on the next one, and the last one on the first.
+    One cycle is reported for each group of nodes depending on each other.
+    If heads is given, only look at the nodes heads depend on.
+    >>> find_cycles({
+    ...   'a' : ( 'g', 'b', 'c', 'd' ),
+    ...   'b' : ( 'e', 'c' ),
+    ...   'e' : ( 'g', 'c' )})
+    []
+    >>> find_cycles({
+    ...   'a' : ( 'b', ),
+    ...   'b' : ( 'c', 'd' ),
+    ...   'c' : ( 'a', ),
+    ...   'd' : ( 'd', )})
+    [['d'], ['a', 'b', 'c']]
+    """
+    if heads is None:
+        heads = list(data.keys())
+    res = list()
+    for component in _strongly_connected_components(data, heads):
+        if len(component) > 1:
+            res.append(_find_cycle(data, component))
+        else:
+            node = component[0]
+            if node in data.get(node, ()):
+                res.append([node])
+    return res
+
+
+def _topological_sort(data, heads):
+    """
+    Internal function: depth first search, iterative so that deep graphs
+    do not hit the recursion limit.
+    """
+    result = list()
+    visited = set([_ROOT])
+    stack = [(_ROOT, iter(heads))]
+    while stack:
+        node, deps = stack[-1]
+        for dep in deps:
+            if dep not in visited:
+                visited.add(dep)
+                stack.append((dep, iter(data.get(dep, ()))))
+                break
+        else:
+            stack.pop()
+            if node is not _ROOT:
+                result.append(node)
+    return result
+
+
+def _assert_dag_from(data, top_node):
+    """
+    Raise DagError if top_node depends on itself.
+    Same traversal as _topological_sort, but keeps track of the nodes
+    depending on each other to report the same error as before
+    """
+    result = list()
+    done = set()
+    visited = set([top_node])
+    stack = [(top_node, iter(data.get(top_node, ())))]
+    while stack:
+        node, deps = stack[-1]
+        for dep in deps:
+            if dep in done:
+                continue
+            if dep in visited:
+                if dep == top_node:
+                    raise DagError(dep, dep, result)
+                continue
+            visited.add(dep)
+            stack.append((dep, iter(data.get(dep, ()))))
+            break
+        else:
+            stack.pop()
+            done.add(node)
+            result.append(node)
+
+
+def _strongly_connected_components(data, heads):
+    """ Iterative version of Tarjan's algorithm """
+    index = dict()
+    lowlink = dict()
+    on_stack = set()
+    scc_stack = list()
+    res = list()
+    counter = 0
+    for head in heads:
+        if head in index:
+            continue
+        index[head] = lowlink[head] = counter
+        counter += 1
+        scc_stack.append(head)
+        on_stack.add(head)
+        stack = [(head, iter(data.get(head, ())))]
+        while stack:
+            node, deps = stack[-1]
+            for dep in deps:
+                if dep not in index:
+                    index[dep] = lowlink[dep] = counter
+                    counter += 1
+                    scc_stack.append(dep)
+                    on_stack.add(dep)
+                    stack.append((dep, iter(data.get(dep, ()))))
+                    break
+                if dep in on_stack:
+                    lowlink[node] = min(lowlink[node], index[dep])
+            else:
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = list()
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    component.reverse()
+                    res.append(component)
+    return res
+
+
+def _find_cycle(data, component):
+    """ Return a cycle going through the first node of a strongly connected component """
+    start = component[0]
+    members = set(component)
+    # breadth first search for the shortest way back to start
+    parents = dict()
+    queue = collections.deque([start])
+    while queue:
+        node = queue.popleft()
+        for dep in data.get(node, ()):
+            if dep == start:
+                res = [node]
+                while res[-1] != start:
+                    res.append(parents[res[-1]])
+                res.reverse()
+                return res
+            if dep in members and dep not in parents:
+                parents[dep] = node
+                queue.append(dep)
+    return [start]
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -8,15 +8,22 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
+import time
+import stat
+import tarfile
 import zipfile
 import pytest
 
 import qisys
 from qisys.archive import extract, guess_algo
 
-# We don't use the stdlib for tar: it does not have
-# all the features `tar` has and is slower, so all tar tests
-# are disabled on Windows
+# Archives created with `tar` cannot be tested on Windows,
+# so all tar tests are disabled there
+
+# Benchmarks are slow, only run them when asked to
+skip_without_benchmark_size = pytest.mark.skipif(
+    "QI_ARCHIVE_BENCHMARK_SIZE" not in os.environ,
+    reason="set QI_ARCHIVE_BENCHMARK_SIZE (in MB) to run the benchmarks")
 
 
 def test_create_extract_zip_simple(tmpdir):
@@ -138,3 +145,185 @@ def test_returned_value_when_extracting_flat_package(tmpdir):
     dest = tmpdir.mkdir("dest")
     res = qisys.archive.extract(archive, dest.strpath, strict_mode=False)
     assert res == dest.strpath
+
+
+def test_extract_zip_in_parallel(tmpdir, monkeypatch):
+    """ Large zip archives are inflated by several threads """
+    monkeypatch.setattr(qisys.archive, "PARALLEL_ZIP_MIN_SIZE", 0)
+    src = tmpdir.mkdir("foo")
+    for i in range(50):
+        src.ensure("lib", "lib%i.so" % i, file=True).write("lib%i" % i * 1000)
+    src.join("bin").ensure("foo", file=True).chmod(0o755)
+    src.join("lib", "libfoo.so").mksymlinkto("lib0.so")
+    foo_zip = qisys.archive.compress(src.strpath, quiet=True)
+    dest = tmpdir.mkdir("dest")
+    res = qisys.archive.extract(foo_zip, dest.strpath, quiet=True, num_jobs=4)
+    assert res == dest.join("foo").strpath
+    for i in range(50):
+        assert dest.join("foo", "lib", "lib%i.so" % i).read() == "lib%i" % i * 1000
+    assert dest.join("foo", "lib", "libfoo.so").islink()
+    if os.name != 'nt':
+        assert os.stat(dest.join("foo", "bin", "foo").strpath).st_mode & stat.S_IXUSR
+
+
+def test_extract_tar_read_only_dir(tmpdir):
+    """ Permissions and symlinks are kept, read-only directories included """
+    if os.name == 'nt':
+        return
+    src = tmpdir.mkdir("foo")
+    src.ensure("share", "data.txt", file=True).write("data")
+    src.ensure("bin", "foo", file=True).chmod(0o755)
+    src.join("bin", "bar").mksymlinkto("foo")
+    src.join("share").chmod(0o555)
+    foo_tar = qisys.archive.compress(src.strpath, algo="gzip", quiet=True)
+    src.join("share").chmod(0o755)
+    dest = tmpdir.mkdir("dest")
+    res = qisys.archive.extract(foo_tar, dest.strpath, quiet=True)
+    assert res == dest.join("foo").strpath
+    assert dest.join("foo", "share", "data.txt").read() == "data"
+    assert dest.join("foo", "bin", "bar").islink()
+    assert os.stat(dest.join("foo", "bin", "foo").strpath).st_mode & stat.S_IXUSR
+    assert stat.S_IMODE(os.stat(dest.join("foo", "share").strpath).st_mode) == 0o555
+    dest.join("foo", "share").chmod(0o755)
+
+
+def test_extract_tar_outside_dest(tmpdir):
+    """ Members with '..' in their path are not extracted """
+    foo_tar = tmpdir.join("foo.tar").strpath
+    tmpdir.ensure("src", "foo", "a.txt", file=True)
+    tmpdir.ensure("evil.txt", file=True)
+    with tarfile.open(foo_tar, "w") as archive:
+        archive.add(tmpdir.join("src", "foo").strpath, arcname="foo")
+        archive.add(tmpdir.join("evil.txt").strpath, arcname="foo/../../evil.txt")
+    dest = tmpdir.join("dest", "sub")
+    res = qisys.archive.extract(foo_tar, dest.strpath, quiet=True)
+    assert res == dest.join("foo").strpath
+    assert dest.join("foo", "a.txt").check(file=True)
+    assert not tmpdir.join("dest", "evil.txt").check()
+
+
+def test_extract_tar_hardlink_outside_dest(tmpdir, record_messages):
+    """ Hard links to a path with '..' are not extracted """
+    foo_tar = tmpdir.join("foo.tar").strpath
+    tmpdir.ensure("src", "foo", "a.txt", file=True)
+    with tarfile.open(foo_tar, "w") as archive:
+        archive.add(tmpdir.join("src", "foo").strpath, arcname="foo")
+        link = tarfile.TarInfo("foo/evil.txt")
+        link.type = tarfile.LNKTYPE
+        link.linkname = "foo/../../evil.txt"
+        archive.addfile(link)
+    dest = tmpdir.join("dest", "sub")
+    res = qisys.archive.extract(foo_tar, dest.strpath, quiet=True)
+    assert res == dest.join("foo").strpath
+    assert dest.join("foo", "a.txt").check(file=True)
+    assert not dest.join("foo", "evil.txt").check()
+    assert record_messages.find(r"Skipping member containing '\.\.': foo/\.\./\.\./evil.txt")
+
+
+def _benchmark_extract(tmpdir, algo):
+    """
+    Extract a synthetic archive of QI_ARCHIVE_BENCHMARK_SIZE MB
+    and return the throughput in MB/s.
+    """
+    size = int(os.environ["QI_ARCHIVE_BENCHMARK_SIZE"])
+    src = tmpdir.mkdir("foo")
+    chunk = os.urandom(1024 * 1024 // 2) * 2
+    num_files = max(size // 4, 1)
+    for i in range(num_files):
+        with open(src.join("data%i.bin" % i).strpath, "wb") as fp:
+            for _ in range(4):
+                fp.write(chunk)
+    archive = qisys.archive.compress(src.strpath, algo=algo, quiet=True)
+    start = time.time()
+    qisys.archive.extract(archive, tmpdir.join("dest").strpath, quiet=True)
+    elapsed = max(time.time() - start, 1e-6)
+    throughput = num_files * 4 / elapsed
+    print("Extracted %i MB from %s in %.2fs (%.1f MB/s)" % (num_files * 4, algo, elapsed, throughput))
+    assert tmpdir.join("dest", "foo", "data0.bin").size() == 4 * 1024 * 1024
+    return throughput
+
+
+@skip_without_benchmark_size
+def test_benchmark_extract_zip(tmpdir):
+    """ Benchmark zip extraction """
+    assert _benchmark_extract(tmpdir, "zip") > 0
+
+
+@skip_without_benchmark_size
+def test_benchmark_extract_tar(tmpdir):
+    """ Benchmark tar.gz extraction """
+    if os.name == 'nt':
+        return
+    assert _benchmark_extract(tmpdir, "gzip") > 0
+
+
+def test_compress_zip_in_parallel(tmpdir, monkeypatch):
+    """ Files are deflated in chunks by several threads, giving the same archive """
+    monkeypatch.setattr(qisys.archive, "DEFLATE_CHUNK_SIZE", 1000)
+    src = tmpdir.mkdir("foo")
+    for i in range(5):
+        src.ensure("lib", "lib%i.so" % i, file=True).write("lib%i " % i * 1000 * i)
+    src.join("lib", "libfoo.so").mksymlinkto("lib1.so")
+    sequential = list()
+    write_zip_sequential = qisys.archive._write_zip_sequential
+    monkeypatch.setattr(qisys.archive, "_write_zip_sequential",
+                        lambda *args: sequential.append(write_zip_sequential(*args)))
+    one_job = qisys.archive.compress(src.strpath, output=tmpdir.join("one.zip").strpath,
+                                     quiet=True, num_jobs=1)
+    assert len(sequential) == 1
+    four_jobs = qisys.archive.compress(src.strpath, output=tmpdir.join("four.zip").strpath,
+                                       quiet=True, num_jobs=4)
+    with zipfile.ZipFile(four_jobs) as archive:
+        assert archive.testzip() is None
+        assert archive.read("foo/lib/lib3.so") == b"lib3 " * 3000
+    dest = tmpdir.mkdir("dest")
+    qisys.archive.extract(four_jobs, dest.strpath, quiet=True)
+    assert dest.join("foo", "lib", "libfoo.so").islink()
+    assert dest.join("foo", "lib", "lib4.so").read() == "lib4 " * 4000
+    with zipfile.ZipFile(one_job) as archive1, zipfile.ZipFile(four_jobs) as archive4:
+        assert archive1.namelist() == archive4.namelist()
+        for (info1, info4) in zip(archive1.infolist(), archive4.infolist()):
+            assert info1.CRC == info4.CRC
+            assert info1.file_size == info4.file_size
+            assert info1.external_attr == info4.external_attr
+
+
+def test_compression_level(tmpdir):
+    """ Test Compression Level """
+    src = tmpdir.mkdir("foo")
+    src.ensure("a.txt", file=True).write("".join("%i\n" % i for i in range(100000)))
+    fast = qisys.archive.compress(src.strpath, output=tmpdir.join("fast.zip").strpath,
+                                  quiet=True, level=0)
+    small = qisys.archive.compress(src.strpath, output=tmpdir.join("small.zip").strpath,
+                                   quiet=True, level=9)
+    assert os.path.getsize(small) < os.path.getsize(fast)
+
+
+def test_invalid_compression_level(tmpdir):
+    """ Levels the algorithm does not support are rejected before compressing """
+    src = tmpdir.mkdir("foo")
+    src.ensure("a.txt", file=True)
+    with pytest.raises(Exception) as e:
+        qisys.archive.compress(src.strpath, quiet=True, level=19)
+    assert "between 0 and 9" in str(e.value)
+    assert not tmpdir.join("foo.zip").check()
+    with pytest.raises(Exception) as e:
+        qisys.archive.compress(src.strpath, algo="zstd", quiet=True, level=0)
+    assert "between 1 and 19" in str(e.value)
+
+
+def test_create_extract_zstd(tmpdir):
+    """ Test Create Extract Zstd """
+    if os.name == 'nt' or not qisys.command.find_program("zstd"):
+        return
+    tmpdir.ensure("foo/a/b.txt", file=True).write("b")
+    tmpdir.ensure("foo/c.txt", file=True)
+    foo_tar_zst = qisys.archive.compress(tmpdir.join("foo").strpath, algo="zstd",
+                                         quiet=True, level=3, num_jobs=2)
+    assert foo_tar_zst.endswith(".tar.zst")
+    assert guess_algo(foo_tar_zst) == "zstd"
+    dest = tmpdir.mkdir("dest")
+    res = qisys.archive.extract(foo_tar_zst, dest.strpath, quiet=True)
+    assert res == dest.join("foo").strpath
+    assert dest.join("foo", "a", "b.txt").read() == "b"
+    assert dest.join("foo", "c.txt").check(file=True)
@@ -7,9 +7,11 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import time
 import threading
 import pytest
 
+import qisys.command
 import qisys.parallel
 
 
@@ -41,3 +43,98 @@ def test_parallel_result():
     result = [0]
     qisys.parallel.foreach(nums, sum_worker, 10)
     assert sum(nums) == result[0]
+
+
+def test_parallel_returns_values_in_order():
+    """ Values are returned in the same order as the source """
+    def slow_square(n):
+        """ Slow Square """
+        time.sleep(0.01 * (5 - n))
+        return n * n
+    assert qisys.parallel.foreach(range(5), slow_square, 3) == [0, 1, 4, 9, 16]
+    assert qisys.parallel.foreach(range(5), slow_square, 1) == [0, 1, 4, 9, 16]
+
+
+def test_parallel_bounded_pool():
+    """ No more than n_jobs items are processed at the same time """
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def worker(_n):
+        """ Worker """
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+    qisys.parallel.foreach(range(20), worker, 3)
+    assert max_running[0] <= 3
+    max_running[0] = 0
+    qisys.parallel.foreach(range(20), worker)
+    assert max_running[0] <= qisys.parallel.get_num_jobs(0)
+
+
+def test_parallel_failures():
+    """ Every item is processed, then failures are raised all at once """
+    processed = list()
+
+    def worker(n):
+        """ Worker """
+        processed.append(n)
+        if n % 2:
+            raise Exception("odd number: %i" % n)
+    for n_jobs in [1, 3]:
+        del processed[:]
+        with pytest.raises(qisys.parallel.ForeachError) as e:
+            qisys.parallel.foreach(range(5), worker, n_jobs)
+        assert sorted(processed) == [0, 1, 2, 3, 4]
+        assert [x.item for x in e.value.failures] == [1, 3]
+        assert "odd number: 3" in str(e.value)
+        assert "odd number: 3" in e.value.failures[1].traceback
+
+
+def test_parallel_progress():
+    """ on_progress is called once per item, in the calling thread """
+    calls = list()
+
+    def on_progress(i, total, result):
+        """ On Progress """
+        calls.append((i, total, result.item, threading.current_thread()))
+    qisys.parallel.foreach(["a", "b", "c"], lambda x: x, 2, on_progress=on_progress)
+    assert [x[0] for x in calls] == [0, 1, 2]
+    assert all(x[1] == 3 for x in calls)
+    assert sorted(x[2] for x in calls) == ["a", "b", "c"]
+    assert all(x[3] is threading.current_thread() for x in calls)
+
+
+def test_parallel_imap_stop_early():
+    """ Stopping the iteration stops processing new items """
+    processed = list()
+
+    def worker(n):
+        """ Worker """
+        processed.append(n)
+        time.sleep(0.01)
+        return n
+    for result in qisys.parallel.imap(range(100), worker, 2, ordered=False):
+        if result.value is not None:
+            break
+    assert len(processed) < 100
+
+
+def test_parallel_sigint():
+    """ Nothing new is started once SIGINT_EVENT is set """
+    processed = list()
+
+    def worker(n):
+        """ Worker """
+        processed.append(n)
+        qisys.command.SIGINT_EVENT.set()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            qisys.parallel.foreach(range(10), worker, 1)
+        assert processed == [0]
+    finally:
+        qisys.command.SIGINT_EVENT.clear()
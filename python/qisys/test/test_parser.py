@@ -110,3 +110,20 @@ def test_using_dash_all_with_dash_single(worktree, args):
     with pytest.raises(Exception) as e:
         qisys.parsers.get_projects(worktree, args)
     assert "--single with --all" in str(e)
+
+
+def test_copy_options(args, monkeypatch):
+    """ Test Copy Options """
+    monkeypatch.delenv("QI_COPY_STRATEGY", raising=False)
+    monkeypatch.delenv("QI_COPY_JOBS", raising=False)
+    assert qisys.parsers.get_copy_options(args) == ("copy", None)
+    monkeypatch.setenv("QI_COPY_STRATEGY", "update")
+    monkeypatch.setenv("QI_COPY_JOBS", "2")
+    assert qisys.parsers.get_copy_options(args) == ("update", 2)
+    args.copy_strategy = "hardlink"
+    args.copy_jobs = 3
+    assert qisys.parsers.get_copy_options(args) == ("hardlink", 3)
+    args.copy_strategy = "teleport"
+    with pytest.raises(Exception) as e:
+        qisys.parsers.get_copy_options(args)
+    assert "Unknown copy strategy" in str(e.value)
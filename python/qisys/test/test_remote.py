@@ -7,11 +7,102 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import hashlib
+import threading
 import pytest
+from six.moves import BaseHTTPServer, socketserver
 
+import qisys.remote
 from qisys.remote import URL, URLParseError, deploy
 
 
+class FileServer(object):
+    """
+    A tiny HTTP/1.1 server, supporting ranges, ETags,
+    and dropping the connection in the middle of a file
+    """
+
+    def __init__(self):
+        """ FileServer Init """
+        self.files = dict()
+        self.requests = list()
+        self.connections = 0
+        self.fail_after = None
+        server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            """ Handler """
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                """ Count the connections """
+                BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+                server.connections += 1
+
+            def log_message(self, *args):  # pylint:disable=arguments-differ
+                """ Be quiet """
+                pass
+
+            def do_GET(self):  # pylint:disable=invalid-name
+                """ Serve a file """
+                server.requests.append(dict(self.headers.items()))
+                data = server.files.get(self.path)
+                if data is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.sha1(data).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header and self.headers.get("If-Range", etag) == etag:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    self.send_response(206)
+                    self.send_header("Content-Range", "bytes %i-%i/%i" % (start, len(data) - 1, len(data)))
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(data) - start))
+                self.end_headers()
+                body = data[start:]
+                if server.fail_after is not None:
+                    self.wfile.write(body[:server.fail_after])
+                    self.close_connection = True
+                    server.fail_after = None
+                    return
+                self.wfile.write(body)
+
+        class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            """ Server """
+            daemon_threads = True
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%i" % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the server """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def file_server(request, monkeypatch):
+    """ A local http server """
+    monkeypatch.delenv("http_proxy", raising=False)
+    monkeypatch.delenv("HTTP_PROXY", raising=False)
+    res = FileServer()
+    request.addfinalizer(res.stop)
+    return res
+
+
 def test_simple_url():
     """ Test Simple Url """
     url = URL("foo@bar")
@@ -61,3 +152,58 @@ def test_deploy(tmpdir):
     local = tmpdir.mkdir("local")
     remote = tmpdir.mkdir("remote")
     deploy(local.strpath, URL("ssh://localhost/" + remote.strpath))
+
+
+def test_download_resumes(tmpdir, file_server):
+    """ Test Download Resumes """
+    data = b"spam" * 100000
+    file_server.files["/foo.tar.gz"] = data
+    file_server.fail_after = 1000
+    url = file_server.url + "/foo.tar.gz"
+    with pytest.raises(Exception):
+        qisys.remote.download(url, tmpdir.strpath, callback=None)
+    part = tmpdir.join("foo.tar.gz.part")
+    assert part.size() == 1000
+    res = qisys.remote.download(url, tmpdir.strpath, callback=None)
+    assert file_server.requests[-1]["Range"] == "bytes=1000-"
+    with open(res, "rb") as fp:
+        assert fp.read() == data
+    assert not part.check()
+
+
+def test_download_conditional(tmpdir, file_server):
+    """ Test Download Conditional """
+    file_server.files["/foo.zip"] = b"foo"
+    url = file_server.url + "/foo.zip"
+    qisys.remote.download(url, tmpdir.strpath, callback=None, conditional=True)
+    res = qisys.remote.download(url, tmpdir.strpath, callback=None, conditional=True)
+    assert "If-None-Match" in file_server.requests[-1]
+    assert tmpdir.join("foo.zip").read() == "foo"
+    file_server.files["/foo.zip"] = b"new foo"
+    res = qisys.remote.download(url, tmpdir.strpath, callback=None, conditional=True)
+    with open(res, "rb") as fp:
+        assert fp.read() == b"new foo"
+    # Connections are reused
+    assert file_server.connections == 1
+
+
+def test_download_checksum(tmpdir, file_server):
+    """ Test Download Checksum """
+    file_server.files["/foo.zip"] = b"foo"
+    url = file_server.url + "/foo.zip"
+    good = hashlib.sha256(b"foo").hexdigest()
+    bad = hashlib.sha256(b"bar").hexdigest()
+    with pytest.raises(Exception) as e:
+        qisys.remote.download(url, tmpdir.strpath, callback=None, sha256=bad)
+    assert "Checksum mismatch" in str(e.value)
+    assert not tmpdir.join("foo.zip").check()
+    assert not tmpdir.join("foo.zip.part").check()
+    res = qisys.remote.download(url, tmpdir.strpath, callback=None, sha256=good)
+    assert res == tmpdir.join("foo.zip").strpath
+
+
+def test_download_not_found(tmpdir, file_server):
+    """ Test Download Not Found """
+    with pytest.raises(Exception) as e:
+        qisys.remote.download(file_server.url + "/nope.zip", tmpdir.strpath, callback=None)
+    assert "404" in str(e.value)
@@ -111,6 +111,18 @@ def test_install_return_value(tmpdir):
     assert ret == ["d"]
 
 
+def test_install_return_value_with_links(tmpdir):
+    """ Links to files are listed, links to directories are not """
+    src = tmpdir.mkdir("src")
+    src.ensure("share", "real", "a", file=True)
+    src.join("share", "b").mksymlinkto("real/a")
+    src.join("alias").mksymlinkto("share/real")
+    dest = tmpdir.mkdir("dest")
+    ret = qisys.sh.install(src.strpath, dest.strpath)
+    assert sorted(ret) == ["share/b", "share/real/a"]
+    assert dest.join("alias").islink()
+
+
 def test_install_qt_symlinks(tmpdir):
     """ Test Install Qt Simlinks """
     tc_path = tmpdir.mkdir("toolchain")
@@ -120,3 +132,57 @@ def test_install_qt_symlinks(tmpdir):
     dest = tmpdir.join("dest")
     qisys.sh.install(qt_src.strpath, dest.strpath, filter_fun=qisys.sh.is_runtime)
     assert dest.join("QtCore.framework").islink()
+
+
+@pytest.mark.parametrize("strategy", qisys.sh.COPY_STRATEGIES)
+def test_install_strategies(tmpdir, strategy):
+    """ Every strategy gives the same files, even when replacing read-only ones """
+    src = tmpdir.mkdir("src")
+    for i in range(10):
+        src.ensure("lib", "lib%i.so" % i, file=True).write("lib%i" % i)
+    src.ensure("bin", "foo", file=True).chmod(0o755)
+    dest = tmpdir.mkdir("dest")
+    dest.ensure("lib", "lib0.so", file=True).write("old")
+    dest.join("lib", "lib0.so").chmod(stat.S_IRUSR)
+    ret = qisys.sh.install(src.strpath, dest.strpath, strategy=strategy, num_jobs=3)
+    assert len(ret) == 11
+    for i in range(10):
+        assert dest.join("lib", "lib%i.so" % i).read() == "lib%i" % i
+    assert os.access(dest.join("bin", "foo").strpath, os.X_OK)
+
+
+def test_install_hardlink(tmpdir):
+    """ Test Install Hardlink """
+    src = tmpdir.mkdir("src")
+    src.ensure("a.txt", file=True).write("a")
+    dest = tmpdir.join("dest")
+    qisys.sh.install(src.strpath, dest.strpath, strategy="hardlink")
+    assert os.path.samefile(src.join("a.txt").strpath, dest.join("a.txt").strpath)
+
+
+def test_install_update(tmpdir):
+    """ Only files which changed are copied again """
+    src = tmpdir.mkdir("src")
+    src.ensure("a.txt", file=True).write("a")
+    src.ensure("b.txt", file=True).write("b")
+    dest = tmpdir.join("dest")
+    qisys.sh.install(src.strpath, dest.strpath, strategy="update")
+    a_inode = os.stat(dest.join("a.txt").strpath).st_ino
+    src.join("b.txt").write("new b")
+    qisys.sh.install(src.strpath, dest.strpath, strategy="update")
+    assert os.stat(dest.join("a.txt").strpath).st_ino == a_inode
+    assert dest.join("b.txt").read() == "new b"
+    assert qisys.sh.copy_file(src.join("a.txt").strpath, dest.join("a.txt").strpath,
+                              strategy="update") is False
+
+
+def test_install_copies_by_default(tmpdir, monkeypatch):
+    """ The environment does not change how files are installed """
+    monkeypatch.setenv("QI_COPY_STRATEGY", "hardlink")
+    src = tmpdir.ensure("src", "a.txt", file=True)
+    dest = tmpdir.join("dest")
+    qisys.sh.install(src.dirname, dest.strpath)
+    assert not os.path.samefile(src.strpath, dest.join("a.txt").strpath)
+    with pytest.raises(Exception) as e:
+        qisys.sh.install(src.dirname, dest.strpath, strategy="teleport")
+    assert "Unknown copy strategy" in str(e.value)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+""" Test Sort """
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import time
+import random
+import pytest
+
+import qisys.sort
+
+
+def generate_dag(num_nodes, max_deps=5, seed=42):
+    """ Generate a random dag, each node only depending on nodes before it """
+    rand = random.Random(seed)
+    data = dict()
+    for i in range(num_nodes):
+        num_deps = min(i, rand.randint(0, max_deps))
+        data["node%i" % i] = ["node%i" % x for x in rand.sample(range(i), num_deps)]
+    return data
+
+
+def test_simple():
+    """ Test Simple """
+    data = {
+        "a": ["b", "c", "d"],
+        "b": ["e", "c"],
+    }
+    assert qisys.sort.topological_sort(data, "a") == ["e", "c", "b", "d", "a"]
+    assert qisys.sort.topological_sort(data, ["b", "d"]) == ["e", "c", "b", "d"]
+
+
+def test_does_not_modify_data():
+    """ Test Does Not Modify Data """
+    data = {"a": ["b"]}
+    qisys.sort.topological_sort(data, ["a"])
+    assert data == {"a": ["b"]}
+
+
+def test_deep_chain():
+    """ Long chains of dependencies should not reach the recursion limit """
+    data = dict(("node%i" % i, ["node%i" % (i - 1)]) for i in range(1, 10000))
+    res = qisys.sort.topological_sort(data, "node9999")
+    assert res == ["node%i" % i for i in range(10000)]
+    qisys.sort.assert_dag(data)
+
+
+def test_cycles_are_ignored_by_default():
+    """ Test Cycles Are Ignored By Default """
+    data = {"a": ["b"], "b": ["a"]}
+    assert qisys.sort.topological_sort(data, "a") == ["b", "a"]
+
+
+def test_report_cycles():
+    """ Test Report Cycles """
+    data = {
+        "a": ["b", "d"],
+        "b": ["c"],
+        "c": ["a"],
+        "d": ["e"],
+        "e": ["d", "e"],
+        "f": ["f"],
+    }
+    with pytest.raises(qisys.sort.CycleError) as e:
+        qisys.sort.topological_sort(data, "a", raise_on_cycles=True)
+    assert e.value.cycles == [["d", "e"], ["a", "b", "c"]]
+    assert "a -> b -> c -> a" in str(e.value)
+    # 'f' is not a dependency of 'a'
+    assert ["f"] not in e.value.cycles
+    assert ["f"] in qisys.sort.find_cycles(data)
+
+
+def test_assert_dag():
+    """ Test Assert Dag """
+    qisys.sort.assert_dag({"a": ["b"], "b": ["c"]})
+    with pytest.raises(qisys.sort.DagError):
+        qisys.sort.assert_dag({"a": ["b"], "b": ["c"], "c": ["a"]})
+
+
+def test_benchmark_10k_nodes():
+    """ Sorting a 10k nodes dag should be fast """
+    data = generate_dag(10000)
+    heads = list(data.keys())
+    start = time.time()
+    res = qisys.sort.topological_sort(data, heads, raise_on_cycles=True)
+    qisys.sort.assert_dag(data)
+    elapsed = time.time() - start
+    print("Sorted %i nodes in %.3fs" % (len(res), elapsed))
+    assert len(res) == 10000
+    position = dict((name, i) for (i, name) in enumerate(res))
+    for node, deps in data.items():
+        for dep in deps:
+            assert position[dep] < position[node]
+    assert elapsed < 5
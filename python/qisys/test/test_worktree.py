@@ -8,11 +8,13 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
+import json
 import py
 import mock
 import pytest
 
 import qisys.sh
+import qisys.qixml
 import qisys.worktree
 
 
@@ -87,6 +89,20 @@ def test_remove_project(worktree):
     assert not os.path.exists(foo_src.strpath)
 
 
+def test_get_project_by_src(worktree):
+    """ Lookups by src should follow the projects added and removed """
+    tmp = py.path.local(worktree.root)  # pylint:disable=no-member
+    foo_src = tmp.mkdir("foo")
+    tmp.mkdir("bar")
+    worktree.add_projects(["foo", "bar"])
+    assert worktree.has_project(foo_src.strpath)
+    assert worktree.get_project(foo_src.strpath).src == "foo"
+    worktree.move_project("foo", "bar/foo")
+    assert not worktree.has_project("foo")
+    assert worktree.get_project("foo") is None
+    assert worktree.get_project("bar/foo").src == "bar/foo"
+
+
 def test_nested_qiprojects(tmpdir):
     """ Test Nested Project """
     a_project = tmpdir.mkdir("a")
@@ -117,6 +133,46 @@ def test_nested_qiprojects(tmpdir):
     assert [p.src for p in worktree.projects] == ["a", "a/b", "a/b/c"]
 
 
+def test_qiproject_index(tmpdir):
+    """ qiproject.xml files are only parsed again when they change """
+    a_project = tmpdir.mkdir("a")
+    worktree_xml = tmpdir.mkdir(".qi").join("worktree.xml")
+    worktree_xml.write("""
+<worktree>
+    <project src="a" />
+</worktree>
+""")
+    a_xml = a_project.join("qiproject.xml")
+    a_xml.write("""
+<project name="a">
+    <project src="b" />
+</project>
+""")
+    b_xml = a_project.mkdir("b").join("qiproject.xml")
+    b_xml.write('<project name="b" />\n')
+    # make sure the files are not considered as being modified right now
+    for xml in [a_xml, b_xml]:
+        os.utime(xml.strpath, (0, 0))
+    worktree = qisys.worktree.WorkTree(tmpdir.strpath)
+    assert [p.src for p in worktree.projects] == ["a", "a/b"]
+    with open(worktree.qiproject_index_json, "r") as fp:
+        index = json.load(fp)
+    # Only what is read from the files is stored, not their contents
+    assert index["a/qiproject.xml"]["data"] == {"worktree": ["b"]}
+    with mock.patch("qisys.qixml.read", wraps=qisys.qixml.read) as mock_read:
+        worktree = qisys.worktree.WorkTree(tmpdir.strpath)
+        assert [p.src for p in worktree.projects] == ["a", "a/b"]
+    read_paths = [x[0][0] for x in mock_read.call_args_list]
+    assert not [x for x in read_paths if x.endswith("qiproject.xml")]
+    a_tree = worktree.get_project("a").read_qiproject_xml()
+    assert a_tree is worktree.get_project("a").read_qiproject_xml()
+    b_xml.write('<project name="b">\n<project src="c" />\n</project>\n')
+    os.utime(b_xml.strpath, (10, 10))
+    b_xml.dirpath().mkdir("c")
+    worktree = qisys.worktree.WorkTree(tmpdir.strpath)
+    assert [p.src for p in worktree.projects] == ["a", "a/b", "a/b/c"]
+
+
 def test_non_exiting_path_are_removed(tmpdir, interact):
     """ All projects registered should exist """
     wt = qisys.worktree.WorkTree(tmpdir.strpath)
@@ -9,6 +9,8 @@ from __future__ import print_function
 
 import os
 import abc
+import json
+import time
 import ntpath
 import locale
 import operator
@@ -41,7 +43,10 @@ This path does not exist
 """.format(root))
         self._observers = list()
         self.root = root
+        # normalized src -> WorkTreeProject, rebuilt each time the projects are loaded
+        self._projects_by_src = dict()
         self.cache = self.load_cache()
+        self.qiproject_index = QiProjectIndex(self.qiproject_index_json, self.root)
         # Re-parse every qiproject.xml to visit the subprojects
         self.projects = list()
         self.load_projects()
@@ -113,11 +118,15 @@ This path does not exist
                 fp.write("<worktree />")
         return worktree_xml
 
+    @property
+    def qiproject_index_json(self):
+        """ Get the path to .qi/qiproject_index.json """
+        return os.path.join(self.dot_qi, "qiproject_index.json")
+
     def has_project(self, path):
         """ Return True if the Path is a Projet """
         src = self.normalize_path(path)
-        srcs = (self.normalize_path(p.src) for p in self.projects)
-        return src in srcs
+        return src in self._projects_by_src
 
     def load_projects(self):
         """ For every project in cache, re-read the subprojects and and them to the list """
@@ -131,6 +140,8 @@ This path does not exist
         for project in self.projects:
             self._rec_parse_sub_projects(project, res)
         self.projects = sorted(res, key=operator.attrgetter("src"))
+        self._projects_by_src = dict((self.normalize_path(x.src), x) for x in self.projects)
+        self.qiproject_index.save([x.qiproject_xml for x in self.projects])
 
     def _rec_parse_sub_projects(self, project, res):
         """ Recursively parse every project and subproject, filling up the res list. """
@@ -157,10 +168,7 @@ This path does not exist
             mess = ui.did_you_mean("No project in '%s'\n" % src,
                                    src, [self.normalize_path(x.src) for x in self.projects])
             raise WorkTreeError(mess)
-        match = (p for p in self.projects if self.normalize_path(p.src) == src)
-        if six.PY3:
-            return match.__next__()
-        return match.next()
+        return self._projects_by_src[src]
 
     def add_project(self, path):
         """
@@ -181,6 +189,25 @@ This path does not exist
             observer.reload()
         return project
 
+    def add_projects(self, paths):
+        """
+        Add several projects to a worktree, only reloading it once
+        :param paths: paths to the projects, can be absolute,
+                      or relative to the worktree root
+        """
+        srcs = [self.normalize_path(x) for x in paths]
+        for src in srcs:
+            if self.has_project(src):
+                mess = "Could not add project to worktree\n"
+                mess += "Path %s is already registered\n" % src
+                mess += "Current worktree: %s" % self.root
+                raise WorkTreeError(mess)
+        self.cache.add_srcs(srcs)
+        self.load_projects()
+        for observer in self._observers:
+            observer.reload()
+        return [self.get_project(src) for src in srcs]
+
     def remove_project(self, path, from_disk=False):
         """
         Remove a project from a worktree
@@ -292,6 +319,14 @@ class WorkTreeCache(object):
         self.xml_root.append(project_elem)
         qisys.qixml.write(self.xml_root, self.xml_path)
 
+    def add_srcs(self, srcs):
+        """ Add several sources to the cache """
+        for src in srcs:
+            project_elem = qisys.qixml.etree.Element("project")
+            project_elem.set("src", src)
+            self.xml_root.append(project_elem)
+        qisys.qixml.write(self.xml_root, self.xml_path)
+
     def remove_src(self, src):
         """ Remove one source from the cache """
         projects_elem = self.xml_root.findall("project")
@@ -309,6 +344,110 @@ class WorkTreeCache(object):
         return srcs
 
 
+class QiProjectIndex(object):
+    """
+    Cache what every layer (WorkTree, BuildWorkTree, DocWorkTree ...)
+    reads from the qiproject.xml files of a worktree.
+    For each file, each layer stores the data it needs in
+    .qi/qiproject_index.json, and the file is only parsed again
+    when its size or mtime changed.
+    """
+
+    # Files modified less than this number of seconds ago may be modified
+    # again without their mtime changing, so they are never cached
+    racy_delay = 2
+
+    def __init__(self, json_path, root):
+        """ QiProjectIndex Init """
+        self.json_path = json_path
+        self.root = root
+        # relative path -> dict(mtime, size, data=dict(layer -> data))
+        self._entries = dict()
+        # relative path -> ((mtime, size), tree)
+        self._trees = dict()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """ Read the index from the disk """
+        self._entries = dict()
+        self._trees = dict()
+        self._dirty = False
+        if not os.path.exists(self.json_path):
+            return
+        try:
+            with open(self.json_path, "r") as fp:
+                entries = json.load(fp)
+        except ValueError:
+            ui.debug("Ignoring invalid index", self.json_path)
+            return
+        # Indexes written by older versions stored the xml instead
+        self._entries = dict((k, v) for (k, v) in entries.items() if "data" in v)
+
+    def save(self, xml_paths=None):
+        """
+        Write the index on the disk, if it changed.
+        :param xml_paths: if given, forget about the other qiproject.xml files
+        """
+        if xml_paths is not None:
+            keys = set(self._key(x) for x in xml_paths)
+            for key in list(self._entries.keys()):
+                if key not in keys:
+                    del self._entries[key]
+                    self._trees.pop(key, None)
+                    self._dirty = True
+        if not self._dirty:
+            return
+        with open(self.json_path, "w") as fp:
+            json.dump(self._entries, fp)
+        self._dirty = False
+
+    def get_data(self, xml_path, layer, parse):
+        """
+        Return ``parse(tree)`` for the given qiproject.xml, ``parse``
+        returning json-serializable data, which must not be modified.
+        ``parse`` is only called when the file changed since the last time.
+        """
+        key = self._key(xml_path)
+        stat = os.stat(xml_path)
+        signature = [stat.st_mtime, stat.st_size]
+        racy = time.time() - stat.st_mtime < self.racy_delay
+        entry = self._entries.get(key)
+        if entry is None or [entry["mtime"], entry["size"]] != signature:
+            entry = {"mtime": stat.st_mtime, "size": stat.st_size, "data": dict()}
+            if racy:
+                self._dirty = self._entries.pop(key, None) is not None or self._dirty
+            else:
+                self._entries[key] = entry
+                self._dirty = True
+        data = entry["data"]
+        if layer not in data:
+            data[layer] = parse(self.read(xml_path))
+            self._dirty = self._dirty or not racy
+        return data[layer]
+
+    def read(self, xml_path):
+        """
+        Same as qisys.qixml.read, except the returned tree is shared
+        with every other caller and thus must not be modified
+        """
+        key = self._key(xml_path)
+        stat = os.stat(xml_path)
+        if time.time() - stat.st_mtime < self.racy_delay:
+            return qisys.qixml.read(xml_path)
+        signature = (stat.st_mtime, stat.st_size)
+        cached = self._trees.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        tree = qisys.qixml.read(xml_path)
+        self._trees[key] = (signature, tree)
+        return tree
+
+    def _key(self, xml_path):
+        """ Path relative to the worktree, so that the worktree can be moved """
+        return qisys.sh.to_posix_path(os.path.relpath(xml_path, self.root))
+
+
 class WorkTreeError(Exception):
     """ Just a custom exception. """
 
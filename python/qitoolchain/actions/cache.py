@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+"""
+Manage the cache of packages shared by all the toolchains.
+  qitoolchain cache list
+  qitoolchain cache gc --max-size 10G --max-age 30
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import time
+
+import qisys.parsers
+import qitoolchain.cache
+from qisys import ui
+
+
+def configure_parser(parser):
+    """ Configure parser for this action """
+    qisys.parsers.default_parser(parser)
+    parser.add_argument("command", choices=["list", "gc"],
+                        help="list the cached packages, or remove "
+                        "the least recently used ones")
+    parser.add_argument("--max-size", dest="max_size",
+                        help="gc: remove packages until the cache is smaller "
+                        "than this (for instance 500M or 20G)")
+    parser.add_argument("--max-age", dest="max_age", type=int, metavar="DAYS",
+                        help="gc: remove packages not used for this many days")
+
+
+def do(args):
+    """ Main entry point """
+    if args.command == "list":
+        list_cache()
+        return
+    max_size = None
+    if args.max_size:
+        max_size = qitoolchain.cache.parse_size(args.max_size)
+    elif args.max_age is None:
+        max_size = qitoolchain.cache.get_max_size()
+    max_age = None
+    if args.max_age is not None:
+        max_age = args.max_age * 24 * 3600
+    removed = qitoolchain.cache.gc(max_size=max_size, max_age=max_age)
+    for entry in removed:
+        ui.info(ui.red, "Removed", ui.reset, ui.blue, entry.key)
+    # Sizes were read by gc() before the entries were removed
+    freed = sum(x.size for x in removed)
+    ui.info(ui.green, "Removed", len(removed), "package(s),",
+            qitoolchain.cache.format_size(freed), "freed")
+
+
+def list_cache():
+    """ Display the cached packages, most recently used first """
+    entries = qitoolchain.cache.get_entries()
+    if not entries:
+        ui.info("No package in", qitoolchain.cache.get_cache_root())
+        return
+    entries.sort(key=lambda x: x.last_used, reverse=True)
+    ui.info("Packages in", qitoolchain.cache.get_cache_root())
+    for entry in entries:
+        info = entry.read_info()
+        last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.last_used))
+        ui.info(ui.green, "*", ui.blue, info.get("name"), ui.reset, info.get("version") or "",
+                qitoolchain.cache.format_size(entry.size), "last used", last_used)
+    total = sum(x.size for x in entries)
+    ui.info("Total:", qitoolchain.cache.format_size(total))
@@ -33,6 +33,7 @@ def configure_parser(parser):
                         "May be a local file, a url or a git URL (in this case\n"
                         "--feed-name must be used)",
                         nargs="?")
+    qisys.parsers.parallel_parser(parser, default=4)
     parser.set_defaults(branch="master")
 
 
@@ -51,5 +52,6 @@ def do(args):
         ui.info(tc_name, "already exists,", "updating without removing")
     toolchain = qitoolchain.Toolchain(tc_name)
     if feed:
-        toolchain.update(feed, branch=args.branch, name=args.feed_name)
+        toolchain.update(feed, branch=args.branch, name=args.feed_name,
+                         num_jobs=args.num_jobs)
     return toolchain
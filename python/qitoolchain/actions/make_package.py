@@ -21,6 +21,10 @@ def configure_parser(parser):
     parser.add_argument("-o", "--output",
                         help="Base directory in which to create the archive. "
                              "Defaults to current working directory")
+    parser.add_argument("--algo", choices=["zip", "zstd"], default="zip",
+                        help="Archive format: zip (default), or tar.zst, "
+                             "faster to create and to extract")
+    qisys.parsers.compression_parser(parser)
 
 
 def do(args):
@@ -38,8 +42,11 @@ def do(args):
     version = qisys.qixml.parse_required_attr(root, "version")
     target = qisys.qixml.parse_required_attr(root, "target")
     parts = [name, target, version]
-    archive_name = "-".join(parts) + ".zip"
+    archive_name = "-".join(parts)
+    archive_name += ".tar.zst" if args.algo == "zstd" else ".zip"
     output = os.path.join(output, archive_name)
-    res = qisys.archive.compress(input_directory, flat=True, output=output)
+    res = qisys.archive.compress(input_directory, flat=True, output=output,
+                                 algo=args.algo, level=args.compression_level,
+                                 num_jobs=args.compression_jobs)
     ui.info(ui.green, "Package generated in", res)
     return res
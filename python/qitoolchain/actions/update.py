@@ -29,6 +29,7 @@ def configure_parser(parser):
                         help="Name of the feed. To be specified when using a git url")
     parser.add_argument("-b", "--branch",
                         help="Branch of the git url to use")
+    qisys.parsers.parallel_parser(parser, default=4)
 
 
 def do(args):
@@ -44,7 +45,8 @@ def do(args):
                 mess += "Please check configuration or " \
                         "specifiy a feed on the command line\n"
                 raise Exception(mess)
-        toolchain.update(feed, branch=args.branch, name=args.feed_name)
+        toolchain.update(feed, branch=args.branch, name=args.feed_name,
+                         num_jobs=args.num_jobs)
     else:
         tc_names = qitoolchain.get_tc_names()
         tc_with_feed = [x for x in tc_names if qitoolchain.toolchain.Toolchain(x).feed_url]
@@ -55,6 +57,6 @@ def do(args):
             ui.info(ui.green, "*", ui.reset, "(%i/%i)" % (i, len(tc_with_feed)),
                     ui.green, "Updating", ui.blue, tc_name, ui.reset, "with", ui.green,
                     tc_feed)
-            toolchain.update(tc_feed)
+            toolchain.update(tc_feed, num_jobs=args.num_jobs)
         if tc_without_feed:
             ui.info("These toolchains will be skipped because they have no feed:", ", ".join(tc_without_feed))
@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+"""
+Cache of the packages downloaded by qitoolchain, shared by every toolchain.
+
+Each entry holds the archive of a package and the tree extracted from it,
+and is keyed by the url, the version and the sha256 (if any) of the package.
+Toolchains get hard links to the files of the extracted tree, so a package
+used by several toolchains is only downloaded, extracted and stored once.
+Entries of packages without a sha256 are revalidated with the http server
+(using the ETag and Last-Modified headers) each time they are used.
+
+The least recently used entries are removed when the cache grows bigger
+than QITOOLCHAIN_CACHE_MAX_SIZE (20G by default), or by ``qitoolchain cache gc``.
+Since toolchains only hold hard links, removing entries never breaks them.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import re
+import json
+import time
+import shutil
+import filecmp
+import hashlib
+import tempfile
+import threading
+
+import qisys.sh
+import qisys.qixml
+import qisys.remote
+import qitoolchain.qipackage
+from qisys import ui
+
+DEFAULT_MAX_SIZE = 20 * 1024 ** 3
+
+_LOCK = threading.Lock()
+_KEY_LOCKS = dict()
+
+
+def get_cache_root():
+    """ Where the cached packages are stored """
+    return qisys.sh.get_cache_path("qi", "packages")
+
+
+def get_max_size():
+    """ Maximum size of the cache, in bytes """
+    value = os.environ.get("QITOOLCHAIN_CACHE_MAX_SIZE")
+    if not value:
+        return DEFAULT_MAX_SIZE
+    return parse_size(value)
+
+
+def parse_size(value):
+    """
+    Parse a size such as '500M' or '20G'
+    >>> parse_size("2K")
+    2048
+    """
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", value, re.IGNORECASE)
+    if not match:
+        raise Exception("Invalid size: %s (expecting something like 500M or 20G)" % value)
+    number, unit = match.groups()
+    power = " KMGT".index(unit.upper() or " ")
+    return int(float(number) * 1024 ** power)
+
+
+def format_size(size):
+    """
+    Human readable size
+    >>> format_size(3 * 1024 ** 2)
+    '3.0M'
+    """
+    for unit in ["", "K", "M", "G"]:
+        if size < 1024:
+            return "%.1f%s" % (size, unit) if unit else "%i" % size
+        size /= 1024.0
+    return "%.1fT" % size
+
+
+class CacheEntry(object):
+    """ A package in the cache """
+
+    def __init__(self, path):
+        """ CacheEntry Init """
+        self.path = path
+        self.tree = os.path.join(path, "tree")
+        self.archive_dir = os.path.join(path, "archive")
+        self.info_path = os.path.join(path, "entry.json")
+        self._size = None
+
+    @property
+    def key(self):
+        """ Name of the entry in the cache """
+        return os.path.basename(self.path)
+
+    def is_complete(self):
+        """ True if the package has been downloaded and extracted """
+        return os.path.exists(self.info_path)
+
+    def read_info(self):
+        """ Return a dict with the url, version and size of the package """
+        try:
+            with open(self.info_path, "r") as fp:
+                return json.load(fp)
+        except (IOError, OSError, ValueError):
+            return dict()
+
+    def write_info(self, package, sha256=None):
+        """ Mark the entry as complete """
+        info = {
+            "name": package.name,
+            "version": package.version,
+            "url": package.url,
+            "sha256": sha256,
+            "size": _get_tree_size(self.path),
+        }
+        with open(self.info_path, "w") as fp:
+            json.dump(info, fp, indent=2, sort_keys=True)
+
+    @property
+    def size(self):
+        """ Size of the entry in bytes, computed when it was added """
+        if self._size is None:
+            self._size = self.read_info().get("size", 0)
+        return self._size
+
+    @property
+    def last_used(self):
+        """ Time of the last use of the package by a toolchain """
+        try:
+            return os.path.getmtime(self.info_path)
+        except OSError:
+            return 0
+
+    def touch(self):
+        """ Record that the entry has just been used """
+        if self.is_complete():
+            os.utime(self.info_path, None)
+
+    def __repr__(self):
+        """ CacheEntry Representation """
+        return "<CacheEntry %s>" % self.key
+
+
+def get_entry(package):
+    """ The entry of the cache for the given package, which may not exist yet """
+    to_hash = "%s\0%s\0%s" % (package.url, package.version, package.sha256 or "")
+    digest = hashlib.sha1(to_hash.encode("utf-8")).hexdigest()[:12]
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", package.name)
+    return CacheEntry(os.path.join(get_cache_root(), "%s-%s" % (name, digest)))
+
+
+def get_entries():
+    """ All the complete entries of the cache """
+    root = get_cache_root()
+    if not os.path.isdir(root):
+        return list()
+    res = list()
+    for name in sorted(os.listdir(root)):
+        entry = CacheEntry(os.path.join(root, name))
+        if entry.is_complete():
+            res.append(entry)
+    return res
+
+
+def fetch(package, extract_slots=None, show_progress=True):
+    """
+    Make sure the package has been downloaded and extracted in the cache.
+    Can be called from several threads and processes at once.
+    Packages without a sha256 may change behind the same url, so when
+    they come from an http server the cached archive is revalidated
+    with a conditional request, and extracted again if it changed.
+    :param extract_slots: a semaphore limiting the number of concurrent extractions
+    :returns: the CacheEntry of the package
+    """
+    entry = get_entry(package)
+    revalidate = not package.sha256 and package.url.startswith(("http://", "https://"))
+    with _LOCK:
+        key_lock = _KEY_LOCKS.setdefault(entry.key, threading.Lock())
+    with key_lock:
+        complete = entry.is_complete()
+        if complete and not revalidate:
+            return _use_cached(entry, package)
+        qisys.sh.mkdir(entry.path, recursive=True)
+        # The archive is downloaded in the entry itself, so that an interrupted
+        # download is resumed next time. It only gets its final name once
+        # complete and verified.
+        callback = qisys.remote.progress_callback if show_progress else None
+        message = None
+        if not complete:
+            message = (ui.green, "Downloading", ui.reset, ui.blue, package.url)
+        archive = qisys.remote.download(
+            package.url,
+            entry.archive_dir,
+            callback=callback,
+            message=message,
+            sha256=package.sha256,
+            conditional=revalidate
+        )
+        if complete:
+            if not _has_changed(entry, archive):
+                return _use_cached(entry, package)
+            ui.info(ui.green, "Updating cached", ui.reset, ui.blue, package.url)
+        # Extract in a temporary directory, and rename the results when done,
+        # so that other processes never see half extracted packages
+        tmp = tempfile.mkdtemp(prefix="tmp-", dir=entry.path)
+        try:
+            message = [ui.green, "Extracting", ui.reset, ui.blue, package.name]
+            if package.version:
+                message.append(package.version)
+            if extract_slots:
+                extract_slots.acquire()
+            try:
+                ui.info(*message)
+                qitoolchain.qipackage.extract(archive, os.path.join(tmp, "tree"))
+            finally:
+                if extract_slots:
+                    extract_slots.release()
+            if os.path.exists(archive):
+                package.sha256 = package.sha256 or qisys.remote.sha256sum(archive)
+            if complete:
+                qisys.sh.rm(entry.tree)
+            _move_if_exists(os.path.join(tmp, "tree"), entry.tree)
+        finally:
+            qisys.sh.rm(tmp)
+        if os.path.exists(entry.tree):
+            entry.write_info(package, sha256=package.sha256)
+    return entry
+
+
+def _use_cached(entry, package):
+    """ Helper for fetch(), when the entry is up to date """
+    ui.info(ui.green, "Using cached", ui.reset, ui.blue, package.url)
+    entry.touch()
+    package.sha256 = package.sha256 or entry.read_info().get("sha256")
+    return entry
+
+
+def _has_changed(entry, archive):
+    """
+    True if the archive was downloaded again since the entry was
+    last used, with different contents
+    """
+    if os.path.getmtime(archive) <= entry.last_used:
+        return False
+    return qisys.remote.sha256sum(archive) != entry.read_info().get("sha256")
+
+
+def materialize(entry, dest, package=None):
+    """
+    Make the tree of the entry available in dest, using hard links.
+    Packages running a post-add script get a real copy instead, in
+    case the script changes the files in place.
+    """
+    qisys.sh.rm(dest)
+    if not os.path.isdir(entry.tree):
+        return
+    hardlinks = not _has_post_add(package, entry.tree)
+    link_tree(entry.tree, dest, hardlinks=hardlinks)
+
+
+def _has_post_add(package, tree):
+    """ Whether a post-add script will be run in the package """
+    if package is not None and package._post_add:  # pylint:disable=protected-access
+        return True
+    package_xml = os.path.join(tree, "package.xml")
+    if not os.path.exists(package_xml):
+        return False
+    return bool(qisys.qixml.read(package_xml).getroot().get("post-add"))
+
+
+def link_tree(src, dest, hardlinks=True):
+    """
+    Copy the src directory to dest, keeping symlinks, and using hard links
+    for regular files when possible.
+    """
+    for (root, dirs, files) in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        dest_root = os.path.normpath(os.path.join(dest, rel_root))
+        qisys.sh.mkdir(dest_root, recursive=True)
+        shutil.copystat(root, dest_root)
+        for name in list(dirs):
+            if os.path.islink(os.path.join(root, name)):
+                # os.walk does not follow the links to directories
+                files.append(name)
+                dirs.remove(name)
+        for name in files:
+            src_file = os.path.join(root, name)
+            dest_file = os.path.join(dest_root, name)
+            if os.path.islink(src_file):
+                os.symlink(os.readlink(src_file), dest_file)
+                continue
+            if hardlinks:
+                try:
+                    os.link(src_file, dest_file)
+                    continue
+                except (OSError, AttributeError):
+                    # Not supported, or not on the same file system
+                    pass
+            shutil.copy2(src_file, dest_file)
+
+
+def sync_tree(src, dest):
+    """
+    Make dest identical to src, only touching the files that changed:
+    files missing from src are removed from dest, and files that
+    differ are moved from src to dest. src is removed afterwards.
+    :returns: a tuple (number of changed files, number of removed files)
+    """
+    changed = 0
+    removed = 0
+    for (root, dirs, files) in os.walk(dest, topdown=False):
+        rel_root = os.path.relpath(root, dest)
+        for name in files + dirs:
+            dest_path = os.path.join(root, name)
+            src_path = os.path.normpath(os.path.join(src, rel_root, name))
+            if os.path.lexists(src_path) and \
+                    os.path.isdir(src_path) == os.path.isdir(dest_path) and \
+                    os.path.islink(src_path) == os.path.islink(dest_path):
+                continue
+            qisys.sh.rm(dest_path)
+            removed += 1
+    for (root, dirs, files) in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        dest_root = os.path.normpath(os.path.join(dest, rel_root))
+        qisys.sh.mkdir(dest_root, recursive=True)
+        for name in list(dirs):
+            if os.path.islink(os.path.join(root, name)):
+                files.append(name)
+                dirs.remove(name)
+        for name in files:
+            src_file = os.path.join(root, name)
+            dest_file = os.path.join(dest_root, name)
+            if _same_file(src_file, dest_file):
+                continue
+            qisys.sh.rm(dest_file)
+            os.rename(src_file, dest_file)
+            changed += 1
+    qisys.sh.rm(src)
+    return changed, removed
+
+
+def _same_file(src_file, dest_file):
+    """ True if the two files have the same contents """
+    if os.path.islink(src_file) or os.path.islink(dest_file):
+        return os.path.islink(src_file) and os.path.islink(dest_file) and \
+            os.readlink(src_file) == os.readlink(dest_file)
+    if not os.path.exists(dest_file):
+        return False
+    if os.path.samefile(src_file, dest_file):
+        return True
+    if os.stat(src_file).st_mode != os.stat(dest_file).st_mode:
+        return False
+    return filecmp.cmp(src_file, dest_file, shallow=False)
+
+
+def gc(max_size=None, max_age=None):
+    """
+    Remove the least recently used entries until the cache is
+    smaller than max_size bytes, and the entries not used for
+    more than max_age seconds.
+    Unfinished entries left by interrupted downloads are removed too.
+    :returns: the list of the removed entries, whose size is still known
+    """
+    root = get_cache_root()
+    if not os.path.isdir(root):
+        return list()
+    for name in os.listdir(root):
+        entry = CacheEntry(os.path.join(root, name))
+        if not entry.is_complete() and not _is_recent(entry.path):
+            _remove_entry(entry)
+    entries = sorted(get_entries(), key=lambda x: x.last_used)
+    total_size = sum(x.size for x in entries)
+    now = time.time()
+    removed = list()
+    for entry in entries:
+        too_big = max_size is not None and total_size > max_size
+        too_old = max_age is not None and now - entry.last_used > max_age
+        if not too_big and not too_old:
+            continue
+        total_size -= entry.size
+        _remove_entry(entry)
+        removed.append(entry)
+    return removed
+
+
+def _remove_entry(entry):
+    """ Remove the entry, and what qisys.remote knows about its archive """
+    if os.path.isdir(entry.archive_dir):
+        for name in os.listdir(entry.archive_dir):
+            if name.endswith(".part"):
+                name = name[:-len(".part")]
+            qisys.remote.forget_download(os.path.join(entry.archive_dir, name))
+    qisys.sh.rm(entry.path)
+
+
+def _is_recent(path, delay=24 * 3600):
+    """ Entries being created by an other process should be left alone """
+    try:
+        return time.time() - os.path.getmtime(path) < delay
+    except OSError:
+        return False
+
+
+def _move_if_exists(src, dest):
+    """ Rename src to dest, unless src does not exist or dest already exists """
+    if not os.path.exists(src) or os.path.exists(dest):
+        return
+    try:
+        os.rename(src, dest)
+    except OSError:
+        # Created by an other process in the mean time
+        pass
+
+
+def _get_tree_size(path):
+    """ Size of the files in the given directory """
+    res = 0
+    for (root, _dirs, files) in os.walk(path):
+        for name in files:
+            res += os.lstat(os.path.join(root, name)).st_size
+    return res
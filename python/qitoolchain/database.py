@@ -8,12 +8,15 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
+import threading
 
+import qisys.parallel
 import qisys.qixml
 
 from qisys import ui
 from qisys.qixml import etree
 
+import qitoolchain.cache
 import qitoolchain.feed
 import qitoolchain.qipackage
 import qitoolchain.svn_package
@@ -116,7 +119,7 @@ class DataBase(object):
                 res.append(self.packages[name])
         return res
 
-    def update(self, feed, branch=None, name=None):
+    def update(self, feed, branch=None, name=None, num_jobs=1):
         """
         Update a toolchain given a feed
         ``feed`` can be:
@@ -124,50 +127,49 @@ class DataBase(object):
         * an url
         * a git url (in this case branch and name cannot be None,
           and ``feeds/<name>.xml`` must exist on the given branch)
+        Feeds and new packages are fetched first, using num_jobs downloads at once,
+        and the toolchain is left untouched if one of them could not be fetched.
         """
-        feed_parser = qitoolchain.feed.ToolchainFeedParser(self.name)
+        feed_parser = qitoolchain.feed.ToolchainFeedParser(self.name, num_jobs=num_jobs)
         feed_parser.parse(feed, branch=branch, name=name)
         self.build_target = feed_parser.target
         ui.debug("Update target in database from feedParser", self.build_target)
         remote_packages = feed_parser.get_packages()
-        local_packages = self.packages.values()
-        to_add = list()
-        to_remove = list()
-        to_update = list()
+        local_packages = list(self.packages.values())
+        remote_by_name = dict((x.name, x) for x in remote_packages)
         svn_packages = [
             x for x in remote_packages
             if isinstance(x, qitoolchain.svn_package.SvnPackage)
         ]
         other_packages = [x for x in remote_packages if x not in svn_packages]
+        to_add = [x for x in other_packages if x.name not in self.packages]
+        to_remove = [x for x in local_packages if x.name not in remote_by_name]
+        to_update = list()
+        metadata_only = list()
         for remote_package in other_packages:
-            if remote_package.name in (x.name for x in local_packages):
+            local_package = self.packages.get(remote_package.name)
+            if local_package is None:
                 continue
-            to_add.append(remote_package)
-        for local_package in local_packages:
-            if local_package.name not in (x.name for x in remote_packages):
-                to_remove.append(local_package)
-        remote_names = [x.name for x in remote_packages]
-        for local_package in local_packages:
-            if local_package not in remote_packages and local_package.name in remote_names:
-                remote_package = [x for x in remote_packages
-                                  if x.name == local_package.name][0]
+            if remote_package.sha256 and local_package.sha256:
+                # The feed tells us whether the archive changed
+                if remote_package.sha256 != local_package.sha256:
+                    to_update.append(remote_package)
+                elif remote_package != local_package:
+                    metadata_only.append(remote_package)
+            elif remote_package != local_package:
                 to_update.append(remote_package)
-        # remove svn packages from the list of packages to update
-        to_update = [
-            x for x in to_update
-            if not isinstance(x, qitoolchain.svn_package.SvnPackage)
-        ]
+        self.fetch_packages(to_update + to_add, feed, num_jobs=num_jobs)
         if to_update:
             ui.info(ui.red, "Updating packages")
         for i, package in enumerate(to_update):
-            remote_package = [x for x in remote_packages if x.name == package.name][0]
-            local_package = [x for x in local_packages if x.name == package.name][0]
+            local_package = self.packages[package.name]
             ui.info_count(i, len(to_update), ui.blue,
                           package.name, "from", local_package.version,
-                          "to", remote_package.version)
-            self.remove_package(package.name)
-            self.handle_package(package, feed)
+                          "to", package.version)
+            self.install_fetched_package(package, previous=local_package)
             self.add_package(package)
+        for package in metadata_only:
+            self.update_package_metadata(package)
         if to_remove:
             ui.info(ui.red, "Removing packages")
         for i, package in enumerate(to_remove):
@@ -177,7 +179,7 @@ class DataBase(object):
             ui.info(ui.green, "Adding packages")
         for i, package in enumerate(to_add):
             ui.info_count(i, len(to_add), ui.blue, package.name)
-            self.handle_package(package, feed)
+            self.install_fetched_package(package)
             self.add_package(package)
         if svn_packages:
             ui.info(ui.green, "Updating svn packages")
@@ -185,8 +187,85 @@ class DataBase(object):
             ui.info_count(i, len(svn_packages), ui.blue, svn_package.name)
             self.handle_svn_package(svn_package)
             self.add_package(svn_package)
+        qisys.sh.rm(self.staging_path)
         ui.info(ui.green, "Done")
         self.save()
+        qitoolchain.cache.gc(max_size=qitoolchain.cache.get_max_size())
+
+    @property
+    def staging_path(self):
+        """ Where packages are extracted before being added to the toolchain """
+        return os.path.join(self.packages_path, ".staging")
+
+    def fetch_packages(self, packages, feed, num_jobs=1):
+        """
+        Download the packages using num_jobs threads, and extract each of
+        them in the staging directory as soon as it is downloaded, with
+        at most one extraction per CPU at once.
+        Raise if some packages could not be fetched, leaving the
+        toolchain untouched.
+        """
+        if not packages:
+            return
+        ui.info(ui.green, "Fetching packages")
+        extract_slots = threading.BoundedSemaphore(qisys.parallel.get_num_jobs(0))
+        show_progress = qisys.parallel.get_num_jobs(num_jobs, len(packages)) == 1
+
+        def fetch(package):
+            """ Fetch one package """
+            if package.url:
+                dest = os.path.join(self.staging_path, package.name, package.name)
+                self.download_package(package, dest=dest, extract_slots=extract_slots,
+                                      show_progress=show_progress)
+            if package.directory:
+                self.handle_local_package(package, feed)
+
+        def on_progress(i, num_packages, result):
+            """ Called each time a package is done """
+            status = (ui.green, "ok") if result.ok else (ui.red, "failed")
+            ui.info_count(i, num_packages, ui.blue, result.item.name, *status)
+
+        try:
+            qisys.parallel.foreach(packages, fetch, n_jobs=num_jobs, on_progress=on_progress)
+        except qisys.parallel.ForeachError as e:
+            qisys.sh.rm(self.staging_path)
+            raise Exception("Could not fetch packages, toolchain not updated\n%s" % e)
+
+    def install_fetched_package(self, package, previous=None):
+        """
+        Move a package fetched by fetch_packages to its final location.
+        When updating a package extracted in the same location, only
+        the files that changed are touched.
+        """
+        dest = os.path.join(self.packages_path, package.name)
+        staged = os.path.join(self.staging_path, package.name, package.name)
+        if previous and (previous.path != dest or not package.url):
+            self.remove_package(previous.name)
+        if not package.url:
+            return
+        if os.path.exists(staged):
+            if previous and os.path.isdir(dest):
+                (changed, removed) = qitoolchain.cache.sync_tree(staged, dest)
+                ui.info(ui.green, "Changed", changed, "file(s), removed", removed, "file(s) in",
+                        ui.blue, package.name)
+            else:
+                qisys.sh.rm(dest)
+                qisys.sh.mv(staged, dest)
+            qisys.sh.rm(os.path.dirname(staged))
+        package.path = dest
+
+    def update_package_metadata(self, package):
+        """
+        Update a package whose archive did not change,
+        without extracting it again
+        """
+        local_package = self.packages[package.name]
+        ui.info(ui.green, "Updating metadata of", ui.blue, package.name,
+                ui.reset, "from", local_package.version, "to", package.version)
+        package.path = local_package.path
+        package.load_package_xml()
+        package.reroot_paths()
+        self.packages[package.name] = package
 
     def handle_package(self, package, feed):
         """ Download if needed and Handle a Package """
@@ -213,18 +292,17 @@ class DataBase(object):
         package_path = qisys.sh.to_native_path(package_path)
         package.path = package_path
 
-    def download_package(self, package):
-        """ Download a Package """
-        with qisys.sh.TempDir() as tmp:
-            archive = qisys.remote.download(
-                package.url,
-                tmp,
-                message=(ui.green, "Downloading", ui.reset, ui.blue, package.url)
-            )
+    def download_package(self, package, dest=None, extract_slots=None, show_progress=True):
+        """
+        Download a Package in the cache shared by all the toolchains,
+        and make it available in dest (by default, in the directory
+        of the toolchain)
+        :param extract_slots: a semaphore limiting the number of
+                              concurrent extractions
+        """
+        if dest is None:
             dest = os.path.join(self.packages_path, package.name)
-            message = [ui.green, "Extracting", ui.reset, ui.blue, package.name]
-            if package.version:
-                message.append(package.version)
-            ui.info(*message)
-            qitoolchain.qipackage.extract(archive, dest)
+        entry = qitoolchain.cache.fetch(package, extract_slots=extract_slots,
+                                        show_progress=show_progress)
+        qitoolchain.cache.materialize(entry, dest, package=package)
         package.path = dest
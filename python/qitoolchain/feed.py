@@ -8,6 +8,9 @@ from __future__ import unicode_literals
 from __future__ import print_function
 
 import os
+import hashlib
+import threading
+import collections
 from xml.etree import ElementTree
 import six
 
@@ -15,6 +18,7 @@ import qitoolchain
 import qisrc.git
 import qisys
 import qisys.archive
+import qisys.parallel
 import qisys.remote
 import qisys.version
 from qisys import ui
@@ -24,6 +28,10 @@ if six.PY3:
 else:
     import urlparse
 
+# Parsed feed documents, by path, size and modification time
+_TREES = dict()
+_TREES_LOCK = threading.Lock()
+
 
 def is_url(location):
     """ Check that a given location is an URL """
@@ -45,16 +53,14 @@ def tree_from_feed(feed_location, branch=None, name=None):
     tree = None
     try:
         if feed_location and os.path.exists(feed_location):
-            fp = open(feed_location, "r")
+            return _parse_feed_file(feed_location)
         elif is_url(feed_location):
+            if urlparse.urlsplit(feed_location).scheme in ["http", "https"]:
+                return _parse_feed_file(fetch_feed(feed_location))
             fp = qisys.remote.open_remote_location(feed_location)
         else:
             raise Exception("Could not parse %s: Feed location is not an existing path nor an url" % feed_location)
-        tree = ElementTree.ElementTree()
-        if six.PY3:
-            tree.parse(fp, parser=ElementTree.XMLParser(encoding='utf-8'))
-        else:
-            tree.parse(fp)
+        tree = _parse_feed(fp)
     except Exception as e:
         if six.PY3:
             ui.error(e)
@@ -67,6 +73,71 @@ def tree_from_feed(feed_location, branch=None, name=None):
     return tree
 
 
+def _parse_feed(fp):
+    """ Parse the feed document read from fp """
+    tree = ElementTree.ElementTree()
+    if six.PY3:
+        tree.parse(fp, parser=ElementTree.XMLParser(encoding='utf-8'))
+    else:
+        tree.parse(fp)
+    return tree
+
+
+def _parse_feed_file(path):
+    """
+    Parse a local feed document, unless it has not changed
+    since it was last parsed
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _TREES_LOCK:
+        tree = _TREES.get(key)
+    if tree is None:
+        with open(path, "r") as fp:
+            tree = _parse_feed(fp)
+        with _TREES_LOCK:
+            _TREES[key] = tree
+    # Callers change the elements of the tree
+    return ElementTree.ElementTree(_copy_element(tree.getroot()))
+
+
+def _copy_element(element):
+    """ Deep copy of an element, faster than copy.deepcopy """
+    res = ElementTree.Element(element.tag, element.attrib)
+    res.text = element.text
+    res.tail = element.tail
+    for child in element:
+        res.append(_copy_element(child))
+    return res
+
+
+def get_feeds_cache_path():
+    """ Where the feeds downloaded over HTTP are stored """
+    return qisys.sh.get_cache_path("qi", "feeds")
+
+
+def fetch_feed(url):
+    """
+    Download the feed document from the given HTTP url in the feeds cache,
+    only fetching it again when it changed on the server (using the
+    ETag and Last-Modified headers of the previous download).
+    If the server cannot be reached, the cached document is used.
+    :return: the path to the cached document
+    """
+    cache_path = get_feeds_cache_path()
+    output_name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".xml"
+    cached = os.path.join(cache_path, output_name)
+    try:
+        return qisys.remote.download(url, cache_path, output_name=output_name,
+                                     callback=None, conditional=True)
+    except Exception as e:
+        if not os.path.exists(cached):
+            raise
+        ui.warning("Could not update feed from", url, ":", e, "\n",
+                   "Using the cached version")
+        return cached
+
+
 def open_git_feed(toolchain_name, feed_url, name=None, branch="master", first_pass=True):
     """ Open a Git Feed """
     git_path = qisys.sh.get_share_path("qi", "toolchains", toolchain_name + ".git")
@@ -88,11 +159,15 @@ def open_git_feed(toolchain_name, feed_url, name=None, branch="master", first_pa
 class ToolchainFeedParser(object):
     """ A class to handle feed parsing """
 
-    def __init__(self, name):
+    def __init__(self, name, num_jobs=4):
         """ ToolchainFeedParser Init """
         self.name = name
         self.build_target = None
-        self.packages = list()
+        # Number of feed documents to fetch at once
+        self.num_jobs = num_jobs
+        # A dict name -> package, in the order the packages were added,
+        # only containing the latest version of each package
+        self._packages = collections.OrderedDict()
         # A list of packages to be blacklisted
         self.blacklist = list()
         # A dict name -> version used to only keep the latest
@@ -104,9 +179,15 @@ class ToolchainFeedParser(object):
         """ Build target """
         return self.build_target
 
+    @property
+    def packages(self):
+        """ The parsed packages, blacklisted ones included """
+        return list(self._packages.values())
+
     def get_packages(self):
         """ Get the parsed packages """
-        res = [x for x in self.packages if x.name not in self.blacklist]
+        blacklist = set(self.blacklist)
+        res = [x for x in self._packages.values() if x.name not in blacklist]
         return res
 
     def append_package(self, package_tree):
@@ -116,10 +197,9 @@ class ToolchainFeedParser(object):
         """
         version = package_tree.get("version")
         name = package_tree.get("name")
-        names = self._versions.keys()
-        if name not in names:
+        if name not in self._versions:
             self._versions[name] = version
-            self.packages.append(qitoolchain.qipackage.from_xml(package_tree))
+            self._packages[name] = qitoolchain.qipackage.from_xml(package_tree)
         else:
             if version is None:
                 # if version not defined, don't keep it
@@ -128,16 +208,71 @@ class ToolchainFeedParser(object):
             if prev_version and qisys.version.compare(prev_version, version) > 0:
                 return
             else:
-                self.packages = [x for x in self.packages if x.name != name]
-                self.packages.append(qitoolchain.qipackage.from_xml(package_tree))
+                # The new version goes at the end, as if it was appended
+                self._packages.pop(name, None)
+                self._packages[name] = qitoolchain.qipackage.from_xml(package_tree)
                 self._versions[name] = version
 
     def parse(self, feed, branch=None, name=None, first_pass=True):
-        """ Recursively parse the feed, filling the self.packages """
-        tc_path = qisys.sh.get_share_path("qi", "toolchains", self.name)
+        """
+        Recursively parse the feed, filling the self.packages
+        Every feed of the hierarchy is fetched first, using self.num_jobs
+        threads, then the feeds are parsed in the order they are included,
+        so that the same packages are always selected.
+        """
         if branch and name:
             feed = open_git_feed(self.name, feed, branch=branch, name=name, first_pass=first_pass)
-        tree = tree_from_feed(feed)
+        trees = self._fetch_trees(feed, branch)
+        self._parse_tree(feed, trees, branch=branch, parents=list())
+
+    def _fetch_trees(self, feed, branch):
+        """
+        Fetch the given feed and all the feeds it includes, one level of
+        the hierarchy at a time, fetching the feeds of a level concurrently.
+        :return: a dict location -> ElementTree
+        """
+        trees = dict()
+        to_fetch = [(feed, branch)]
+        while to_fetch:
+            locations = list()
+            for location, location_branch in to_fetch:
+                if location not in trees and location not in [x[0] for x in locations]:
+                    locations.append((location, location_branch))
+            results = qisys.parallel.imap([x[0] for x in locations], tree_from_feed,
+                                          n_jobs=self.num_jobs)
+            to_fetch = list()
+            for result in results:
+                if not result.ok:
+                    raise result.exception
+                trees[result.item] = result.value
+                location_branch = locations[result.index][1]
+                to_fetch.extend((x, None) for x in
+                                self._get_sub_feeds(result.value, result.item, location_branch))
+        return trees
+
+    def _get_sub_feeds(self, tree, feed, branch):
+        """ The locations of the feeds included by the given feed, in order """
+        tc_path = qisys.sh.get_share_path("qi", "toolchains", self.name)
+        res = list()
+        feeds = tree.findall("feed")
+        for feed_tree in feeds:
+            # feed_name = feed_tree.get("name")
+            feed_url = feed_tree.get("url")
+            feed_path = feed_tree.get("path")
+            assert feed_path or feed_url, "Either 'url' or 'path' attributes must be set in a 'feed' non-root element"
+            # feed_url can be relative to feed:
+            if feed_path and branch:
+                res.append(os.path.join(tc_path + ".git", feed_tree.get("path")))
+            elif feed_url:
+                if not is_url(feed_url):
+                    feed_url = urlparse.urljoin(feed, feed_url)
+                res.append(feed_url)
+        return res
+
+    def _parse_tree(self, feed, trees, branch=None, parents=None):
+        """ Fill self.packages from an already fetched feed and its sub feeds """
+        tc_path = qisys.sh.get_share_path("qi", "toolchains", self.name)
+        tree = trees[feed]
         if not self.build_target:
             self.build_target = tree.getroot().get("target")
             ui.debug("Get target from feed xml", self.build_target)
@@ -156,20 +291,11 @@ class ToolchainFeedParser(object):
                                 os.path.join(tc_path, package_tree.get("name")))
                 subpkg_tree.set("subpkg", "1")
                 self.append_package(subpkg_tree)
-        feeds = tree.findall("feed")
-        for feed_tree in feeds:
-            # feed_name = feed_tree.get("name")
-            feed_url = feed_tree.get("url")
-            feed_path = feed_tree.get("path")
-            assert feed_path or feed_url, "Either 'url' or 'path' attributes must be set in a 'feed' non-root element"
-            # feed_url can be relative to feed:
-            if feed_path and branch:
-                feed_path = os.path.join(tc_path + ".git", feed_tree.get("path"))
-                self.parse(feed_path)
-            elif feed_url:
-                if not is_url(feed_url):
-                    feed_url = urlparse.urljoin(feed, feed_url)
-                self.parse(feed_url)
+        for sub_feed in self._get_sub_feeds(tree, feed, branch):
+            if sub_feed == feed or sub_feed in parents:
+                ui.warning("Ignoring feed", sub_feed, "included by itself")
+                continue
+            self._parse_tree(sub_feed, trees, parents=parents + [feed])
         select_tree = tree.find("select")
         if select_tree is not None:
             blacklist_trees = select_tree.findall("blacklist")
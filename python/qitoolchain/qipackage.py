@@ -10,9 +10,12 @@ from __future__ import print_function
 import os
 import sys
 import re
+import json
 import shlex
+import hashlib
 import zipfile
 
+import qisys.sh
 import qisrc.license
 import qibuild.deps
 import qisys.version
@@ -34,6 +37,7 @@ class QiPackage(object):
         self.host = None
         self.path = path
         self.url = None
+        self.sha256 = None
         self.directory = None
         self.toolchain_file = None
         self.sysroot = None
@@ -73,6 +77,8 @@ class QiPackage(object):
             element.set("version", self.version)
         if self.url:
             element.set("url", self.url)
+        if self.sha256:
+            element.set("sha256", self.sha256)
         if self.toolchain_file:
             element.set("toolchain_file", self.toolchain_file)
         if self.sysroot:
@@ -83,7 +89,7 @@ class QiPackage(object):
             element.set("subpkg", self.subpkg)
         return element
 
-    def install(self, destdir, components=None, release=True):
+    def install(self, destdir, components=None, release=True, strategy="copy", num_jobs=None):
         """
         Install the given components of the package to the given destination.
         Will read:
@@ -93,26 +99,30 @@ class QiPackage(object):
           installing *runtime* component
         Note that when installing 'test' component, only the
         install_manifest_test.txt manifest file will be read.
+        The files are copied with the given strategy, using num_jobs
+        threads, see :py:func:`qisys.sh.install`
         """
         if self.subpkg:
             return list()
+        copy_options = {"strategy": strategy, "num_jobs": num_jobs}
         if not components:
-            return self._install_all(destdir)
+            return self._install_all(destdir, copy_options)
         installed_files = list()
         for component in components:
             installed_for_component = self._install_component(component,
-                                                              destdir, release=release)
+                                                              destdir, release=release,
+                                                              copy_options=copy_options)
             installed_files.extend(installed_for_component)
         return installed_files
 
-    def _install_all(self, destdir):
+    def _install_all(self, destdir, copy_options):
         """ Install All """
         def filter_fun(x):
             """ Filter package.xml """
             return x != "package.xml"
-        return qisys.sh.install(self.path, destdir, filter_fun=filter_fun)
+        return self._install_filtered(destdir, "all", filter_fun, copy_options)
 
-    def _install_component(self, component, destdir, release=True):
+    def _install_component(self, component, destdir, release=True, copy_options=None):
         """ Install Component """
         installed_files = list()
         manifest_name = "install_manifest_%s.txt" % component
@@ -131,11 +141,11 @@ class QiPackage(object):
                 def filter_fun(x):
                     """ Filter Function """
                     return qisys.sh.is_runtime(x) and x != "package.xml"
-                return qisys.sh.install(self.path, destdir, filter_fun=filter_fun)
+                return self._install_filtered(destdir, "runtime", filter_fun, copy_options)
             # avoid install masks and package.xml
             mask.append(r"exclude .*\.mask")
             mask.append(r"exclude package\.xml")
-            return self._install_with_mask(destdir, mask)
+            return self._install_with_mask(destdir, mask, copy_options)
         else:
             with open(manifest_path, "r") as fp:
                 lines = fp.readlines()
@@ -143,7 +153,7 @@ class QiPackage(object):
                     line = line.strip()
                     src = os.path.join(self.path, line)
                     dest = os.path.join(destdir, line)
-                    qisys.sh.install(src, dest)
+                    qisys.sh.install(src, dest, **(copy_options or dict()))
                     installed_files.append(line)
             return installed_files
 
@@ -166,30 +176,24 @@ class QiPackage(object):
                     raise Exception(mess)
             return mask
 
-    def _install_with_mask(self, destdir, mask):
+    def _install_with_mask(self, destdir, mask, copy_options=None):
         """ Install With Mask """
+        key = "mask:" + hashlib.sha1("\n".join(mask).encode("utf-8")).hexdigest()
+        return self._install_filtered(destdir, key, compile_mask(mask), copy_options)
 
-        def get_match(line, src):
-            """ Get Match """
-            words = line.split()
-            regex = " ".join(words[1:])
-            return re.match(regex, src)
-
-        def filter_fun(src):
-            """ Filter Function """
-            src = qisys.sh.to_posix_path(src)
-            positive_regexps = [x for x in mask if x.startswith("include")]
-            negative_regexps = [x for x in mask if x.startswith("exclude")]
-            for line in positive_regexps:
-                match = get_match(line, src)
-                if match:
-                    return True
-            for line in negative_regexps:
-                match = get_match(line, src)
-                if match:
-                    return False
-            return True
-        return qisys.sh.install(self.path, destdir, filter_fun=filter_fun)
+    def _install_filtered(self, destdir, key, filter_fun, copy_options=None):
+        """
+        Install the files of the package for which filter_fun returns True.
+        The list of these files is stored in a cache, under the given key,
+        so that the package is not walked and filtered again until it changes.
+        """
+        copy_options = copy_options or dict()
+        if not os.path.isdir(self.path):
+            return qisys.sh.install(self.path, destdir, filter_fun=filter_fun, **copy_options)
+        listing = InstallListing(self.path)
+        entries = listing.get_entries(key, filter_fun)
+        listing.save()
+        return qisys.sh.install_entries(self.path, destdir, entries, **copy_options)
 
     def load_package_xml(self):
         """
@@ -331,6 +335,114 @@ def version_str_to_int(version):
     return int(version)
 
 
+def compile_mask(mask):
+    """
+    Return a function telling whether a relative path should be installed,
+    given a list of mask lines ('include <regex>' or 'exclude <regex>').
+    Paths matching one of the include regexes are installed, paths matching
+    one of the exclude regexes are not, and other paths are installed.
+    All the regexes of a kind are compiled as a single regex.
+    """
+    includes = _match_any(" ".join(x.split()[1:]) for x in mask if x.startswith("include"))
+    excludes = _match_any(" ".join(x.split()[1:]) for x in mask if x.startswith("exclude"))
+
+    def filter_fun(src):
+        """ Filter Function """
+        src = src.replace("\\", "/")
+        if includes and includes(src):
+            return True
+        if excludes and excludes(src):
+            return False
+        return True
+    return filter_fun
+
+
+def _match_any(regexes):
+    """
+    A function calling re.match with each regex until one matches,
+    or None if there are no regexes
+    """
+    regexes = list(regexes)
+    if not regexes:
+        return None
+    # Back references and inline flags would not work once
+    # the regexes are combined
+    if any(re.search(r"\\[1-9]|\(\?[^:]", x) for x in regexes):
+        compiled = [re.compile(x) for x in regexes]
+        return lambda src: any(x.match(src) for x in compiled)
+    return re.compile("|".join("(?:%s)" % x for x in regexes)).match
+
+
+class InstallListing(object):
+    """
+    The files of an installed package, and the subsets of them installed
+    for each component, stored in ~/.cache/qi/install-lists.
+    The listing is valid as long as the modification times of the
+    directories of the package do not change, so only directories are
+    looked at when installing a package that did not change.
+    """
+
+    def __init__(self, path):
+        """ InstallListing Init """
+        self.path = path
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        self.cache_path = qisys.sh.get_cache_path("qi", "install-lists", digest + ".json")
+        self._data = None
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """ Read the cached listing, and scan the package if it is out of date """
+        try:
+            with open(self.cache_path, "r") as fp:
+                data = json.load(fp)
+        except (IOError, OSError, ValueError):
+            data = None
+        if data and data.get("path") == self.path and self._is_up_to_date(data["dirs"]):
+            self._data = data
+            return
+        entries = qisys.sh.list_tree(self.path)
+        dirs = dict()
+        for rel_path in [""] + [x[1] for x in entries if x[0] == "dir"]:
+            dirs[rel_path] = os.stat(os.path.join(self.path, rel_path)).st_mtime
+        self._data = {"path": self.path, "dirs": dirs, "entries": entries, "filtered": dict()}
+        self._dirty = True
+
+    def _is_up_to_date(self, dirs):
+        """ True if no directory of the package changed since the listing was made """
+        for (rel_path, mtime) in dirs.items():
+            try:
+                if os.stat(os.path.join(self.path, rel_path)).st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def get_entries(self, key, filter_fun):
+        """
+        The entries of :py:func:`qisys.sh.list_tree` for which filter_fun
+        returns True, filter_fun being only called if nothing is cached for key
+        """
+        entries = self._data["entries"]
+        indexes = self._data["filtered"].get(key)
+        if indexes is None:
+            indexes = [i for (i, (_kind, rel_path)) in enumerate(entries) if filter_fun(rel_path)]
+            self._data["filtered"][key] = indexes
+            self._dirty = True
+        return [tuple(entries[i]) for i in indexes]
+
+    def save(self):
+        """ Write the listing in the cache, if it changed """
+        if not self._dirty:
+            return
+        qisys.sh.mkdir(os.path.dirname(self.cache_path), recursive=True)
+        tmp_path = "%s.tmp%i" % (self.cache_path, os.getpid())
+        with open(tmp_path, "w") as fp:
+            json.dump(self._data, fp)
+        os.rename(tmp_path, self.cache_path)
+        self._dirty = False
+
+
 def from_xml(element):
     """ Load a Package From an XML File """
     name = element.get("name")
@@ -344,6 +456,7 @@ def from_xml(element):
     else:
         res = QiPackage(name)
     res.url = url
+    res.sha256 = element.get("sha256")
     res.version = element.get("version")
     res.path = element.get("path")
     res.directory = element.get("directory")
@@ -371,7 +484,7 @@ def from_archive(archive_path):
 
 def extract(archive_path, dest):
     """ Extract an Archive """
-    if archive_path.endswith((".tar.gz", ".tbz2")):
+    if archive_path.endswith((".tar.gz", ".tbz2", ".tar.zst")):
         return _extract_legacy(archive_path, dest)
     with zipfile.ZipFile(archive_path, allowZip64=True) as archive:
         names = archive.namelist()
@@ -387,7 +500,7 @@ def _extract_modern(archive_path, dest):
 
 
 def _extract_legacy(archive_path, dest):
-    """ Extract the Legacy Types Archives (TAR.BZ and TBZ2) """
+    """ Extract the Legacy Types Archives (TAR.BZ and TBZ2) and the tar.zst ones """
     dest = qisys.sh.to_native_path(dest)
     algo = qisys.archive.guess_algo(archive_path)
     extract_dest = os.path.dirname(dest)
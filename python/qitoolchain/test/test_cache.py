@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2019 SoftBank Robotics. All rights reserved.
+# Use of this source code is governed by a BSD-style license (see the COPYING file).
+""" Test QiToolchain Cache """
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import mock
+import pytest
+
+import qisys.archive
+import qisys.remote
+import qitoolchain.cache
+import qitoolchain.database
+import qitoolchain.qipackage
+from qitoolchain.test.conftest import toolchain_db, feed  # pylint:disable=unused-import
+from qisys.test.test_remote import file_server  # pylint:disable=unused-import
+
+
+def add_remote_package(feed, name, version="1.0"):
+    """ Add a package with an url to the feed """
+    package = qitoolchain.qipackage.QiPackage(name, version=version)
+    feed.add_package(package, with_path=False, with_url=True)
+    return package
+
+
+def test_packages_are_shared_between_toolchains(toolchain_db, feed, tmpdir):
+    """ Test Packages Are Shared Between Toolchains """
+    add_remote_package(feed, "boost")
+    toolchain_db.update(feed.url)
+    other_db_path = tmpdir.join("other.xml")
+    other_db_path.write("<toolchain />")
+    other_db = qitoolchain.database.DataBase("other", other_db_path.strpath)
+    with mock.patch.object(qisys.remote, "download") as mock_dl:
+        other_db.update(feed.url)
+    assert not mock_dl.called
+    header = os.path.join("include", "boost.h")
+    boost_path = toolchain_db.get_package_path("boost")
+    other_boost_path = other_db.get_package_path("boost")
+    assert boost_path != other_boost_path
+    assert os.path.samefile(os.path.join(boost_path, header),
+                            os.path.join(other_boost_path, header))
+    # Removing a toolchain does not touch the cache
+    toolchain_db.remove()
+    assert os.path.exists(os.path.join(other_boost_path, header))
+    entries = qitoolchain.cache.get_entries()
+    assert len(entries) == 1
+    assert entries[0].read_info()["name"] == "boost"
+
+
+def test_interrupted_downloads_are_resumed(feed, file_server):
+    """ Test Interrupted Downloads Are Resumed """
+    package = add_remote_package(feed, "boost")
+    archive_path = os.path.join(feed.tmp.strpath, "packages", "boost-1.0.zip")
+    with open(archive_path, "rb") as fp:
+        data = fp.read()
+    file_server.files["/boost-1.0.zip"] = data
+    file_server.fail_after = 100
+    package.url = file_server.url + "/boost-1.0.zip"
+    entry = qitoolchain.cache.get_entry(package)
+    with pytest.raises(Exception):
+        qitoolchain.cache.fetch(package, show_progress=False)
+    part = os.path.join(entry.archive_dir, "boost-1.0.zip.part")
+    assert os.path.getsize(part) == 100
+    assert not entry.is_complete()
+    qitoolchain.cache.fetch(package, show_progress=False)
+    assert file_server.requests[-1]["Range"] == "bytes=100-"
+    assert entry.is_complete()
+    assert not os.path.exists(part)
+    assert os.path.exists(os.path.join(entry.tree, "include", "boost.h"))
+
+
+def test_packages_without_sha256_are_revalidated(feed, file_server):
+    """ Test Packages Without Sha256 Are Revalidated """
+    package = add_remote_package(feed, "boost")
+    archive_path = os.path.join(feed.tmp.strpath, "packages", "boost-1.0.zip")
+    with open(archive_path, "rb") as fp:
+        file_server.files["/boost-1.0.zip"] = fp.read()
+    package.url = file_server.url + "/boost-1.0.zip"
+    entry = qitoolchain.cache.fetch(package, show_progress=False)
+    package.sha256 = None
+    qitoolchain.cache.fetch(package, show_progress=False)
+    assert "If-None-Match" in file_server.requests[-1]
+    # Same url and version, but new contents on the server
+    feed.tmp.join("packages", "include", "boost_new.h").ensure(file=True)
+    qisys.archive.compress(feed.tmp.join("packages").strpath, flat=True,
+                           output=feed.tmp.join("new.zip").strpath)
+    file_server.files["/boost-1.0.zip"] = feed.tmp.join("new.zip").read_binary()
+    package.sha256 = None
+    assert qitoolchain.cache.fetch(package, show_progress=False).path == entry.path
+    assert os.path.exists(os.path.join(entry.tree, "include", "boost_new.h"))
+    assert entry.read_info()["sha256"] == package.sha256
+
+
+def test_gc_removes_least_recently_used(toolchain_db, feed):
+    """ Test GC Removes Least Recently Used """
+    for name in ["foo", "bar", "baz"]:
+        add_remote_package(feed, name)
+    toolchain_db.update(feed.url)
+    entries = dict((x.read_info()["name"], x) for x in qitoolchain.cache.get_entries())
+    for i, name in enumerate(["bar", "foo", "baz"]):
+        os.utime(entries[name].info_path, (1000 + i, 1000 + i))
+    max_size = entries["foo"].size + entries["baz"].size
+    removed = qitoolchain.cache.gc(max_size=max_size)
+    assert [x.key for x in removed] == [entries["bar"].key]
+    assert sorted(x.read_info()["name"] for x in qitoolchain.cache.get_entries()) == ["baz", "foo"]
+    # Toolchains still work after their packages are removed from the cache
+    assert os.path.exists(os.path.join(toolchain_db.get_package_path("bar"), "package.xml"))
+    assert qitoolchain.cache.gc(max_age=3600) != []
+    assert not qitoolchain.cache.get_entries()
+
+
+def test_parse_size():
+    """ Test Parse Size """
+    assert qitoolchain.cache.parse_size("500") == 500
+    assert qitoolchain.cache.parse_size("2K") == 2048
+    assert qitoolchain.cache.parse_size("1.5G") == int(1.5 * 1024 ** 3)
+    assert qitoolchain.cache.format_size(3 * 1024 ** 2) == "3.0M"
+
+
+def test_qitoolchain_cache_gc(qitoolchain_action, feed, record_messages):
+    """ Test QiToolchain Cache GC """
+    add_remote_package(feed, "boost")
+    qitoolchain_action("create", "foo", feed.url)
+    qitoolchain_action("cache", "list")
+    assert record_messages.find(r"\* boost 1.0")
+    record_messages.reset()
+    size = qitoolchain.cache.get_entries()[0].size
+    assert size > 0
+    qitoolchain_action("cache", "gc", "--max-size", "0")
+    assert record_messages.find(r"Removed 1 package\(s\), %s freed" % qitoolchain.cache.format_size(size))
+    assert not qitoolchain.cache.get_entries()
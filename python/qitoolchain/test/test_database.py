@@ -9,8 +9,12 @@ from __future__ import print_function
 
 import os
 import mock
+import pytest
 
 import qisys.archive
+import qisys.qixml
+import qisys.remote
+import qitoolchain.cache
 import qitoolchain.feed
 import qitoolchain.database
 import qitoolchain.qipackage
@@ -75,6 +79,52 @@ def test_downloads_only_once(toolchain_db, feed):
     assert mock_extract.call_args_list[0][0][0] == "/path/to/boost.zip"
 
 
+def test_update_in_parallel(toolchain_db, feed):
+    """ Test Update In Parallel """
+    names = ["boost", "foo", "bar", "baz"]
+    for name in names:
+        feed.add_package(qitoolchain.qipackage.QiPackage(name, version="1.0"),
+                         with_path=False, with_url=True)
+    toolchain_db.update(feed.url, num_jobs=3)
+    for name in names:
+        package_path = toolchain_db.get_package_path(name)
+        assert package_path == os.path.join(toolchain_db.packages_path, name)
+        assert os.path.exists(os.path.join(package_path, "include", "%s.h" % name))
+    assert not os.path.exists(toolchain_db.staging_path)
+
+
+def test_failed_fetch_leaves_toolchain_untouched(toolchain_db, feed):
+    """ Test Failed Fetch Leaves Toolchain Untouched """
+    boost_package = qitoolchain.qipackage.QiPackage("boost", version="1.42")
+    feed.add_package(boost_package, with_path=False, with_url=True)
+    toolchain_db.update(feed.url)
+    boost_path = toolchain_db.get_package_path("boost")
+    new_boost_package = qitoolchain.qipackage.QiPackage("boost", version="1.44")
+    feed.add_package(new_boost_package, with_path=False, with_url=True)
+    foo_package = qitoolchain.qipackage.QiPackage("foo", version="0.1")
+    feed.add_package(foo_package, with_path=False, with_url=True)
+    os.remove(new_boost_package.url[len("file://"):])
+    with pytest.raises(Exception) as e:
+        toolchain_db.update(feed.url, num_jobs=2)
+    assert "boost" in str(e.value)
+    db2 = qitoolchain.database.DataBase("bar", toolchain_db.db_path)
+    assert db2.packages["boost"].version == "1.42"
+    assert "foo" not in db2.packages
+    assert os.path.exists(os.path.join(boost_path, "package.xml"))
+    assert not os.path.exists(toolchain_db.staging_path)
+
+
+def test_checksum_from_feed(toolchain_db, feed):
+    """ Test Checksum From Feed """
+    boost_package = qitoolchain.qipackage.QiPackage("boost", version="1.42")
+    boost_package.sha256 = "0" * 64
+    feed.add_package(boost_package, with_path=False, with_url=True)
+    with pytest.raises(Exception) as e:
+        toolchain_db.update(feed.url)
+    assert "Checksum mismatch" in str(e.value)
+    assert "boost" not in toolchain_db.packages
+
+
 def test_package_removed_from_feed(toolchain_db, feed):
     """ Test Package Removed from Feed """
     boost_package = qitoolchain.qipackage.QiPackage("boost", version="1.42")
@@ -196,3 +246,59 @@ def test_post_add(tmpdir, toolchain_db):
     with open(os.path.join(boost_in_db.path, 'foobar')) as f:
         txt = f.read()
     assert "hello world" in txt
+
+
+def test_republished_archive_is_updated(toolchain_db, feed, tmpdir):
+    """ Test Republished Archive Is Updated """
+    boost_package = qitoolchain.qipackage.QiPackage("boost", version="1.42")
+    feed.add_package(boost_package, with_path=False, with_url=True)
+    toolchain_db.update(feed.url)
+    boost = toolchain_db.get_package("boost")
+    # The digest of the archive is stored in the database
+    assert boost.sha256
+    boost_path = boost.path
+    header = os.path.join(boost_path, "include", "boost.h")
+    lib = os.path.join(boost_path, "lib", "libboost.so")
+    header_inode = os.stat(header).st_ino
+    # Same version, different archive:
+    packages = tmpdir.join("packages")
+    packages.join("lib", "libboost.so").remove()
+    packages.join("lib", "libboost_python.so").write("new lib")
+    archive = packages.join("boost-1.42.zip")
+    archive.remove()
+    qisys.archive.compress(packages.strpath, flat=True, output=archive.strpath)
+    _set_feed_sha256(feed, "boost", qisys.remote.sha256sum(archive.strpath))
+    toolchain_db.update(feed.url)
+    assert not os.path.exists(lib)
+    with open(os.path.join(boost_path, "lib", "libboost_python.so")) as fp:
+        assert fp.read() == "new lib"
+    # Unchanged files were not touched
+    assert os.stat(header).st_ino == header_inode
+    assert toolchain_db.get_package("boost").sha256 == qisys.remote.sha256sum(archive.strpath)
+
+
+def test_metadata_only_change(toolchain_db, feed):
+    """ Test Metadata Only Change """
+    boost_package = qitoolchain.qipackage.QiPackage("boost", version="1.42")
+    feed.add_package(boost_package, with_path=False, with_url=True)
+    toolchain_db.update(feed.url)
+    sha256 = toolchain_db.get_package("boost").sha256
+    _set_feed_sha256(feed, "boost", sha256)
+    tree = qisys.qixml.read(feed.feed_xml.strpath)
+    tree.find("package").set("version", "1.42-r2")
+    qisys.qixml.write(tree, feed.feed_xml.strpath)
+    with mock.patch.object(qitoolchain.cache, "fetch") as mock_fetch:
+        toolchain_db.update(feed.url)
+    assert not mock_fetch.called
+    boost = toolchain_db.get_package("boost")
+    assert boost.version == "1.42-r2"
+    assert os.path.exists(os.path.join(boost.path, "package.xml"))
+
+
+def _set_feed_sha256(feed, name, sha256):
+    """ Set the sha256 of a package in the feed """
+    tree = qisys.qixml.read(feed.feed_xml.strpath)
+    for element in tree.findall("package"):
+        if element.get("name") == name:
+            element.set("sha256", sha256)
+    qisys.qixml.write(tree, feed.feed_xml.strpath)
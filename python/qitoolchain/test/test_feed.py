@@ -10,6 +10,7 @@ from __future__ import print_function
 import pytest
 
 from qisrc.test.conftest import git_server
+from qisys.test.test_remote import file_server
 from qitoolchain.feed import is_url, tree_from_feed, ToolchainFeedParser
 
 default_oss_xml = """<feed>\n    <package name="boost" url="boost.zip" />\n</feed>\n"""
@@ -79,3 +80,60 @@ def test_git_bad_url(git_server, feed):
     assert "not parse" in str(e)
     assert "not an existing path" in str(e)
     assert "nor an url" in str(e)
+
+
+def test_http_sub_feeds(file_server):
+    """ Sub feeds are fetched over HTTP, and parsed in the order they are included """
+    file_server.files["/feeds/full.xml"] = b"""<feed>
+    <package name="boost" version="1.0" url="boost-1.0.zip" />
+    <feed url="oss.xml" />
+    <feed url="3rdpart.xml" />
+</feed>
+"""
+    file_server.files["/feeds/oss.xml"] = b"""<feed>
+    <package name="boost" version="1.2" url="boost-1.2.zip" />
+    <package name="zlib" version="1.0" url="zlib.zip" />
+</feed>
+"""
+    file_server.files["/feeds/3rdpart.xml"] = b"""<feed>
+    <package name="boost" version="1.1" url="boost-1.1.zip" />
+    <package name="oracle-jdk" url="jdk.zip" />
+</feed>
+"""
+    parser = ToolchainFeedParser("foo")
+    parser.parse(file_server.url + "/feeds/full.xml")
+    assert [(x.name, x.version) for x in parser.packages] == [
+        ("boost", "1.2"), ("zlib", "1.0"), ("oracle-jdk", None)
+    ]
+
+
+def test_http_feeds_are_cached(file_server, record_messages):
+    """ Unchanged feeds are not downloaded again, and used when the server is down """
+    file_server.files["/full.xml"] = b"""<feed><package name="boost" url="boost.zip" /></feed>"""
+    url = file_server.url + "/full.xml"
+    ToolchainFeedParser("foo").parse(url)
+    parser = ToolchainFeedParser("foo")
+    parser.parse(url)
+    assert "If-None-Match" in file_server.requests[-1]
+    assert [x.name for x in parser.packages] == ["boost"]
+    del file_server.files["/full.xml"]
+    parser = ToolchainFeedParser("foo")
+    parser.parse(url)
+    assert [x.name for x in parser.packages] == ["boost"]
+    assert record_messages.find("Using the cached version")
+
+
+def test_many_overrides(tmpdir):
+    """ Overriding packages many times keeps the latest version of each """
+    lines = ["<feed>"]
+    for version in range(1, 11):
+        for i in range(200):
+            lines.append('<package name="pkg%i" version="%i.0" url="pkg.zip" />' % (i, version))
+    lines.append("</feed>")
+    feed = tmpdir.join("feed.xml")
+    feed.write("\n".join(lines))
+    parser = ToolchainFeedParser("foo")
+    parser.parse(feed.strpath)
+    packages = parser.get_packages()
+    assert len(packages) == 200
+    assert all(x.version == "10.0" for x in packages)
@@ -12,6 +12,7 @@ import pytest
 
 import qitoolchain.qipackage
 import qisys.archive
+import qisys.sh
 from qisys.test.conftest import skip_on_win
 
 
@@ -118,6 +119,44 @@ def test_include_in_mask(tmpdir):
     assert not dest.join("bin", "moc.exe").check(file=True)
 
 
+def test_compile_mask():
+    """ Test Compile Mask """
+    filter_fun = qitoolchain.qipackage.compile_mask([
+        r"exclude bin/.*\.exe",
+        r"include bin/lrelease.exe",
+        r"exclude lib/(\w+)/\1\.lib",
+    ])
+    assert filter_fun("bin/lrelease.exe")
+    assert not filter_fun("bin/moc.exe")
+    assert not filter_fun("lib/foo/foo.lib")
+    assert filter_fun("lib/foo/bar.lib")
+    assert filter_fun("lib/foo.so")
+
+
+def test_install_listing_is_cached(tmpdir, monkeypatch):
+    """ Unchanged packages are installed without being walked again """
+    qt_path = tmpdir.mkdir("qt")
+    qt_path.ensure("include", "qt.h", file=True)
+    qt_path.ensure("lib", "libQtCore.so", file=True)
+    qt_path.ensure("runtime.mask", file=True).write(b"exclude include/.*\n")
+    package = qitoolchain.qipackage.QiPackage("qt", path=qt_path.strpath)
+    package.install(tmpdir.join("dest1").strpath, components=["runtime"])
+
+    def list_tree(_path):
+        """ Should not be called """
+        assert False, "package walked again"
+    with monkeypatch.context() as context:
+        context.setattr(qisys.sh, "list_tree", list_tree)
+        installed = package.install(tmpdir.join("dest2").strpath, components=["runtime"])
+    assert installed == [os.path.join("lib", "libQtCore.so")]
+    assert tmpdir.join("dest2", "lib", "libQtCore.so").check(file=True)
+    assert not tmpdir.join("dest2", "include", "qt.h").check()
+    # New files are seen
+    qt_path.ensure("lib", "libQtGui.so", file=True)
+    package.install(tmpdir.join("dest3").strpath, components=["runtime"])
+    assert tmpdir.join("dest3", "lib", "libQtGui.so").check(file=True)
+
+
 def test_load_deps(tmpdir):
     """ Test Load Dependencies """
     libqi_path = tmpdir.mkdir("libqi")
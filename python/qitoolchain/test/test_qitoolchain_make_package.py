@@ -10,6 +10,7 @@ from __future__ import print_function
 import os
 
 import qisys.qixml
+import qisys.command
 import qitoolchain.qipackage
 
 
@@ -47,3 +48,25 @@ def test_on_invalid_xml(qitoolchain_action, tmpdir):
     package_xml.write("<foo/>")
     error = qitoolchain_action("make-package", tmpdir.strpath, raises=True)
     assert "Root element" in error
+
+
+def test_create_extract_zstd(qitoolchain_action, tmpdir):
+    """ Test Create Extract Zstd """
+    if not qisys.command.find_program("zstd"):
+        return
+    food = tmpdir.join("foo")
+    food.ensure("lib", "libfoo.so", file=True)
+    food.join("package.xml").write("""\n<package name="foo" version="0.1" target="linux64" />\n""")
+    package_path = qitoolchain_action(
+        "make-package",
+        "--output", tmpdir.strpath,
+        "--algo", "zstd",
+        "--compression-level", "19",
+        food.strpath
+    )
+    assert package_path == tmpdir.join("foo-linux64-0.1.tar.zst").strpath
+    dest = tmpdir.join("dest", "foo")
+    res = qitoolchain.qipackage.extract(package_path, dest.strpath)
+    assert res == dest.strpath
+    assert dest.join("package.xml").check(file=True)
+    assert dest.join("lib", "libfoo.so").check(file=True)
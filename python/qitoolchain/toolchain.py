@@ -84,15 +84,15 @@ class Toolchain(object):
         """ Unregister the Toolchain """
         qisys.sh.rm(self.config_path)
 
-    def update(self, feed_url=None, branch=None, name=None):
-        """ Update the Toolchain """
+    def update(self, feed_url=None, branch=None, name=None, num_jobs=1):
+        """ Update the Toolchain, downloading num_jobs packages at once """
         if feed_url is None:
             feed_url = self.feed_url
         if name is None:
             name = self.feed_name
         if branch is None:
             branch = self.feed_branch
-        self.db.update(feed_url, branch=branch, name=name)
+        self.db.update(feed_url, branch=branch, name=name, num_jobs=num_jobs)
         self.feed_url = feed_url
         self.feed_branch = branch
         self.feed_name = name